@@ -434,14 +434,20 @@
 # api_server.py
 from fastapi import FastAPI, HTTPException, Header, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+import asyncio
 import uuid
+import json
 import logging
-from typing import Optional, Dict
+import os
+from typing import Optional
 from datetime import datetime
 
 # Import the ConversationManager from your existing code
 from chatbotR import ConversationManager  
+from session_store import get_store
+import resources
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -480,10 +486,17 @@ class ChatResponse(BaseModel):
     phase: str = "intro"  # New: "intro", "personality", "mental_health", "completed", "error"
     is_finished: bool = False
     final_report: Optional[str] = None
+    report_pending: bool = False  # Report is being written: poll GET /report/{user_id} or stream it, then POST /report/{user_id}/finish
     user_id: str
     timestamp: str
     error: Optional[str] = None
 
+class ReportStatus(BaseModel):
+    user_id: str
+    status: str  # "pending", "running", "done", "failed"
+    partial_report: str = ""
+    elapsed_s: float = 0.0
+
 class SessionInfo(BaseModel):
     user_id: str
     created_at: str
@@ -491,13 +504,19 @@ class SessionInfo(BaseModel):
     current_phase: str
     questions_answered: int
 
-# In-memory user sessions (for demo - use Redis/DB in production)
-user_sessions: Dict[str, Dict] = {}
+# Per-user API bookkeeping, in the same store as the conversations
+# (ANEES_SESSION_STORE=sqlite/redis to share it between worker processes).
+# With those backends every store call is blocking I/O, so the endpoints
+# make them through asyncio.to_thread, never on the event loop.
+user_sessions = get_store(namespace="api")
 
 # Helper functions
 def get_or_create_user_id(user_id: Optional[str] = None) -> str:
-    """Get existing user_id or create new one"""
-    if user_id and user_id in user_sessions:
+    """Get existing user_id (marking it active) or create new one"""
+    info = user_sessions.get(user_id) if user_id else None
+    if info is not None:
+        info["last_activity"] = datetime.now().isoformat()
+        user_sessions[user_id] = info
         return user_id
     
     new_id = str(uuid.uuid4())
@@ -508,6 +527,68 @@ def get_or_create_user_id(user_id: Optional[str] = None) -> str:
     }
     return new_id
 
+def build_chat_response(user_id: str, result: dict) -> ChatResponse:
+    return ChatResponse(
+        user_id=user_id,
+        response=result.get("response", ""),
+        options=result.get("options", []),
+        question_number=result.get("question_number", 0),
+        phase=result.get("phase", "intro"),
+        is_finished=result.get("is_finished", False),
+        final_report=result.get("final_report"),
+        report_pending=result.get("report_pending", False),
+        error=result.get("error"),
+        timestamp=datetime.now().isoformat()
+    )
+
+def record_result(user_id: str, result: dict):
+    """Update (or drop, once finished) the API-side session info"""
+    if result.get("is_finished"):
+        # Remove finished session
+        user_sessions.pop(user_id, None)
+        return
+    info = user_sessions.get(user_id)
+    if info is None:
+        return
+
+    # Update current step in session
+    current_step = f"Question {result.get('question_number', 0)}"
+    if result.get("phase") == "intro":
+        current_step = "Introduction"
+    elif result.get("phase") == "personality":
+        current_step = f"Personality Q{result.get('question_number', 0)}"
+    elif result.get("phase") == "mental_health":
+        current_step = f"Mental Health Q{result.get('question_number', 0)-5}"
+
+    info["current_step"] = current_step
+    info["current_phase"] = result.get("phase", "intro")
+    user_sessions[user_id] = info
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def event_stream(user_id: str, message: str) -> StreamingResponse:
+    """One conversation turn as Server-Sent Events (see /chat/stream)"""
+    async def events():
+        yield sse_event("start", {"user_id": user_id})
+        try:
+            async for kind, value in conversation_manager.astream_user_message(user_id, message):
+                if kind == "delta":
+                    yield sse_event("delta", {"text": value})
+                else:
+                    await asyncio.to_thread(record_result, user_id, value)
+                    yield sse_event("done", build_chat_response(user_id, value).model_dump())
+                    logger.info(f"Streamed message for user {user_id} (phase: {value.get('phase', 'intro')})")
+        except Exception as e:
+            logger.error(f"Error streaming chat: {e}")
+            yield sse_event("error", {"detail": f"Internal server error: {str(e)}"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # API Endpoints
 @app.get("/")
 async def root():
@@ -518,8 +599,13 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "POST /chat": "Send a message to the chatbot",
+            "POST /chat/stream": "Same as /chat, as Server-Sent Events (streams the final report)",
+            "GET /report/{user_id}": "Poll the final report being written",
+            "POST /report/{user_id}/finish": "Receive the finished report and end the session",
+            "GET /report/{user_id}/stream": "Follow the final report being written (Server-Sent Events)",
             "GET /sessions": "Get all active sessions (admin)",
             "DELETE /sessions/{user_id}": "Delete a session",
+            "POST /admin/reload": "Reload the document collection (admin)",
             "GET /health": "Health check"
         }
     }
@@ -535,49 +621,15 @@ async def chat_endpoint(request: ChatRequest):
     - Returns exact CLI format for Android display
     """
     try:
-        # Get or create user ID
-        user_id = get_or_create_user_id(request.user_id)
-        
-        # Update session activity
-        user_sessions[user_id]["last_activity"] = datetime.now().isoformat()
-        
-        # Process message through ConversationManager
-        result = conversation_manager.process_user_message(user_id, request.message)
-        
-        # Update current phase in session
-        if "phase" in result:
-            user_sessions[user_id]["current_phase"] = result["phase"]
+        # Get or create user ID (updates session activity)
+        user_id = await asyncio.to_thread(get_or_create_user_id, request.user_id)
         
-        # Prepare response
-        response = ChatResponse(
-            user_id=user_id,
-            response=result.get("response", ""),
-            options=result.get("options", []),
-            question_number=result.get("question_number", 0),
-            phase=result.get("phase", "intro"),
-            is_finished=result.get("is_finished", False),
-            final_report=result.get("final_report"),
-            error=result.get("error"),
-            timestamp=datetime.now().isoformat()
-        )
+        # Process message through ConversationManager (async path, never blocks the loop)
+        result = await conversation_manager.aprocess_user_message(user_id, request.message)
         
-        # Update session info
-        if result.get("is_finished"):
-            # Remove finished session
-            if user_id in user_sessions:
-                user_sessions.pop(user_id, None)
-        else:
-            # Update current step in session
-            current_step = f"Question {result.get('question_number', 0)}"
-            if result.get("phase") == "intro":
-                current_step = "Introduction"
-            elif result.get("phase") == "personality":
-                current_step = f"Personality Q{result.get('question_number', 0)}"
-            elif result.get("phase") == "mental_health":
-                current_step = f"Mental Health Q{result.get('question_number', 0)-5}"
-            
-            user_sessions[user_id]["current_step"] = current_step
-            user_sessions[user_id]["current_phase"] = result.get("phase", "intro")
+        # Prepare response and update session info
+        response = build_chat_response(user_id, result)
+        await asyncio.to_thread(record_result, user_id, result)
         
         logger.info(f"Processed message for user {user_id} (phase: {result.get('phase', 'intro')})")
         return response
@@ -586,6 +638,94 @@ async def chat_endpoint(request: ChatRequest):
         logger.error(f"Error processing chat: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """
+    /chat as Server-Sent Events, for showing the final report while it is written
+
+    - event "start": {"user_id"}
+    - event "delta": {"text"} - report text as it arrives (report turn only)
+    - event "done":  the same body /chat would return
+    - event "error": {"detail"}
+    """
+    user_id = await asyncio.to_thread(get_or_create_user_id, request.user_id)
+    return event_stream(user_id, request.message)
+
+@app.get("/report/{user_id}", response_model=ReportStatus)
+async def report_status_endpoint(user_id: str):
+    """
+    Poll the final report started when the last answer arrived
+
+    Read-only: returns the status and the text written so far. Once the
+    status is "done" or "failed", POST /report/{user_id}/finish (or any
+    /chat message) delivers the report and ends the session.
+    """
+    status = await asyncio.to_thread(conversation_manager.report_status, user_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="No report job for this user")
+
+    return ReportStatus(
+        user_id=user_id,
+        status=status["status"],
+        partial_report=status["partial_report"],
+        elapsed_s=status["elapsed_s"]
+    )
+
+@app.post("/report/{user_id}/finish", response_model=ChatResponse)
+async def report_finish_endpoint(user_id: str):
+    """
+    Finish the conversation with the report (waits for it if still running)
+
+    Returns what /chat would; the job's text is served without another GPT call.
+    """
+    if await asyncio.to_thread(conversation_manager.report_status, user_id) is None:
+        raise HTTPException(status_code=404, detail="No report job for this user")
+    try:
+        result = await conversation_manager.aprocess_user_message(user_id, "")
+        response = build_chat_response(user_id, result)
+        await asyncio.to_thread(record_result, user_id, result)
+        return response
+    except Exception as e:
+        logger.error(f"Error finishing report: {e}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@app.get("/report/{user_id}/stream")
+async def report_stream_endpoint(user_id: str):
+    """
+    Follow the final report as Server-Sent Events: replays the text
+    written so far, then follows it live. Read-only like GET /report.
+
+    - event "start": {"user_id"}
+    - event "delta": {"text"}
+    - event "done":  the GET /report body; then POST /report/{user_id}/finish
+    - event "error": {"detail"}
+    """
+    job = await asyncio.to_thread(conversation_manager.find_report, user_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="No report job for this user")
+
+    async def events():
+        yield sse_event("start", {"user_id": user_id})
+        try:
+            async for delta in job.asubscribe():
+                yield sse_event("delta", {"text": delta})
+            info = await asyncio.to_thread(job.info)
+            yield sse_event("done", ReportStatus(
+                user_id=user_id,
+                status=info["status"],
+                partial_report=info["partial_report"],
+                elapsed_s=info["elapsed_s"]
+            ).model_dump())
+        except Exception as e:
+            logger.error(f"Error streaming report: {e}")
+            yield sse_event("error", {"detail": f"Internal server error: {str(e)}"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/sessions")
 async def get_sessions(admin_key: Optional[str] = Header(None)):
     """
@@ -597,15 +737,23 @@ async def get_sessions(admin_key: Optional[str] = Header(None)):
     if admin_key != "YOUR_ADMIN_KEY_HERE":
         raise HTTPException(status_code=403, detail="Unauthorized")
     
+    sessions_info = await asyncio.to_thread(list_sessions)
+    return {
+        "total_sessions": len(sessions_info),
+        "sessions": sessions_info
+    }
+
+def list_sessions() -> list:
+    """SessionInfo of every active session (listed with peek(): polling must not keep sessions alive)"""
     sessions_info = []
-    for user_id, session_data in user_sessions.items():
+    for user_id, session_data in user_sessions.items(touch=False):
         # Count questions answered
         questions_answered = 0
         try:
             # Try to get actual count from ConversationManager
-            if hasattr(conversation_manager, 'sessions') and user_id in conversation_manager.sessions:
-                session = conversation_manager.sessions[user_id]
-                questions_answered = len(session.get("personality_answers", [])) + len(session.get("mental_answers", []))
+            session = conversation_manager.sessions.peek(user_id)
+            if session is not None:
+                questions_answered = session.questions_answered
         except:
             pass
         
@@ -616,11 +764,7 @@ async def get_sessions(admin_key: Optional[str] = Header(None)):
             current_phase=session_data.get("current_phase", "unknown"),
             questions_answered=questions_answered
         ))
-    
-    return {
-        "total_sessions": len(sessions_info),
-        "sessions": sessions_info
-    }
+    return sessions_info
 
 @app.delete("/sessions/{user_id}")
 async def delete_session(user_id: str, admin_key: Optional[str] = Header(None)):
@@ -633,23 +777,61 @@ async def delete_session(user_id: str, admin_key: Optional[str] = Header(None)):
         raise HTTPException(status_code=403, detail="Unauthorized")
     
     # Remove from our session storage
-    if user_id in user_sessions:
-        user_sessions.pop(user_id)
+    await asyncio.to_thread(user_sessions.pop, user_id, None)
     
-    # Also remove from ConversationManager if it has its own storage
-    if hasattr(conversation_manager, 'sessions') and user_id in conversation_manager.sessions:
-        conversation_manager.sessions.pop(user_id, None)
+    # Also remove from ConversationManager's storage (with its report job and prefetches)
+    await asyncio.to_thread(conversation_manager.end_session, user_id)
     
     return {"message": f"Session {user_id} deleted"}
 
+@app.post("/admin/reload")
+async def reload_collection(admin_key: Optional[str] = Header(None)):
+    """
+    Reload the ChromaDB collection after running embed.py
+
+    Requires admin_key header
+    """
+    if admin_key != "YOUR_ADMIN_KEY_HERE":
+        raise HTTPException(status_code=403, detail="Unauthorized")
+
+    conversation_manager.bot.reload_collection()
+    return {
+        "message": f"Collection '{conversation_manager.bot.collection_name}' reloaded",
+        "generation": conversation_manager.bot.collection_manager.generation
+    }
+
+def embedding_service_stats():
+    """Stats of the shared embedding service, None if the model is in this process."""
+    embedder = conversation_manager.bot.embedder
+    if not hasattr(embedder, "stats"):
+        return None
+    try:
+        return embedder.stats()
+    except Exception as e:
+        return {"error": str(e)}
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
+    # Store counts and the embedding service round-trip block
+    return await asyncio.to_thread(health_info)
+
+def health_info() -> dict:
     return {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
         "active_sessions": len(user_sessions),
-        "conversation_manager_ready": True
+        "session_store": conversation_manager.sessions.stats(),
+        "conversation_manager_ready": True,
+        "query_cache": conversation_manager.bot.query_cache.stats(),
+        "result_cache": conversation_manager.bot.result_cache.stats(),
+        "reranker": conversation_manager.bot.reranker.stats() if conversation_manager.bot.reranker else None,
+        "llm": conversation_manager.bot.llm.stats(),
+        "question_bank": conversation_manager.bot.question_bank.stats() if conversation_manager.bot.question_bank else None,
+        "shared_resources": resources.loaded(),
+        "prefetch": conversation_manager.prefetch_stats(),
+        "embedding_service": embedding_service_stats(),
+        "worker_pid": os.getpid()
     }
 
 @app.get("/start_new")
@@ -659,27 +841,12 @@ async def start_new_session():
     Useful for Android app to get initial message without user input
     """
     try:
-        user_id = str(uuid.uuid4())
-        user_sessions[user_id] = {
-            "created_at": datetime.now().isoformat(),
-            "last_activity": datetime.now().isoformat(),
-            "current_phase": "intro"
-        }
+        user_id = await asyncio.to_thread(get_or_create_user_id)
         
         # Get initial message by sending empty message
-        result = conversation_manager.process_user_message(user_id, "")
+        result = await conversation_manager.aprocess_user_message(user_id, "")
         
-        response = ChatResponse(
-            user_id=user_id,
-            response=result.get("response", ""),
-            options=result.get("options", []),
-            question_number=result.get("question_number", 0),
-            phase=result.get("phase", "intro"),
-            is_finished=result.get("is_finished", False),
-            final_report=result.get("final_report"),
-            error=result.get("error"),
-            timestamp=datetime.now().isoformat()
-        )
+        response = build_chat_response(user_id, result)
         
         return response
         
@@ -687,6 +854,8 @@ async def start_new_session():
         logger.error(f"Error starting new session: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+# Single process. For several workers sharing one copy of the embedding
+# model use: python serve_api.py --workers 4
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
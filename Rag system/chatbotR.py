@@ -1,14 +1,30 @@
 #!/usr/bin/env python3
 import os
 import sys
+import asyncio
+import threading
+import weakref
 import time
 import json
+import copy
 import logging
-import chromadb
-from sentence_transformers import SentenceTransformer
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from dotenv import load_dotenv
 from risk import CriticalRiskDetector
+from rag_cache import QueryEmbeddingCache, RetrievalResultCache
+from collection_state import CollectionManager, read_generation
+from collection_stats import CollectionStats
+from context_bundles import PHASES, ContextBundleStore
+from lexical_index import BM25Index, reciprocal_rank_fusion
+from reranker import DEFAULT_RERANKER, CrossEncoderReranker
+from context_assembly import ContextAssembler
+from llm_backend import LLMBackend
+from question_bank import QuestionBank
+from report_jobs import ReportJob, SharedReportJob, report_info
+from session_store import SessionStore, get_store
+from session_model import Session
+import resources
 # ---------------------------------------------------------------
 # Welcome tooo Setup
 # ---------------------------------------------------------------
@@ -30,61 +46,207 @@ class IntegratedRAGChatbot:
         collection_name: str = "documents",
         embedding_model: str = "BAAI/bge-m3",
         openai_model: str = "gpt-4o-mini",
+        query_cache_size: int = 256,
+        result_cache_size: int = 512,
+        retrieval_mode: str = "hybrid",
+        rerank: bool = True,
+        reranker_model: str = DEFAULT_RERANKER,
+        llm_backend: LLMBackend = None,
+        embedding_workers: int = 2,
+        question_bank: bool = True,
     ):
         self.chroma_db_path = chroma_db_path
         self.collection_name = collection_name
         self.embedding_model_name = embedding_model
         self.openai_model = openai_model
+        self.query_cache = QueryEmbeddingCache(
+            path=os.path.join(chroma_db_path, "query_embedding_cache.json"),
+            max_entries=query_cache_size,
+        )
+        self.result_cache = RetrievalResultCache(max_entries=result_cache_size)
+        self.context_bundles = ContextBundleStore(chroma_db_path, collection_name)
+        # "hybrid" fuses BM25 and dense rankings, "dense" is vector search only
+        if retrieval_mode not in ("hybrid", "dense"):
+            raise ValueError(f"Unknown retrieval_mode '{retrieval_mode}' (use 'hybrid' or 'dense')")
+        self.retrieval_mode = retrieval_mode
+        self.lexical_index = BM25Index(chroma_db_path, collection_name)
+        self._phase_sources = {}  # phase -> (generation, source_file names)
+        # Cross-encoder stage between retrieve() and build_context()
+        self.reranker = CrossEncoderReranker(reranker_model) if rerank else None
+        # Async callers run encode/search/rerank here, never on the event loop
+        self.embedding_executor = ThreadPoolExecutor(
+            max_workers=embedding_workers, thread_name_prefix="rag-embed"
+        )
+
+        # Pre-generated MBTI questions (question_bank.py); GPT only when exhausted
+        self.question_bank = QuestionBank(chroma_db_path) if question_bank else None
 
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise ValueError("OPENAI_API_KEY not found in environment variables.")
+        # OpenAI by default; ANEES_LLM_BACKEND=local runs fully offline.
+        # Models and clients come from the process-wide registry, so extra
+        # instances are cheap and never reload anything.
+        self.llm = llm_backend or resources.llm_backend(model=openai_model)
 
         self._init_chroma()
         self._init_embedder()
-        self._init_openai(api_key)
 
-    # ---------------- Chroma / Embedding / OpenAI ----------------
+    # ---------------- Chroma / Embedding ----------------
 
     def _init_chroma(self):
-        self.client = chromadb.PersistentClient(path=self.chroma_db_path)
-        self.collection = self.client.get_collection(self.collection_name)
+        self.client = resources.chroma_client(self.chroma_db_path)
+        self.collection_manager = CollectionManager(
+            self.client, self.chroma_db_path, self.collection_name
+        )
+        self.collection = self.collection_manager.get()
         logger.info(
             f"Connected to ChromaDB collection '{self.collection_name}' "
             f"at '{self.chroma_db_path}'"
         )
 
+    def reload_collection(self):
+        """Pick up a re-ingested collection immediately (called by the API after embed.py)."""
+        self.collection = self.collection_manager.reload()
+        self.result_cache.clear()
+        logger.info(f"Reloaded ChromaDB collection '{self.collection_name}'")
+
     def _init_embedder(self):
         logger.info(f"Loading embedding model: {self.embedding_model_name}")
-        self.embedder = SentenceTransformer(self.embedding_model_name)
+        self.embedder = resources.embedder(self.embedding_model_name)
+        # encode() switches truncation/padding on the shared fast tokenizer from
+        # any thread, so counting uses a private copy, one caller at a time
+        self._count_tokenizer = None
+        self._count_lock = threading.Lock()
+        self.context_assembler = ContextAssembler(self.count_tokens)
         logger.info("Embedding model loaded.")
 
-    def _init_openai(self, api_key: str):
-        self.openai = OpenAI(api_key=api_key)
-        logger.info("OpenAI client initialized.")
+    def count_tokens(self, text: str) -> int:
+        """Token count with the embedder's tokenizer (close to what GPT sees)."""
+        with self._count_lock:
+            if self._count_tokenizer is None:
+                self._count_tokenizer = copy.deepcopy(self.embedder.tokenizer)
+            return len(self._count_tokenizer(text, add_special_tokens=False)["input_ids"])
 
     # ---------------- Retrieval ----------------
 
-    def retrieve(self, query: str, n_results: int = 15):
+    def embed_query(self, query: str):
+        """Embed a query, serving repeated (fixed) prompts from the LRU cache."""
+        embedding = self.query_cache.get(self.embedding_model_name, query)
+        if embedding is None:
+            embedding = self.embedder.encode([query])[0].tolist()
+            self.query_cache.put(self.embedding_model_name, query, embedding)
+        return embedding
+
+    def retrieve(self, query: str, n_results: int = 15, sources=None):
         """
         Retrieve most relevant chunks from DSM-5 + MBTI.
         Optionally bias query text (e.g., for MBTI or DSM focus).
+        sources: optional list of source_file names; the search is filtered
+        inside Chroma (and BM25) so no slots go to the other corpus.
+        In hybrid mode the BM25 and dense rankings are fused (RRF) and the
+        fused scores are returned under "scores".
         """
-        # Always refresh collection reference
-        self.collection = self.client.get_collection(self.collection_name)
-
-        query_embedding = self.embedder.encode([query]).tolist()
         n_results = max(8, min(n_results, 40))
 
-        results = self.collection.query(
-            query_embeddings=query_embedding,
+        # Without an index (collection embedded before it existed) stay dense
+        mode = self.retrieval_mode
+        if mode == "hybrid" and not self.lexical_index.exists:
+            mode = "dense"
+
+        # Results stay valid until embed.py bumps the collection generation
+        generation = read_generation(self.chroma_db_path, self.collection_name)
+        where = None
+        if sources:
+            sources = sorted(sources)
+            where = {"source_file": sources[0] if len(sources) == 1 else {"$in": sources}}
+        cache_key = RetrievalResultCache.make_key(self.embedding_model_name, query, n_results, mode, where)
+        cached = self.result_cache.get(generation, cache_key)
+        if cached is not None:
+            return cached
+
+        # Handle is only re-fetched when the generation changed
+        self.collection = self.collection_manager.get()
+
+        query_embedding = [self.embed_query(query)]
+
+        try:
+            results = self._query_collection(query_embedding, n_results, where)
+        except Exception as e:
+            # Collection was dropped/recreated without a generation bump
+            logger.warning(f"Collection query failed ({e}), reloading handle and retrying.")
+            self.collection = self.collection_manager.reload()
+            results = self._query_collection(query_embedding, n_results, where)
+
+        if mode == "hybrid":
+            results = self._fuse_lexical(query, query_embedding[0], results, n_results, sources)
+
+        self.result_cache.put(generation, cache_key, results)
+        return results
+
+    def _query_collection(self, query_embeddings, n_results: int, where=None):
+        return self.collection.query(
+            query_embeddings=query_embeddings,
             n_results=n_results,
+            where=where,
             include=["documents", "metadatas", "distances"],
         )
-        return results
 
-    def build_context(self, results, min_sim: float = 0.03, max_chunks: int = 8) -> str:
-        """Turn retrieval output into text context for GPT."""
+    def _distances(self, query_embedding, embeddings) -> list:
+        """Same distance Chroma reports, for chunks found only by BM25."""
+        space = (self.collection.metadata or {}).get("hnsw:space", "l2")
+        q = np.asarray(query_embedding, dtype=np.float32)
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if space == "cosine":
+            norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(q)
+            return (1 - vectors @ q / np.maximum(norms, 1e-12)).tolist()
+        if space == "ip":
+            return (1 - vectors @ q).tolist()
+        return ((vectors - q) ** 2).sum(axis=1).tolist()
+
+    def _fuse_lexical(self, query: str, query_embedding, dense: dict, n_results: int, sources=None) -> dict:
+        """Reciprocal rank fusion of the dense results with the BM25 ranking."""
+        dense_ids = dense["ids"][0]
+        lexical = self.lexical_index.search(query, n_results, sources=set(sources) if sources else None)
+        lexical_ids = [doc_id for doc_id, _ in lexical]
+        fused = reciprocal_rank_fusion([dense_ids, lexical_ids])[:n_results]
+
+        rows = {
+            doc_id: (doc, meta, dist)
+            for doc_id, doc, meta, dist in zip(
+                dense_ids, dense["documents"][0], dense["metadatas"][0], dense["distances"][0]
+            )
+        }
+        missing = [doc_id for doc_id, _ in fused if doc_id not in rows]
+        if missing:
+            extra = self.collection.get(ids=missing, include=["documents", "metadatas", "embeddings"])
+            if extra["ids"]:
+                distances = self._distances(query_embedding, extra["embeddings"])
+                for doc_id, doc, meta, dist in zip(
+                    extra["ids"], extra["documents"], extra["metadatas"], distances
+                ):
+                    rows[doc_id] = (doc, meta, dist)
+
+        # Ids deleted since the index was written are simply dropped
+        fused = [(doc_id, score) for doc_id, score in fused if doc_id in rows]
+        return {
+            "ids": [[doc_id for doc_id, _ in fused]],
+            "documents": [[rows[doc_id][0] for doc_id, _ in fused]],
+            "metadatas": [[rows[doc_id][1] for doc_id, _ in fused]],
+            "distances": [[rows[doc_id][2] for doc_id, _ in fused]],
+            "scores": [[score for _, score in fused]],
+        }
+
+    def build_context(
+        self,
+        results,
+        min_sim: float = 0.03,
+        max_chunks: int = 8,
+        query: str = None,
+        token_budget: int = None,
+    ) -> str:
+        """
+        Turn retrieval output into text context for GPT.
+        With a token_budget the ContextAssembler drops near-duplicates, trims
+        chunks to the sentences matching `query` and stops at the budget.
+        """
         if (
             not results
             or not results.get("documents")
@@ -95,17 +257,25 @@ class IntegratedRAGChatbot:
         docs = results["documents"][0]
         metas = results["metadatas"][0]
         dists = results["distances"][0]
+        # Hybrid results carry a fused rank score; rank by it when present
+        ranks = results["scores"][0] if results.get("scores") else [1 - d for d in dists]
 
         scored = []
-        for doc, meta, dist in zip(docs, metas, dists):
+        for rank, doc, meta, dist in zip(ranks, docs, metas, dists):
             sim = 1 - dist
-            scored.append((sim, str(doc), meta))
+            scored.append((rank, sim, str(doc), meta))
 
-        # Sort by similarity descending
+        # Sort by rank score (similarity for dense results) descending
         scored.sort(key=lambda x: x[0], reverse=True)
 
+        if token_budget:
+            context = self.context_assembler.assemble(
+                query or "", scored, token_budget, min_sim=min_sim, max_chunks=max_chunks
+            )
+            return context or "No strong matches in DSM-5 / MBTI documents."
+
         parts = []
-        for sim, doc, meta in scored:
+        for _, sim, doc, meta in scored:
             if sim < min_sim:
                 continue
 
@@ -123,6 +293,75 @@ class IntegratedRAGChatbot:
 
         return "\n\n---\n\n".join(parts)
 
+    def phase_sources(self, phase: str):
+        """
+        source_file names a phase is restricted to, matched by the phase's
+        source_keywords against the sources recorded by embed.py.
+        None means no filter (no keywords, no stats yet, or nothing matched).
+        """
+        keywords = PHASES[phase].get("source_keywords")
+        if not keywords:
+            return None
+
+        generation = read_generation(self.chroma_db_path, self.collection_name)
+        cached = self._phase_sources.get(phase)
+        if cached is not None and cached[0] == generation:
+            return cached[1]
+
+        known = CollectionStats(self.chroma_db_path, self.collection_name).sources
+        sources = sorted(
+            name for name in known
+            if any(keyword in name.lower() for keyword in keywords)
+        ) or None
+        if known and sources is None:
+            logger.warning(f"No source matches {keywords} for phase '{phase}', searching all documents.")
+        self._phase_sources[phase] = (generation, sources)
+        return sources
+
+    def build_phase_context(self, phase: str, use_bundle: bool = True) -> str:
+        """
+        Context for one of the fixed PHASES ("mbti", "dsm", "integration").
+        Served from the precomputed bundle (context_bundles.py) when it matches
+        the current collection generation, otherwise retrieved live.
+        """
+        spec = PHASES[phase]
+        if use_bundle:
+            generation = read_generation(self.chroma_db_path, self.collection_name)
+            context = self.context_bundles.get(phase, generation)
+            if context is not None:
+                return context
+            logger.info(f"No current context bundle for '{phase}', retrieving live.")
+
+        sources = self.phase_sources(phase)
+        if self.reranker is not None:
+            results = self.retrieve(spec["query"], n_results=spec["candidates"], sources=sources)
+            results = self.reranker.rerank(spec["query"], results, keep=spec["keep"])
+            max_chunks = spec["keep"]
+        else:
+            results = self.retrieve(spec["query"], n_results=spec["n_results"], sources=sources)
+            max_chunks = spec["max_chunks"]
+
+        return self.build_context(
+            results,
+            min_sim=spec["min_sim"],
+            max_chunks=max_chunks,
+            query=spec["query"],
+            token_budget=spec.get("token_budget"),
+        )
+
+    async def abuild_phase_context(self, phase: str) -> str:
+        """build_phase_context for async callers."""
+        # A current bundle is a cached file read, no need to leave the loop
+        generation = read_generation(self.chroma_db_path, self.collection_name)
+        context = self.context_bundles.get(phase, generation)
+        if context is not None:
+            return context
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.embedding_executor, self.build_phase_context, phase, False
+        )
+
     # ---------------- Question Generation (MBTI) ----------------
 
     def generate_mbti_question(self, history, personality_answers, index: int, skip_history=None, decline=False):
@@ -132,15 +371,39 @@ class IntegratedRAGChatbot:
         skip_history: list of previously asked questions to avoid repetition
         decline: if True, generate a question from a new category
         """
-        
-        # (Keep the context retrieval code the same as before...)
-        mbti_query = (
-            "Myers-Briggs personality types preferences extraversion introversion "
-            "sensing intuition thinking feeling judging perceiving"
-        )
-        results = self.retrieve(mbti_query, n_results=12)
-        context = self.build_context(results, min_sim=0.02, max_chunks=5)
+        picked = self._bank_question(personality_answers, skip_history, decline)
+        if picked is not None:
+            return picked
+
+        context = self.build_phase_context("mbti")
+        request = self._mbti_question_request(context, personality_answers, index, skip_history, decline)
+        try:
+            return self._parse_mbti_question(self.llm.complete(**request))
+        except Exception as e:
+            return self._mbti_question_fallback(e)
+
+    async def agenerate_mbti_question(self, history, personality_answers, index: int, skip_history=None, decline=False):
+        """Async generate_mbti_question; retrieval runs on the embedding executor."""
+        picked = self._bank_question(personality_answers, skip_history, decline)
+        if picked is not None:
+            return picked
 
+        context = await self.abuild_phase_context("mbti")
+        request = self._mbti_question_request(context, personality_answers, index, skip_history, decline)
+        try:
+            return self._parse_mbti_question(await self.llm.acomplete(**request))
+        except Exception as e:
+            return self._mbti_question_fallback(e)
+
+    def _bank_question(self, personality_answers, skip_history=None, decline=False):
+        """Unseen question from the pre-generated pool, or None (then GPT is used)."""
+        if self.question_bank is None:
+            return None
+        seen = [entry["question"] for entry in personality_answers] + list(skip_history or [])
+        return self.question_bank.select(seen, decline=decline)
+
+    def _mbti_question_request(self, context, personality_answers, index, skip_history=None, decline=False) -> dict:
+        """LLM request (messages + sampling settings) for one MBTI question."""
         # --- UPDATED SYSTEM PROMPT ---
         system_prompt = (
             "You are creating a multiple-choice question to explore a teen's MBTI-style "
@@ -186,42 +449,45 @@ class IntegratedRAGChatbot:
             "previous_answers_summary": prev_summary,
         }
 
-        try:
-            resp = self.openai.chat.completions.create(
-                model=self.openai_model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": json.dumps(user_prompt)},
-                ],
-                temperature=0.4,
-                max_tokens=400,
-            )
-            raw = resp.choices[0].message.content.strip()
-            
-            # Clean up potential markdown formatting (```json ... ```)
-            if raw.startswith("```json"):
-                raw = raw.replace("```json", "").replace("```", "")
-            
-            parsed = json.loads(raw)
-            question = parsed.get("question", "").strip()
-            options = parsed.get("options", [])
-
-            # Fallback if options are empty
-            if not question or not options:
-                raise ValueError("Missing question/options in JSON.")
-
-            return question, options
+        return {
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": json.dumps(user_prompt)},
+            ],
+            "temperature": 0.4,
+            "max_tokens": 400,
+            "purpose": "mbti_question",
+        }
 
-        except Exception as e:
-            logger.error(f"Error generating MBTI question, using fallback. Details: {e}")
-            question = "When you have free time, what sounds more fun?"
-            options = [
-                "A) Hanging out with a group of friends or going to a busy place",
-                "B) Doing something calm alone, like reading, gaming, or drawing",
-                "C) Spending time with one or two close friends",
-                "D) Trying something new or spontaneous"
-            ]
-            return question, options
+    @staticmethod
+    def _parse_mbti_question(raw: str):
+        raw = raw.strip()
+        
+        # Clean up potential markdown formatting (```json ... ```)
+        if raw.startswith("```json"):
+            raw = raw.replace("```json", "").replace("```", "")
+        
+        parsed = json.loads(raw)
+        question = parsed.get("question", "").strip()
+        options = parsed.get("options", [])
+
+        # Fallback if options are empty
+        if not question or not options:
+            raise ValueError("Missing question/options in JSON.")
+
+        return question, options
+
+    @staticmethod
+    def _mbti_question_fallback(error):
+        logger.error(f"Error generating MBTI question, using fallback. Details: {error}")
+        question = "When you have free time, what sounds more fun?"
+        options = [
+            "A) Hanging out with a group of friends or going to a busy place",
+            "B) Doing something calm alone, like reading, gaming, or drawing",
+            "C) Spending time with one or two close friends",
+            "D) Trying something new or spontaneous"
+        ]
+        return question, options
 
     # ---------------- Question Generation (Mental Health) ----------------
 
@@ -233,13 +499,24 @@ class IntegratedRAGChatbot:
         decline: if True, generate a question from a new category
         """
 
-        dsm_query = (
-            "DSM-5 mood anxiety stress sleep concentration personality functioning "
-            "coping social relationships university functioning"
-        )
-        results = self.retrieve(dsm_query, n_results=15)
-        context = self.build_context(results, min_sim=0.02, max_chunks=6)
+        context = self.build_phase_context("dsm")
+        request = self._mental_question_request(context, mental_answers, index, skip_history, decline)
+        try:
+            return self.llm.complete(**request).strip()
+        except Exception as e:
+            return self._mental_question_fallback(e)
 
+    async def agenerate_mental_health_question(self, history, mental_answers, index: int, skip_history=None, decline=False):
+        """Async generate_mental_health_question."""
+        context = await self.abuild_phase_context("dsm")
+        request = self._mental_question_request(context, mental_answers, index, skip_history, decline)
+        try:
+            return (await self.llm.acomplete(**request)).strip()
+        except Exception as e:
+            return self._mental_question_fallback(e)
+
+    def _mental_question_request(self, context, mental_answers, index, skip_history=None, decline=False) -> dict:
+        """LLM request (messages + sampling settings) for one mental health question."""
         system_prompt = (
             "You are creating an open-ended mental health check-in question for a university student.\n"
             "Use DSM-5 concepts to inspire the topic (mood, anxiety, sleep, energy, "
@@ -276,21 +553,20 @@ class IntegratedRAGChatbot:
             f"how this student is feeling, coping, or functioning day-to-day."
         )
 
-        try:
-            resp = self.openai.chat.completions.create(
-                model=self.openai_model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                temperature=0.8,
-                max_tokens=200,
-            )
-            question = resp.choices[0].message.content.strip()
-            return question
-        except Exception as e:
-            logger.error(f"Error generating mental health question, using fallback. Details: {e}")
-            return "How have you been feeling emotionally most days recently?"
+        return {
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            "temperature": 0.8,
+            "max_tokens": 200,
+            "purpose": "mental_question",
+        }
+
+    @staticmethod
+    def _mental_question_fallback(error):
+        logger.error(f"Error generating mental health question, using fallback. Details: {error}")
+        return "How have you been feeling emotionally most days recently?"
 
     # ---------------- Final Integrated Summary ----------------
 
@@ -300,6 +576,68 @@ class IntegratedRAGChatbot:
         This is educational, not diagnostic.
         """
 
+        try:
+            # Broad DSM + MBTI context
+            context = self.build_phase_context("integration")
+            request = self._final_report_request(context, personality_answers, mental_answers)
+            final_report = self.llm.complete(**request)
+            
+            # INTERNAL: Automatically save to JSON (users don't see this)
+            self._save_report_internal(personality_answers, mental_answers, final_report)
+            
+            return final_report
+            
+        except Exception as e:
+            return self._final_report_fallback(e)
+
+    async def agenerate_final_report(self, personality_answers, mental_answers, history):
+        """Async generate_final_report; the JSON save runs off the event loop."""
+        try:
+            context = await self.abuild_phase_context("integration")
+            request = self._final_report_request(context, personality_answers, mental_answers)
+            final_report = await self.llm.acomplete(**request)
+            await asyncio.to_thread(self._save_report_internal, personality_answers, mental_answers, final_report)
+            return final_report
+        except Exception as e:
+            return self._final_report_fallback(e)
+
+    def stream_final_report(self, personality_answers, mental_answers, history):
+        """
+        generate_final_report as text deltas, for showing the report while
+        GPT writes it. The full text is saved once the stream ends. Any
+        failure before the first delta (retrieval included) yields the fallback.
+        If the stream breaks later, the deltas already sent cannot be taken
+        back: the fallback follows them, so the reader sees the report was
+        cut off, and the truncated text is not saved as a finished report.
+        """
+        parts = []
+        try:
+            context = self.build_phase_context("integration")
+            request = self._final_report_request(context, personality_answers, mental_answers)
+            for delta in self.llm.stream(**request):
+                parts.append(delta)
+                yield delta
+        except Exception as e:
+            yield ("\n\n" if parts else "") + self._final_report_fallback(e)
+            return
+        self._save_report_internal(personality_answers, mental_answers, "".join(parts))
+
+    async def astream_final_report(self, personality_answers, mental_answers, history):
+        """Async stream_final_report."""
+        parts = []
+        try:
+            context = await self.abuild_phase_context("integration")
+            request = self._final_report_request(context, personality_answers, mental_answers)
+            async for delta in self.llm.astream(**request):
+                parts.append(delta)
+                yield delta
+        except Exception as e:
+            yield ("\n\n" if parts else "") + self._final_report_fallback(e)
+            return
+        await asyncio.to_thread(self._save_report_internal, personality_answers, mental_answers, "".join(parts))
+
+    def _final_report_request(self, context, personality_answers, mental_answers) -> dict:
+        """LLM request (messages + sampling settings) for the integrated summary."""
         # Build a compact summary of the answers
         perso_summary = "Personality-related answers:\n"
         for i, p in enumerate(personality_answers, start=1):
@@ -314,14 +652,6 @@ class IntegratedRAGChatbot:
 
         overall_summary = perso_summary + "\n" + mental_summary
 
-        # Retrieve broad DSM + MBTI context
-        integration_query = (
-            "Myers-Briggs personality types traits coping styles and DSM-5 concepts "
-            "about mood, anxiety, stress, personality functioning and resilience."
-        )
-        results = self.retrieve(integration_query, n_results=20)
-        context = self.build_context(results, min_sim=0.02, max_chunks=10)
-
         system_prompt = (
             "You are an mental health assistant for university student's.\n"
             "You have:\n"
@@ -367,30 +697,24 @@ class IntegratedRAGChatbot:
             "- Reminds them that this is not a diagnosis and that professionals can help."
         )
 
-        try:
-            resp = self.openai.chat.completions.create(
-                model=self.openai_model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                temperature=0.3,
-                max_tokens=900,
-            )
-            final_report = resp.choices[0].message.content
-            
-            # INTERNAL: Automatically save to JSON (users don't see this)
-            self._save_report_internal(personality_answers, mental_answers, final_report)
-            
-            return final_report
-            
-        except Exception as e:
-            logger.error(f"Error generating final report: {e}")
-            return (
-                "I had trouble generating the final summary. "
-                "But from what you've shared, it could really help to talk to a trusted adult "
-                "or a mental health professional about how you're feeling."
-            )
+        return {
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            "temperature": 0.3,
+            "max_tokens": 900,
+            "purpose": "final_report",
+        }
+
+    @staticmethod
+    def _final_report_fallback(error):
+        logger.error(f"Error generating final report: {error}")
+        return (
+            "I had trouble generating the final summary. "
+            "But from what you've shared, it could really help to talk to a trusted adult "
+            "or a mental health professional about how you're feeling."
+        )
 
     # ---------------- INTERNAL JSON SAVING (Not accessible to users) ----------------
     
@@ -436,6 +760,20 @@ class IntegratedRAGChatbot:
 # ---------------------------------------------------------------
 # CONVERSATION MANAGER (API Gateway for Android) - UPDATED TO MATCH CLI
 # ---------------------------------------------------------------
+class _Step:
+    """
+    A slow call (LLM / retrieval) the conversation state machine needs.
+    The state machine yields it; the sync or async driver runs it and
+    sends the result back, so both share one copy of the flow.
+    """
+    __slots__ = ("name", "args", "kwargs")
+
+    def __init__(self, name, *args, **kwargs):
+        self.name = name
+        self.args = args
+        self.kwargs = kwargs
+
+
 class ConversationManager:
     """
     API Gateway for Android users.
@@ -443,31 +781,52 @@ class ConversationManager:
     Users only interact with questions and see final summary.
     Updated to match exact CLI output format.
     """
-    def __init__(self):
-        # Initialize the core chatbot engine
-        self.bot = IntegratedRAGChatbot()
-        # Session storage: { "user_id": { session_data } }
-        self.sessions = {}
+    def __init__(
+        self,
+        bot: IntegratedRAGChatbot = None,
+        prefetch: bool = True,
+        prefetch_workers: int = 4,
+        report_workers: int = 4,
+        sessions: SessionStore = None,
+        reports: SessionStore = None,
+    ):
+        # Core chatbot engine, shared by every manager in the process
+        self.bot = bot or resources.chatbot()
+        # Session storage: { "user_id": Session }, in memory unless
+        # ANEES_SESSION_STORE points all workers at sqlite or redis
+        self.sessions = sessions if sessions is not None else get_store(
+            namespace="conversation", dumps=Session.pack, loads=Session.unpack
+        )
         # Risk detector for safety
         self.detector = CriticalRiskDetector()
+        # One asyncio lock per active user, so a user's turns never interleave
+        self._user_locks = weakref.WeakValueDictionary()
+        # Speculative next questions: { "user_id": { fingerprint: Future } }
+        self.prefetch_enabled = prefetch
+        self._prefetch = {}
+        self._prefetch_lock = threading.Lock()
+        self._prefetch_executor = ThreadPoolExecutor(
+            max_workers=prefetch_workers, thread_name_prefix="prefetch"
+        ) if prefetch else None
+        self.prefetch_hits = 0
+        self.prefetch_misses = 0
+        # Final reports started as soon as the last answer arrives: { "user_id": ReportJob }.
+        # Jobs publish their progress to `reports`, so the other workers sharing
+        # the session store follow them (SharedReportJob) instead of starting another
+        self.report_jobs = {}
+        self.reports = reports if reports is not None else get_store(namespace="reports")
+        self._report_executor = ThreadPoolExecutor(
+            max_workers=report_workers, thread_name_prefix="report"
+        )
+        self._last_sweep = time.time()
 
-    def _get_session(self, user_id):
+    def _get_session(self, user_id) -> Session:
         """Get or create a session for a user."""
-        if user_id not in self.sessions:
-            self.sessions[user_id] = {
-                "step": "intro",
-                "personality_answers": [],
-                "mental_answers": [],
-                "history": [],
-                "personality_skip_history": [],
-                "mental_skip_history": [],
-                "current_question_data": None,
-                "last_mental_question": "",
-                "risk_session_id": self.detector.new_session_id(),
-                "show_header": True,  # Flag to show Anees header
-                "phase": None  # "personality" or "mental_health"
-            }
-        return self.sessions[user_id]
+        session = self.sessions.get(user_id)
+        if session is None:
+            session = Session(risk_session_id=self.detector.new_session_id())
+            self.sessions[user_id] = session
+        return session
 
     def _check_safety(self, text, session_id):
         """Check if user input is safe."""
@@ -477,34 +836,305 @@ class ConversationManager:
     def _get_empathy_response(self, feeling_text):
         """Generate empathetic response like CLI does."""
         try:
-            bot = IntegratedRAGChatbot()  # Create temporary bot for this
-            empathetic_resp = bot.openai.chat.completions.create(
-                model=bot.openai_model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "You are Anees, a gentle, supportive assistant. "
-                            "Your job is to respond empathetically to how the user feels. "
-                            "Do NOT give diagnoses, medical instructions, or self-harm guidance. "
-                            "Just validate, reassure, and be warm."
-                            "You are mental health professional assistant."
-                            "Your answers should not include any questions."
-                            "Your answers should be in simple English."
-                        )
-                    },
-                    {
-                        "role": "user",
-                        "content": f"The user says they feel: {feeling_text}"
-                    }
-                ],
-                temperature=0.6,
-                max_tokens=150
-            )
-            return empathetic_resp.choices[0].message.content.strip()
+            return self.bot.llm.complete(**self._empathy_request(feeling_text)).strip()
+        except Exception:
+            return "I'm really glad you shared that with me. Thank you for being open."
+
+    async def _aget_empathy_response(self, feeling_text):
+        try:
+            return (await self.bot.llm.acomplete(**self._empathy_request(feeling_text))).strip()
         except Exception:
             return "I'm really glad you shared that with me. Thank you for being open."
 
+    @staticmethod
+    def _empathy_request(feeling_text) -> dict:
+        return dict(
+            messages=[
+                {
+                    "role": "system",
+                    "content": (
+                        "You are Anees, a gentle, supportive assistant. "
+                        "Your job is to respond empathetically to how the user feels. "
+                        "Do NOT give diagnoses, medical instructions, or self-harm guidance. "
+                        "Just validate, reassure, and be warm."
+                        "You are mental health professional assistant."
+                        "Your answers should not include any questions."
+                        "Your answers should be in simple English."
+                    )
+                },
+                {
+                    "role": "user",
+                    "content": f"The user says they feel: {feeling_text}"
+                }
+            ],
+            temperature=0.6,
+            max_tokens=150,
+            purpose="empathy",
+        )
+
+    # ---------------- Prefetch ----------------
+    # Once a question is on screen, the next generate_* call is known up to
+    # the user's choice. Those calls start in the background right after the
+    # turn, and the state machine's next _Step picks up the finished result.
+
+    @staticmethod
+    def _fingerprint(name, args, kwargs):
+        """
+        What a generate_* result depends on, or None if not prefetchable.
+        MBTI questions depend on position, skip history, decline and which
+        questions were already asked (the question bank never repeats one);
+        the multiple-choice answers just flavour the prompt, so a candidate
+        generated before the answer is still valid after it.
+        Mental health questions adapt to the free-text answers, so those
+        are part of their fingerprint.
+        """
+        if name == "generate_mbti_question":
+            _, answers, index = args
+            return (
+                name, index, kwargs["decline"], tuple(kwargs["skip_history"]),
+                tuple(a["question"] for a in answers),
+            )
+        if name == "generate_mental_health_question":
+            _, answers, index = args
+            return (
+                name, index, kwargs["decline"], tuple(kwargs["skip_history"]),
+                tuple((a["question"], a["answer"]) for a in answers),
+            )
+        return None
+
+    def _take_prefetched(self, user_id, step):
+        fingerprint = self._fingerprint(step.name, step.args, step.kwargs)
+        if fingerprint is None or not self.prefetch_enabled:
+            return None
+        with self._prefetch_lock:
+            future = self._prefetch.get(user_id, {}).pop(fingerprint, None)
+            # Still queued behind other users' candidates: running it now is faster
+            if future is not None and future.cancel():
+                future = None
+            if future is None:
+                self.prefetch_misses += 1
+            else:
+                self.prefetch_hits += 1
+        return future
+
+    def _prefetch_candidates(self, session):
+        """(name, args, kwargs) of the calls the next turn may make."""
+        step = session.step
+        candidates = []
+
+        def mbti(index, skip_history, decline, answers=None):
+            candidates.append((
+                "generate_mbti_question",
+                (list(session.history), list(answers or session.personality_answers), index),
+                {"skip_history": list(skip_history), "decline": decline},
+            ))
+
+        def mental(index, skip_history, decline):
+            candidates.append((
+                "generate_mental_health_question",
+                (list(session.history), list(session.mental_answers), index),
+                {"skip_history": list(skip_history), "decline": decline},
+            ))
+
+        if step == "waiting_for_start":
+            mbti(1, session.personality_skip_history, False)
+
+        elif step.startswith("personality_") and session.current_question:
+            q_num = int(step.split("_")[1])
+            skipped = session.personality_skip_history + [session.current_question]
+            if q_num < 5:
+                # The answer itself is not known yet, only which question it belongs to
+                answered = session.personality_answers + [
+                    {"question": session.current_question, "answer": ""}
+                ]
+                mbti(q_num + 1, session.personality_skip_history, False, answered)
+            mbti(q_num, skipped, False)
+            mbti(q_num, skipped, True)
+
+        elif step == "mental_1" and not session.last_mental_question:
+            # Question 6 is generated from what is already known
+            mental(6, session.mental_skip_history, False)
+
+        elif step.startswith("mental_") and session.last_mental_question:
+            # The next question adapts to the answer; only skip/decline are predictable
+            q_num = int(step.split("_")[1])
+            skipped = session.mental_skip_history + [session.last_mental_question]
+            mental(q_num + 5, skipped, False)
+            mental(q_num + 5, skipped, True)
+
+        return candidates
+
+    def _schedule_prefetch(self, user_id, session):
+        """Start the candidates of the user's next turn, dropping stale ones."""
+        if not self.prefetch_enabled:
+            return
+        with self._prefetch_lock:
+            old = self._prefetch.pop(user_id, {})
+            if session is None:
+                for future in old.values():
+                    future.cancel()
+                return
+
+            pending = {}
+            for name, args, kwargs in self._prefetch_candidates(session):
+                fingerprint = self._fingerprint(name, args, kwargs)
+                future = old.pop(fingerprint, None)
+                if future is None:
+                    future = self._prefetch_executor.submit(getattr(self.bot, name), *args, **kwargs)
+                pending[fingerprint] = future
+            for future in old.values():
+                future.cancel()
+            if pending:
+                self._prefetch[user_id] = pending
+
+    def drop_prefetch(self, user_id):
+        """Cancel and forget the user's prefetched candidates."""
+        with self._prefetch_lock:
+            for future in self._prefetch.pop(user_id, {}).values():
+                future.cancel()
+
+    def prefetch_stats(self) -> dict:
+        with self._prefetch_lock:
+            total = self.prefetch_hits + self.prefetch_misses
+            return {
+                "enabled": self.prefetch_enabled,
+                "pending": sum(len(p) for p in self._prefetch.values()),
+                "hits": self.prefetch_hits,
+                "misses": self.prefetch_misses,
+                "hit_rate": round(self.prefetch_hits / total, 3) if total else 0.0,
+            }
+
+    # ---------------- Report jobs ----------------
+
+    def _report_job(self, user_id, personality_answers, mental_answers, history):
+        """
+        The user's report job: the one running here, the one another worker
+        is running (followed through the shared store), or a new one.
+        """
+        job = self.report_jobs.get(user_id)
+        if job is None or job.abandoned:
+            # Snapshots, so later edits of the session cannot leak into the report
+            personality_answers, mental_answers, history = (
+                list(personality_answers), list(mental_answers), list(history)
+            )
+            job = ReportJob(
+                user_id,
+                lambda: self.bot.stream_final_report(personality_answers, mental_answers, history),
+                store=self.reports,
+            )
+            if job.claim():
+                job.start(self._report_executor)
+            else:
+                job = SharedReportJob(user_id, self.reports)
+            self.report_jobs[user_id] = job
+        return job
+
+    def _report_text(self, user_id, args):
+        job = self._report_job(user_id, *args)
+        text = job.result()
+        if job.abandoned:
+            # The worker writing it died; write it here
+            text = self._report_job(user_id, *args).result()
+        return text
+
+    async def _areport_text(self, user_id, args):
+        # Claiming or following a job reads the store: off the event loop
+        job = await asyncio.to_thread(self._report_job, user_id, *args)
+        text = await job.aresult()
+        if job.abandoned:
+            job = await asyncio.to_thread(self._report_job, user_id, *args)
+            text = await job.aresult()
+        return text
+
+    def report_status(self, user_id):
+        """Progress of the user's report job (here or in another worker), or None if there is none."""
+        job = self.report_jobs.get(user_id)
+        if job is not None:
+            return job.info()
+        entry = self.reports.get(user_id)
+        return report_info(entry) if entry else None
+
+    def find_report(self, user_id):
+        """The user's report job (here or in another worker) without starting one; None if there is none."""
+        job = self.report_jobs.get(user_id)
+        if job is None and user_id in self.reports:
+            job = SharedReportJob(user_id, self.reports)
+        return job
+
+    def drop_report(self, user_id):
+        """Forget the user's report job; a running one finishes but is no longer published."""
+        job = self.report_jobs.pop(user_id, None)
+        if job is not None:
+            job.detach()
+        self.reports.pop(user_id, None)
+
+    def _after_turn(self, user_id, session):
+        if session is None:
+            # Finished or exited: the report has been delivered or is unwanted
+            self.drop_report(user_id)
+        elif session.step == "generating_report":
+            self._report_job(
+                user_id, session.personality_answers, session.mental_answers, session.history
+            )
+        self._schedule_prefetch(user_id, session)
+        self._sweep()
+
+    def _sweep(self, interval: float = 60.0):
+        """
+        Drop prefetches and report jobs of sessions the store has expired
+        or another process has ended (checked at most once per interval).
+        """
+        now = time.time()
+        if now - self._last_sweep < interval:
+            return
+        self._last_sweep = now
+        for user_id in set(self._prefetch) | set(self.report_jobs):
+            # `in` does not refresh the TTL, so this never keeps a session alive
+            if user_id not in self.sessions:
+                self.drop_report(user_id)
+                self.drop_prefetch(user_id)
+
+    def end_session(self, user_id):
+        """Delete the user's session together with its report job and prefetched questions."""
+        self.sessions.pop(user_id, None)
+        self.drop_report(user_id)
+        self.drop_prefetch(user_id)
+
+    # ---------------- Drivers ----------------
+
+    def _run_step(self, user_id, step):
+        if step.name == "empathy_response":
+            return self._get_empathy_response(*step.args, **step.kwargs)
+        if step.name == "generate_final_report":
+            return self._report_text(user_id, step.args)
+        future = self._take_prefetched(user_id, step)
+        if future is not None:
+            try:
+                return future.result()
+            except Exception as e:
+                logger.warning(f"Prefetched {step.name} failed ({e}), generating again.")
+        return getattr(self.bot, step.name)(*step.args, **step.kwargs)
+
+    async def _arun_step(self, user_id, step):
+        if step.name == "empathy_response":
+            return await self._aget_empathy_response(*step.args, **step.kwargs)
+        if step.name == "generate_final_report":
+            return await self._areport_text(user_id, step.args)
+        future = self._take_prefetched(user_id, step)
+        if future is not None:
+            try:
+                return await asyncio.wrap_future(future)
+            except Exception as e:
+                logger.warning(f"Prefetched {step.name} failed ({e}), generating again.")
+        return await getattr(self.bot, "a" + step.name)(*step.args, **step.kwargs)
+
+    def _user_lock(self, user_id):
+        lock = self._user_locks.get(user_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._user_locks[user_id] = lock
+        return lock
+
     def process_user_message(self, user_id, message):
         """
         Main API endpoint for Android.
@@ -517,16 +1147,107 @@ class ConversationManager:
             "phase": str,              # "personality" or "mental_health"
             "is_finished": bool,       # True if assessment complete
             "final_report": str,       # Final summary (only if is_finished=True)
+            "report_pending": bool,    # Final report is being written (see report_status)
             "error": str               # Error message if any
         }
         """
         session = self._get_session(user_id)
+        steps = self._turn_steps(user_id, session, message)
+        response = None
+        try:
+            step = next(steps)
+            while True:
+                step = steps.send(self._run_step(user_id, step))
+        except StopIteration as done:
+            response = done.value
+        finally:
+            steps.close()
+            self._end_turn(user_id, session, response)
+        return response
+
+    async def aprocess_user_message(self, user_id, message):
+        """
+        process_user_message for the async API: LLM calls use the async
+        client, retrieval runs on the bot's embedding executor and the
+        session store (sqlite/redis I/O) on a worker thread, so the event
+        loop keeps serving other users meanwhile.
+        """
+        async with self._user_lock(user_id):
+            session = await asyncio.to_thread(self._get_session, user_id)
+            steps = self._turn_steps(user_id, session, message)
+            response = None
+            try:
+                step = next(steps)
+                while True:
+                    step = steps.send(await self._arun_step(user_id, step))
+            except StopIteration as done:
+                response = done.value
+            finally:
+                steps.close()
+                await asyncio.to_thread(self._end_turn, user_id, session, response)
+            return response
+
+    async def astream_user_message(self, user_id, message):
+        """
+        aprocess_user_message for streaming clients. Yields ("delta", text)
+        while the final report is being written, then ("result", response).
+        Every other turn yields only its result.
+        """
+        async with self._user_lock(user_id):
+            session = await asyncio.to_thread(self._get_session, user_id)
+            steps = self._turn_steps(user_id, session, message)
+            response = None
+            try:
+                step = next(steps)
+                while True:
+                    if step.name == "generate_final_report":
+                        # Replays what the job has written so far, then follows it live.
+                        # Deltas already sent cannot be taken back, so a followed job whose
+                        # worker dies ends the report here with the text it got to
+                        parts = []
+                        job = await asyncio.to_thread(self._report_job, user_id, *step.args)
+                        async for delta in job.asubscribe():
+                            parts.append(delta)
+                            yield "delta", delta
+                        result = "".join(parts)
+                    else:
+                        result = await self._arun_step(user_id, step)
+                    step = steps.send(result)
+            except StopIteration as done:
+                response = done.value
+            finally:
+                # Also when the client is gone mid-turn: save what the turn changed so far
+                steps.close()
+                await asyncio.to_thread(self._end_turn, user_id, session, response)
+            yield "result", response
+
+    def _end_turn(self, user_id, session, response):
+        """
+        Write the session back to the store, or delete it once the
+        conversation finished, then start what follows the turn. A turn cut
+        short (response None: an error, or a streaming client disconnecting)
+        still writes the session, so every store keeps what the memory
+        store keeps. The async drivers run this on a worker thread.
+        """
+        finished = bool(response and response.get("is_finished"))
+        if finished:
+            self.sessions.pop(user_id, None)
+        else:
+            self.sessions[user_id] = session
+        if response is not None:
+            self._after_turn(user_id, None if finished else session)
+
+    def _turn_steps(self, user_id, session, message):
+        """
+        One turn of the conversation (generator): yields a _Step for every
+        slow call and returns the response dict. It never touches the
+        session store; the drivers load the session and call _end_turn.
+        """
         
         # Check safety first
-        if not self._check_safety(message, session["risk_session_id"]):
-            result = self.detector.decide(message, rag_client=None, session_id=session["risk_session_id"])
+        if not self._check_safety(message, session.risk_session_id):
+            result = self.detector.decide(message, rag_client=None, session_id=session.risk_session_id)
             referral_msg = self.detector.format_referral_message(result)
-            del self.sessions[user_id]  # Clean up session
             return {
                 "response": referral_msg,
                 "options": [],
@@ -544,21 +1265,22 @@ class ConversationManager:
             "phase": None,
             "is_finished": False,
             "final_report": None,
+            "report_pending": False,
             "error": None
         }
         
-        step = session["step"]
+        step = session.step
         msg = message.strip()
         
         # 1. INTRO STEP - Initial greeting (matches CLI)
         if step == "intro":
-            session["show_header"] = True
+            session.show_header = True
             response_data["response"] = (
                 "\n Hello, I'm Anees. Think of me as your supportive guide and companion "
                 "on the journey to understanding yourself better and finding inner balance.\n\n"
                 "To help us get settled, how are you feeling right now?"
             )
-            session["step"] = "feeling_check"
+            session.step = "feeling_check"
             response_data["phase"] = "intro"
         
         # 2. FEELING CHECK - Ask how they feel (matches CLI)
@@ -574,12 +1296,12 @@ class ConversationManager:
                 return response_data
             
             # Generate empathetic response like CLI does
-            anees_reply = self._get_empathy_response(feeling)
+            anees_reply = yield _Step("empathy_response", feeling)
             response_data["response"] = f"{anees_reply}\n\n" + \
                 "I'd like to guide you through a gentle discovery session. " + \
                 "This will help us understand exactly where you are emotionally and how I can best support you.\n\n" + \
                 "Are you ready to begin? (yes/no)"
-            session["step"] = "ready_check"
+            session.step = "ready_check"
             response_data["phase"] = "intro"
         
         # 3. READY CHECK - Ask if ready to begin
@@ -588,24 +1310,23 @@ class ConversationManager:
             if ready not in ["yes", "y"]:
                 response_data["response"] = "That's completely okay. Whenever you're ready, you can come back and we'll begin. 💛"
                 response_data["is_finished"] = True
-                if user_id in self.sessions:
-                    del self.sessions[user_id]
                 return response_data
             
             response_data["response"] = "Great. We'll begin gently, starting with some personality reflections.\n"
-            session["step"] = "waiting_for_start"
-            session["phase"] = "personality"
+            session.step = "waiting_for_start"
+            session.phase = "personality"
             response_data["phase"] = "personality"
         
         # 4. WAITING FOR START - Start personality questions
         elif step == "waiting_for_start":
             if msg.lower() in ["ready", "yes", "start"] or step == "waiting_for_start":
                 # Start with first personality question (Question 1/5)
-                question, options = self.bot.generate_mbti_question(
-                    session["history"],
-                    session["personality_answers"],
+                question, options = yield _Step(
+                    "generate_mbti_question",
+                    session.history,
+                    session.personality_answers,
                     1,
-                    skip_history=session["personality_skip_history"],
+                    skip_history=session.personality_skip_history,
                     decline=False
                 )
                 
@@ -618,12 +1339,7 @@ class ConversationManager:
                         opt = f"{current_letter}) {opt}"
                     formatted_options.append(opt)
                 
-                session["current_question_data"] = {
-                    "question": question,
-                    "options": formatted_options,
-                    "type": "personality",
-                    "number": 1
-                }
+                session.show_question(question, formatted_options)
                 
                 # Build response exactly like CLI
                 response_text = f"[Personality Question 1/5]\n {question}\n"
@@ -635,7 +1351,7 @@ class ConversationManager:
                 response_data["options"] = formatted_options
                 response_data["question_number"] = 1
                 response_data["phase"] = "personality"
-                session["step"] = "personality_1"
+                session.step = "personality_1"
             else:
                 response_data["response"] = "Whenever you're ready, just type 'ready' to begin."
         
@@ -647,19 +1363,20 @@ class ConversationManager:
             
             # Get valid letters for display
             alphabet = ["A", "B", "C", "D"]
-            valid_letters = alphabet[:len(session["current_question_data"]["options"])]
+            valid_letters = alphabet[:len(session.current_options)]
             
             # Handle skip/decline - with CLI-style messages
             if msg.upper() == "SKIP":
                 # Add to skip history
-                session["personality_skip_history"].append(session["current_question_data"]["question"])
+                session.skip_personality()
                 
                 # Generate new question from same category
-                question, options = self.bot.generate_mbti_question(
-                    session["history"],
-                    session["personality_answers"],
+                question, options = yield _Step(
+                    "generate_mbti_question",
+                    session.history,
+                    session.personality_answers,
                     q_num,
-                    skip_history=session["personality_skip_history"],
+                    skip_history=session.personality_skip_history,
                     decline=False
                 )
                 
@@ -671,12 +1388,7 @@ class ConversationManager:
                         opt = f"{current_letter}) {opt}"
                     formatted_options.append(opt)
                 
-                session["current_question_data"] = {
-                    "question": question,
-                    "options": formatted_options,
-                    "type": "personality",
-                    "number": q_num
-                }
+                session.show_question(question, formatted_options)
                 
                 # Build CLI-style response
                 response_text = "Okay, let's try another question on a similar topic.\n"
@@ -690,14 +1402,15 @@ class ConversationManager:
                 
             elif msg.upper() == "DECLINE":
                 # Add to skip history
-                session["personality_skip_history"].append(session["current_question_data"]["question"])
+                session.skip_personality()
                 
                 # Generate new question from NEW category
-                question, options = self.bot.generate_mbti_question(
-                    session["history"],
-                    session["personality_answers"],
+                question, options = yield _Step(
+                    "generate_mbti_question",
+                    session.history,
+                    session.personality_answers,
                     q_num,
-                    skip_history=session["personality_skip_history"],
+                    skip_history=session.personality_skip_history,
                     decline=True
                 )
                 
@@ -709,12 +1422,7 @@ class ConversationManager:
                         opt = f"{current_letter}) {opt}"
                     formatted_options.append(opt)
                 
-                session["current_question_data"] = {
-                    "question": question,
-                    "options": formatted_options,
-                    "type": "personality",
-                    "number": q_num
-                }
+                session.show_question(question, formatted_options)
                 
                 # Build CLI-style response
                 response_text = "I understand. Let's move to a different type of question.\n"
@@ -729,8 +1437,6 @@ class ConversationManager:
             elif msg.upper() == "EXIT":
                 response_data["response"] = "\nNo worries. We can pause here. Take care 💛"
                 response_data["is_finished"] = True
-                if user_id in self.sessions:
-                    del self.sessions[user_id]
                 return response_data
                 
             else:
@@ -738,28 +1444,26 @@ class ConversationManager:
                 if msg and msg[0].upper() in ["A", "B", "C", "D"]:
                     # Save answer
                     selected_option = next(
-                        (opt for opt in session["current_question_data"]["options"] 
+                        (opt for opt in session.current_options 
                          if opt.startswith(msg[0].upper())),
                         msg
                     )
                     
-                    session["personality_answers"].append({
-                        "question": session["current_question_data"]["question"],
-                        "answer": selected_option
-                    })
-                    session["history"].append({
-                        "role": "user",
-                        "content": f"For the personality question '{session['current_question_data']['question']}', my answer is: {selected_option}."
-                    })
+                    session.answer_personality(selected_option)
+                    session.add_history(
+                        "user",
+                        f"For the personality question '{session.current_question}', my answer is: {selected_option}."
+                    )
                     
                     # Move to next question or switch to mental health
                     next_q = q_num + 1
                     if next_q <= 5:
-                        question, options = self.bot.generate_mbti_question(
-                            session["history"],
-                            session["personality_answers"],
+                        question, options = yield _Step(
+                            "generate_mbti_question",
+                            session.history,
+                            session.personality_answers,
                             next_q,
-                            skip_history=session["personality_skip_history"],
+                            skip_history=session.personality_skip_history,
                             decline=False
                         )
                         
@@ -771,12 +1475,7 @@ class ConversationManager:
                                 opt = f"{current_letter}) {opt}"
                             formatted_options.append(opt)
                         
-                        session["current_question_data"] = {
-                            "question": question,
-                            "options": formatted_options,
-                            "type": "personality",
-                            "number": next_q
-                        }
+                        session.show_question(question, formatted_options)
                         
                         # Build CLI-style response
                         response_text = f" [Personality Question {next_q}/5]\n{question}\n"
@@ -787,24 +1486,24 @@ class ConversationManager:
                         response_data["response"] = response_text
                         response_data["options"] = formatted_options
                         response_data["question_number"] = next_q
-                        session["step"] = f"personality_{next_q}"
+                        session.step = f"personality_{next_q}"
                     else:
                         # Switch to mental health - exactly like CLI
                         response_data["response"] = "\n Thank you. Now we'll shift gently into understanding your emotional world a bit better.\n"
-                        session["step"] = "mental_1"
-                        session["phase"] = "mental_health"
+                        session.step = "mental_1"
+                        session.phase = "mental_health"
                         response_data["phase"] = "mental_health"
                 else:
                     # Invalid input - show error like CLI
-                    if session["current_question_data"]:
+                    if session.current_question:
                         response_text = f"Please choose one of: {', '.join(valid_letters)}, or type 'skip' or 'decline'\n\n"
-                        response_text += f"[Personality Question {q_num}/5]\n{session['current_question_data']['question']}\n"
-                        for opt in session["current_question_data"]["options"]:
+                        response_text += f"[Personality Question {q_num}/5]\n{session.current_question}\n"
+                        for opt in session.current_options:
                             response_text += f"  {opt}\n"
                         response_text += f"\nYour choice ({'/'.join(valid_letters)}), 'skip', 'decline', or 'exit': "
                         
                         response_data["response"] = response_text
-                        response_data["options"] = session["current_question_data"]["options"]
+                        response_data["options"] = session.current_options
                     else:
                         response_data["response"] = f"Please choose one of: {', '.join(valid_letters)}, or type 'skip' or 'decline'"
         
@@ -817,19 +1516,20 @@ class ConversationManager:
             
             # Handle skip/decline/exit - with CLI-style messages
             if msg.lower() == "skip":
-                if session["last_mental_question"]:
-                    session["mental_skip_history"].append(session["last_mental_question"])
+                if session.last_mental_question:
+                    session.skip_mental()
                 
                 # Generate new question from same category
-                question = self.bot.generate_mental_health_question(
-                    session["history"],
-                    session["mental_answers"],
+                question = yield _Step(
+                    "generate_mental_health_question",
+                    session.history,
+                    session.mental_answers,
                     q_num + 5,  # Offset
-                    skip_history=session["mental_skip_history"],
+                    skip_history=session.mental_skip_history,
                     decline=False
                 )
                 
-                session["last_mental_question"] = question
+                session.last_mental_question = question
                 
                 # Build CLI-style response
                 response_text = "Okay, let's try another question on a similar topic.\n"
@@ -839,19 +1539,20 @@ class ConversationManager:
                 response_data["response"] = response_text
                 
             elif msg.lower() == "decline":
-                if session["last_mental_question"]:
-                    session["mental_skip_history"].append(session["last_mental_question"])
+                if session.last_mental_question:
+                    session.skip_mental()
                 
                 # Generate new question from NEW category
-                question = self.bot.generate_mental_health_question(
-                    session["history"],
-                    session["mental_answers"],
+                question = yield _Step(
+                    "generate_mental_health_question",
+                    session.history,
+                    session.mental_answers,
                     q_num + 5,  # Offset
-                    skip_history=session["mental_skip_history"],
+                    skip_history=session.mental_skip_history,
                     decline=True
                 )
                 
-                session["last_mental_question"] = question
+                session.last_mental_question = question
                 
                 # Build CLI-style response
                 response_text = " I understand. Let's move to a different type of question.\n"
@@ -863,46 +1564,40 @@ class ConversationManager:
             elif msg.lower() == "exit":
                 response_data["response"] = "\nThank you for sharing what you could. Take care of yourself 💛"
                 response_data["is_finished"] = True
-                if user_id in self.sessions:
-                    del self.sessions[user_id]
                 return response_data
                 
             else:
                 # Save answer and move to next
                 if q_num == 1:
                     # First mental health question - generate it
-                    question = self.bot.generate_mental_health_question(
-                        session["history"],
-                        session["mental_answers"],
+                    question = yield _Step(
+                        "generate_mental_health_question",
+                        session.history,
+                        session.mental_answers,
                         6,  # Question 6 overall
-                        skip_history=session["mental_skip_history"],
+                        skip_history=session.mental_skip_history,
                         decline=False
                     )
-                    session["last_mental_question"] = question
+                    session.last_mental_question = question
                     
                     # Save answer to previous question (if any)
                     if msg:
-                        session["mental_answers"].append({
-                            "question": session["last_mental_question"],
-                            "answer": msg
-                        })
-                        session["history"].append({
-                            "role": "user",
-                            "content": f"Answer: {msg}"
-                        })
+                        session.answer_mental(msg)
+                        session.add_history("user", f"Answer: {msg}")
                     
                     # Move to next question
                     next_q = q_num + 1
                     if next_q <= 5:
-                        question = self.bot.generate_mental_health_question(
-                            session["history"],
-                            session["mental_answers"],
+                        question = yield _Step(
+                            "generate_mental_health_question",
+                            session.history,
+                            session.mental_answers,
                             next_q + 5,  # Offset
-                            skip_history=session["mental_skip_history"],
+                            skip_history=session.mental_skip_history,
                             decline=False
                         )
                         
-                        session["last_mental_question"] = question
+                        session.last_mental_question = question
                         
                         # Build CLI-style response
                         response_text = f"\nAnees [Mental Health Question {next_q}/5]\n{question}\n"
@@ -910,36 +1605,32 @@ class ConversationManager:
                         
                         response_data["response"] = response_text
                         response_data["question_number"] = next_q + 5
-                        session["step"] = f"mental_{next_q}"
+                        session.step = f"mental_{next_q}"
                     else:
                         # Generate final report
                         response_data["response"] = "\n Thank you for completing all 10 questions. " + \
                                                   "Let me take a moment to reflect on everything you shared.\n"
-                        session["step"] = "generating_report"
-                        # Don't return yet - go to generating report
+                        session.step = "generating_report"
+                        # The report job starts right after this turn; fetch it from /report or the next message
+                        response_data["report_pending"] = True
                 else:
                     # Not first question - save answer and generate next
-                    if session["last_mental_question"] and msg:
-                        session["mental_answers"].append({
-                            "question": session["last_mental_question"],
-                            "answer": msg
-                        })
-                        session["history"].append({
-                            "role": "user",
-                            "content": f"Answer: {msg}"
-                        })
+                    if session.last_mental_question and msg:
+                        session.answer_mental(msg)
+                        session.add_history("user", f"Answer: {msg}")
                     
                     next_q = q_num + 1
                     if next_q <= 5:
-                        question = self.bot.generate_mental_health_question(
-                            session["history"],
-                            session["mental_answers"],
+                        question = yield _Step(
+                            "generate_mental_health_question",
+                            session.history,
+                            session.mental_answers,
                             next_q + 5,  # Offset
-                            skip_history=session["mental_skip_history"],
+                            skip_history=session.mental_skip_history,
                             decline=False
                         )
                         
-                        session["last_mental_question"] = question
+                        session.last_mental_question = question
                         
                         # Build CLI-style response
                         response_text = f"\nAnees [Mental Health Question {next_q}/5]\n {question}\n"
@@ -947,21 +1638,23 @@ class ConversationManager:
                         
                         response_data["response"] = response_text
                         response_data["question_number"] = next_q + 5
-                        session["step"] = f"mental_{next_q}"
+                        session.step = f"mental_{next_q}"
                     else:
                         # Generate final report
                         response_data["response"] = "\nThank you for completing all 10 questions. " + \
                                                   "Let me take a moment to reflect on everything you shared.\n"
-                        session["step"] = "generating_report"
-                        # Don't return yet - go to generating report
+                        session.step = "generating_report"
+                        # The report job starts right after this turn; fetch it from /report or the next message
+                        response_data["report_pending"] = True
         
         # 7. GENERATING FINAL REPORT - Match CLI format exactly
         elif step == "generating_report":
             # Generate final report
-            final_report = self.bot.generate_final_report(
-                session["personality_answers"],
-                session["mental_answers"],
-                session["history"]
+            final_report = yield _Step(
+                "generate_final_report",
+                session.personality_answers,
+                session.mental_answers,
+                session.history
             )
             
             # Build CLI-style response
@@ -974,10 +1667,6 @@ class ConversationManager:
             response_data["final_report"] = final_report
             response_data["is_finished"] = True
             response_data["phase"] = "completed"
-            
-            # Clean up session
-            if user_id in self.sessions:
-                del self.sessions[user_id]
         
         return response_data
 
@@ -1030,10 +1719,8 @@ def run_assessment():
 
     # Generate an empathetic response using GPT
     try:
-        # Re-instantiating bot here isn't strictly necessary since we have 'bot' above, 
-        # but we use the existing instance to call openai.
-        empathetic_resp = bot.openai.chat.completions.create(
-            model=bot.openai_model,
+        # Use the existing instance's LLM backend
+        Anees_reply = bot.llm.complete(
             messages=[
                 {
                     "role": "system",
@@ -1053,9 +1740,9 @@ def run_assessment():
                 }
             ],
             temperature=0.6,
-            max_tokens=150
-        )
-        Anees_reply = empathetic_resp.choices[0].message.content.strip()
+            max_tokens=150,
+            purpose="empathy",
+        ).strip()
 
     except Exception:
         Anees_reply = "I'm really glad you shared that with me. Thank you for being open."
@@ -1287,10 +1974,10 @@ def run_assessment():
     print("\nAnees: Thank you for completing all 10 questions. "
           "Let me take a moment to reflect on everything you shared.\n")
 
-    final_report = bot.generate_final_report(personality_answers, mental_answers, history)
-
     print("Anees – Your Integrated Summary :\n")
-    print(final_report)
+    for delta in bot.stream_final_report(personality_answers, mental_answers, history):
+        print(delta, end="", flush=True)
+    print()
     
     print("\nAnees: Remember, this is not a diagnosis. If you're having a tough time, "
           "speaking with a trusted mental health professional can be incredibly helpful. 💛")
@@ -1,92 +1,144 @@
 #!/usr/bin/env python3
 import argparse
 import json
-import fitz  
+import fitz
 import os
 import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from chunking import STRATEGIES, ChunkingEngine
 
-def chunk_pdf_to_jsonl(input_pdf, output_jsonl):
+def chunk_page_range(input_pdf, start_page, end_page, engine_options):
+    """
+    Worker: open our own fitz document and chunk pages [start_page, end_page).
+    Returns ready-to-write JSON lines so serialization also happens in the pool.
+    """
+    engine = ChunkingEngine(**engine_options)
+    doc = fitz.open(input_pdf)
+    total_pages = len(doc)
+    source_file = os.path.basename(input_pdf)
+
+    lines = []
+    for page_num in range(start_page, end_page):
+        page = doc.load_page(page_num)
+        for chunk_data in engine.chunk_page(page, page_num, total_pages, source_file):
+            # Write as JSON line and support non english
+            lines.append(json.dumps(chunk_data, ensure_ascii=False) + '\n')
+
+    doc.close()
+    return lines
+
+def _write_shards_in_order(input_pdf, total_pages, outfile, engine, workers, pages_per_shard):
+    """
+    Fan page ranges out to a process pool and stream the results to outfile
+    in page order. At most 2 shards per worker are in flight, so memory stays
+    bounded no matter how long the document is.
+    """
+    shards = deque(
+        (start, min(start + pages_per_shard, total_pages))
+        for start in range(0, total_pages, pages_per_shard)
+    )
+    chunk_count = 0
+    pages_done = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        while shards or pending:
+            while shards and len(pending) < workers * 2:
+                start, end = shards.popleft()
+                pending.append((end - start, pool.submit(chunk_page_range, input_pdf, start, end, engine.options())))
+
+            # Always wait for the oldest shard so output stays in page order
+            shard_pages, future = pending.popleft()
+            lines = future.result()
+            outfile.writelines(lines)
+            chunk_count += len(lines)
+            pages_done += shard_pages
+            print(f"   Chunked {pages_done}/{total_pages} pages", end='\r')
+
+    print()
+    return chunk_count
+
+def chunk_pdf_to_jsonl(input_pdf, output_jsonl, workers=1, pages_per_shard=16, engine=None):
 
     if not os.path.exists(input_pdf):
         print(f"Error: Input file '{input_pdf}' does not exist")
         sys.exit(1)
-    
+
+    engine = engine or ChunkingEngine()
+
     try:
         # Opening PDF doc
         doc = fitz.open(input_pdf)
         total_pages = len(doc)
-        
+
         #To check the right doc
         print(f"Found {total_pages} pages in document")
-        
+        print(f"Chunking strategy: {engine.strategy}")
+
         # Create output directory if it doesn't exist
         os.makedirs(os.path.dirname(os.path.abspath(output_jsonl)), exist_ok=True)
-        
+
+        start_time = time.time()
+
         # Process each page and write to JSONL
         with open(output_jsonl, 'w', encoding='utf-8') as outfile:
-            chunk_count = 0
-            
-            for page_num in range(total_pages):
-                page = doc.load_page(page_num)
-                text = page.get_text().strip()
-                
-                """
-                   # To split text based on paragraphs 
-                    raw_text = page.get_text().strip()
-                    paragraphs = [p.strip() for p in raw_text.split("\n\n") if len(p.strip()) > 40]
-                    lines = raw_text.split("\n")
-                    possible_headers = [
-                        line.strip()
-                        for line in lines
-                        if line.isupper() and 5 < len(line) < 120
-                    ]
-                    current_header = possible_headers[0] if possible_headers else None
-                    #if this is implied we must change Metadata "section_title": current_header,
-                    for para_idx, paragraph in enumerate(paragraphs):
-                    chunk_data = {
-                        "chunk_id": f"page_{page_num+1}_para_{para_idx+1}",
-                        "page_number": page_num + 1,
-                        "paragraph_number": para_idx + 1,
-                        "total_pages": total_pages,
-                        "text": paragraph,
-                        "source_file": os.path.basename(input_pdf),
-                    }
-
-
-                """
-
-
-                # Only create chunk if page has text and avoid empty space saving 
-                if text:
-                    chunk_data = {
-                        "chunk_id": f"page_{page_num + 1}",
-                        "page_number": page_num + 1,
-                        "total_pages": total_pages,
-                        "text": text,
-                        "source_file": os.path.basename(input_pdf)
-                    }
-                    
-                    # Write as JSON line and support non english
-                    json_line = json.dumps(chunk_data, ensure_ascii=False)
-                    outfile.write(json_line + '\n')
-                    chunk_count += 1
-        
-        doc.close()
+            if workers > 1:
+                doc.close()
+                print(f"Chunking with {workers} worker processes ({pages_per_shard} pages per shard)")
+                chunk_count = _write_shards_in_order(input_pdf, total_pages, outfile, engine, workers, pages_per_shard)
+            else:
+                chunk_count = 0
+                source_file = os.path.basename(input_pdf)
+
+                for page_num in range(total_pages):
+                    page = doc.load_page(page_num)
+                    for chunk_data in engine.chunk_page(page, page_num, total_pages, source_file):
+                        # Write as JSON line and support non english
+                        json_line = json.dumps(chunk_data, ensure_ascii=False)
+                        outfile.write(json_line + '\n')
+                        chunk_count += 1
+
+                doc.close()
+
+        elapsed = max(time.time() - start_time, 1e-6)
         print(f"Successfully created {chunk_count} chunks in {output_jsonl}")
-        
+        print(f"Processed {total_pages} pages in {elapsed:.2f}s ({total_pages / elapsed:.1f} pages/sec)")
+
     except Exception as e:
         print(f"Error processing PDF: {e}")
         sys.exit(1)
 
 #command line helo
 def main():
-    parser = argparse.ArgumentParser(description='Chunk PDF documents by page for RAG')
+    parser = argparse.ArgumentParser(description='Chunk PDF documents for RAG')
     parser.add_argument('--input', '-i', required=True, help='Input PDF file path')
     parser.add_argument('--output', '-o', required=True, help='Output JSONL file path')
-    
+    parser.add_argument('--workers', '-w', type=int, default=1,
+                        help=f'Worker processes for page-parallel chunking (default: 1, this machine has {os.cpu_count()} cores)')
+    parser.add_argument('--pages-per-shard', type=int, default=16, help='Pages handed to a worker at a time (default: 16)')
+    parser.add_argument('--strategy', '-s', choices=STRATEGIES, default='page', help='Chunking strategy (default: page)')
+    parser.add_argument('--chunk-tokens', type=int, default=512, help='Tokens per chunk for tokens/sliding strategies (default: 512)')
+    parser.add_argument('--overlap', type=int, default=64, help='Overlapping tokens for the sliding strategy (default: 64)')
+    parser.add_argument('--tokenizer', default='BAAI/bge-m3', help='Tokenizer used to count tokens, should match the embedder (default: BAAI/bge-m3)')
+
     args = parser.parse_args()
-    
-    chunk_pdf_to_jsonl(args.input, args.output)
+    if args.pages_per_shard < 1:
+        parser.error('--pages-per-shard must be at least 1')
+
+    try:
+        engine = ChunkingEngine(
+            strategy=args.strategy,
+            chunk_tokens=args.chunk_tokens,
+            overlap=args.overlap,
+            tokenizer_name=args.tokenizer,
+        )
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    chunk_pdf_to_jsonl(args.input, args.output, workers=args.workers, pages_per_shard=args.pages_per_shard, engine=engine)
 
 if __name__ == "__main__":
     main()
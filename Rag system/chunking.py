@@ -0,0 +1,186 @@
+# chunking.py
+from typing import Dict, List, Tuple
+
+# Chunking strategies used by chunk.py.
+#   page      - one chunk per page (original behaviour)
+#   paragraph - one chunk per text block, with section headers detected
+#   tokens    - fixed windows of `chunk_tokens` embedder tokens
+#   sliding   - token windows that overlap by `overlap` tokens
+# Every chunk keeps its page number, character offsets into the page text
+# and the section title in effect at that point of the page.
+
+STRATEGIES = ("page", "paragraph", "tokens", "sliding")
+
+MIN_PARAGRAPH_CHARS = 40
+
+_tokenizers = {}  # one tokenizer per worker process
+
+
+def get_tokenizer(name: str):
+    """Load (once per process) the tokenizer of the embedding model."""
+    if name not in _tokenizers:
+        from transformers import AutoTokenizer
+        _tokenizers[name] = AutoTokenizer.from_pretrained(name)
+    return _tokenizers[name]
+
+
+def is_header(line: str) -> bool:
+    line = line.strip()
+    return line.isupper() and 5 < len(line) < 120
+
+
+class ChunkingEngine:
+    """Turns PDF pages into JSONL chunk dicts using one of STRATEGIES."""
+
+    def __init__(
+        self,
+        strategy: str = "page",
+        chunk_tokens: int = 512,
+        overlap: int = 64,
+        tokenizer_name: str = "BAAI/bge-m3",
+    ):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown chunking strategy '{strategy}' (choose from {', '.join(STRATEGIES)})")
+        if strategy in ("tokens", "sliding") and chunk_tokens < 1:
+            raise ValueError("chunk_tokens must be at least 1")
+        if strategy == "sliding" and not 0 <= overlap < chunk_tokens:
+            raise ValueError("overlap must be smaller than chunk_tokens")
+
+        self.strategy = strategy
+        self.chunk_tokens = chunk_tokens
+        self.overlap = overlap if strategy == "sliding" else 0
+        self.tokenizer_name = tokenizer_name
+
+    def options(self) -> Dict:
+        """Constructor arguments, so worker processes can rebuild the engine."""
+        return {
+            "strategy": self.strategy,
+            "chunk_tokens": self.chunk_tokens,
+            "overlap": self.overlap,
+            "tokenizer_name": self.tokenizer_name,
+        }
+
+    # ---------------- Page text ----------------
+
+    @staticmethod
+    def _page_blocks(page) -> Tuple[str, List[Tuple[int, int]]]:
+        """
+        Page text plus (start, end) offsets of each text block in it.
+        page.get_text() is the concatenation of the text blocks, so offsets
+        are valid for every strategy.
+        """
+        text = ""
+        spans = []
+        for block in page.get_text("blocks"):
+            if block[6] != 0:  # image block
+                continue
+            start = len(text)
+            text += block[4]
+            spans.append((start, len(text)))
+        return text, spans
+
+    @staticmethod
+    def _headers(text: str) -> List[Tuple[int, str]]:
+        headers = []
+        offset = 0
+        for line in text.split("\n"):
+            if is_header(line):
+                headers.append((offset, line.strip()))
+            offset += len(line) + 1
+        return headers
+
+    @staticmethod
+    def _section_at(headers: List[Tuple[int, str]], offset: int) -> str:
+        # Most recent header before the offset, else the first one on the page
+        current = headers[0][1] if headers else ""
+        for header_offset, title in headers:
+            if header_offset > offset:
+                break
+            current = title
+        return current
+
+    # ---------------- Strategies ----------------
+
+    def _page_spans(self, text, block_spans):
+        stripped = text.strip()
+        if not stripped:
+            return []
+        start = text.index(stripped)
+        return [(start, start + len(stripped))]
+
+    def _paragraph_spans(self, text, block_spans):
+        spans = []
+        for start, end in block_spans:
+            block = text[start:end]
+            stripped = block.strip()
+            if len(stripped) <= MIN_PARAGRAPH_CHARS or is_header(stripped):
+                continue
+            s = start + block.index(stripped)
+            spans.append((s, s + len(stripped)))
+        return spans
+
+    def _token_spans(self, text, block_spans):
+        encoding = get_tokenizer(self.tokenizer_name)(
+            text, add_special_tokens=False, return_offsets_mapping=True
+        )
+        offsets = [o for o in encoding["offset_mapping"] if o[1] > o[0]]
+        if not offsets:
+            return []
+
+        step = self.chunk_tokens - self.overlap
+        spans = []
+        for first in range(0, len(offsets), step):
+            window = offsets[first:first + self.chunk_tokens]
+            spans.append((window[0][0], window[-1][1]))
+            if first + self.chunk_tokens >= len(offsets):
+                break
+        return spans
+
+    # ---------------- Public API ----------------
+
+    def chunk_page(self, page, page_num: int, total_pages: int, source_file: str) -> List[Dict]:
+        text, block_spans = self._page_blocks(page)
+        if not text.strip():
+            return []
+
+        if self.strategy == "page":
+            spans = self._page_spans(text, block_spans)
+        elif self.strategy == "paragraph":
+            spans = self._paragraph_spans(text, block_spans)
+        else:
+            spans = self._token_spans(text, block_spans)
+
+        headers = self._headers(text)
+        tokenizer = get_tokenizer(self.tokenizer_name) if self.strategy in ("tokens", "sliding") else None
+
+        chunks = []
+        for idx, (start, end) in enumerate(spans, start=1):
+            chunk_text = text[start:end].strip()
+            if not chunk_text:
+                continue
+
+            if self.strategy == "page":
+                chunk_id = f"page_{page_num + 1}"
+            elif self.strategy == "paragraph":
+                chunk_id = f"page_{page_num + 1}_para_{idx}"
+            else:
+                chunk_id = f"page_{page_num + 1}_chunk_{idx}"
+
+            chunk_data = {
+                "chunk_id": chunk_id,
+                "page_number": page_num + 1,
+                "total_pages": total_pages,
+                "text": chunk_text,
+                "source_file": source_file,
+                "char_start": start,
+                "char_end": end,
+                "section_title": self._section_at(headers, start),
+                "chunk_strategy": self.strategy,
+            }
+            if tokenizer is not None:
+                chunk_data["token_count"] = len(
+                    tokenizer(chunk_text, add_special_tokens=False)["input_ids"]
+                )
+            chunks.append(chunk_data)
+
+        return chunks
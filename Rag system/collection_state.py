@@ -0,0 +1,115 @@
+# collection_state.py
+import json
+import os
+import threading
+import time
+
+# Sidecar file written next to the Chroma database by embed.py.
+# Every write to a collection bumps its generation so readers
+# (chatbot caches, API) know the corpus changed.
+GENERATIONS_FILE = "collection_generations.json"
+
+_lock = threading.Lock()
+_mtime_cache = {}  # path -> (stat signature, parsed data)
+
+
+def generations_path(db_path: str) -> str:
+    return os.path.join(db_path, GENERATIONS_FILE)
+
+
+def _read_all(db_path: str) -> dict:
+    path = generations_path(db_path)
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return {}
+    signature = (st.st_mtime_ns, st.st_ino, st.st_size)
+
+    with _lock:
+        cached = _mtime_cache.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    with _lock:
+        _mtime_cache[path] = (signature, data)
+    return data
+
+
+def read_generation(db_path: str, collection_name: str) -> int:
+    """
+    Current generation of a collection (0 if embed.py never recorded one).
+    Cheap to call on the hot path: the file is only re-parsed when its mtime changes.
+    """
+    entry = _read_all(db_path).get(collection_name) or {}
+    return int(entry.get("generation", 0))
+
+
+def bump_generation(db_path: str, collection_name: str, count: int = None) -> int:
+    """Record that a collection's contents changed. Returns the new generation."""
+    path = generations_path(db_path)
+    with _lock:
+        data = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                data = {}
+
+        entry = data.get(collection_name) or {}
+        generation = int(entry.get("generation", 0)) + 1
+        data[collection_name] = {
+            "generation": generation,
+            "count": count,
+            "updated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+        os.makedirs(db_path, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
+        _mtime_cache.pop(path, None)
+
+    return generation
+
+
+class CollectionManager:
+    """
+    Keeps a long-lived Chroma collection handle.
+    The handle is only re-fetched when embed.py bumps the collection
+    generation, or when reload() is called (e.g. by the API after ingestion).
+    """
+
+    def __init__(self, client, db_path: str, collection_name: str):
+        self.client = client
+        self.db_path = db_path
+        self.collection_name = collection_name
+        self.generation = None
+        self.reloads = 0
+        self._collection = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Return the current handle, refreshing it if the corpus changed."""
+        generation = read_generation(self.db_path, self.collection_name)
+        if self._collection is not None and generation == self.generation:
+            return self._collection
+        return self._refresh(generation)
+
+    def reload(self):
+        """Force a fresh handle regardless of the change signal."""
+        return self._refresh(read_generation(self.db_path, self.collection_name))
+
+    def _refresh(self, generation: int):
+        with self._lock:
+            self._collection = self.client.get_collection(self.collection_name)
+            self.generation = generation
+            self.reloads += 1
+            return self._collection
@@ -0,0 +1,160 @@
+# collection_stats.py
+import json
+import math
+import os
+import time
+from typing import Dict, Iterable
+
+# Exact collection statistics kept next to the Chroma database.
+# embed.py updates the numbers of every source it ingests, so
+# `embed.py -s` never has to scan the collection.
+STATS_FILE = "collection_stats.json"
+
+# Upper bounds (characters) of the chunk-size histogram buckets
+SIZE_BUCKETS = (256, 512, 1024, 2048, 4096, 8192)
+
+
+def size_bucket(size: int) -> str:
+    for bound in SIZE_BUCKETS:
+        if size <= bound:
+            return f"<={bound}"
+    return f">{SIZE_BUCKETS[-1]}"
+
+
+def new_summary() -> Dict:
+    return {
+        "count": 0,
+        "doc_types": {},
+        "size_hist": {},
+        "size_sum": 0,
+        "norm": {"count": 0, "sum": 0.0, "sumsq": 0.0, "min": None, "max": None},
+    }
+
+
+def add_metadata(summary: Dict, metadata: Dict):
+    """Account one chunk (its stored metadata) in a summary."""
+    summary["count"] += 1
+
+    doc_type = metadata.get("doc_type", "unknown")
+    summary["doc_types"][doc_type] = summary["doc_types"].get(doc_type, 0) + 1
+
+    size = int(metadata.get("chunk_size", 0))
+    bucket = size_bucket(size)
+    summary["size_hist"][bucket] = summary["size_hist"].get(bucket, 0) + 1
+    summary["size_sum"] += size
+
+    norm = metadata.get("embedding_norm")
+    if norm is not None:
+        stats = summary["norm"]
+        stats["count"] += 1
+        stats["sum"] += norm
+        stats["sumsq"] += norm * norm
+        stats["min"] = norm if stats["min"] is None else min(stats["min"], norm)
+        stats["max"] = norm if stats["max"] is None else max(stats["max"], norm)
+
+
+def merge(into: Dict, other: Dict) -> Dict:
+    into["count"] += other["count"]
+    into["size_sum"] += other["size_sum"]
+    for key in ("doc_types", "size_hist"):
+        for name, n in other[key].items():
+            into[key][name] = into[key].get(name, 0) + n
+
+    a, b = into["norm"], other["norm"]
+    a["count"] += b["count"]
+    a["sum"] += b["sum"]
+    a["sumsq"] += b["sumsq"]
+    for key, pick in (("min", min), ("max", max)):
+        if b[key] is not None:
+            a[key] = b[key] if a[key] is None else pick(a[key], b[key])
+    return into
+
+
+class CollectionStats:
+    """Per-source summaries of one collection, persisted as JSON."""
+
+    def __init__(self, db_path: str, collection_name: str):
+        self.db_path = db_path
+        self.collection_name = collection_name
+        self.path = os.path.join(db_path, STATS_FILE)
+        self.sources = {}
+        self.updated_at = None
+        self.exists = False
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f).get(self.collection_name)
+        except (OSError, ValueError):
+            return
+        if data is not None:
+            self.sources = data.get("sources", {})
+            self.updated_at = data.get("updated_at")
+            self.exists = True
+
+    def set_source(self, source: str, summary: Dict):
+        if summary["count"]:
+            self.sources[source] = summary
+        else:
+            self.sources.pop(source, None)
+
+    def rebuild(self, metadatas: Iterable[Dict]):
+        """Recompute everything from a full scan of the collection's metadata."""
+        self.sources = {}
+        for metadata in metadatas:
+            source = metadata.get("source_file", "unknown")
+            add_metadata(self.sources.setdefault(source, new_summary()), metadata)
+
+    def clear(self):
+        self.sources = {}
+
+    def save(self):
+        all_data = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    all_data = json.load(f)
+            except (OSError, ValueError):
+                all_data = {}
+
+        self.updated_at = time.strftime("%Y-%m-%d %H:%M:%S")
+        all_data[self.collection_name] = {"updated_at": self.updated_at, "sources": self.sources}
+
+        os.makedirs(self.db_path, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(all_data, f, indent=2)
+        os.replace(tmp_path, self.path)
+        self.exists = True
+
+    def totals(self) -> Dict:
+        total = new_summary()
+        for summary in self.sources.values():
+            merge(total, summary)
+
+        norm = total["norm"]
+        norm_summary = None
+        if norm["count"]:
+            mean = norm["sum"] / norm["count"]
+            variance = max(norm["sumsq"] / norm["count"] - mean * mean, 0.0)
+            norm_summary = {
+                "count": norm["count"],
+                "mean": round(mean, 4),
+                "std": round(math.sqrt(variance), 4),
+                "min": round(norm["min"], 4),
+                "max": round(norm["max"], 4),
+            }
+
+        ordered_buckets = [size_bucket(b) for b in SIZE_BUCKETS] + [f">{SIZE_BUCKETS[-1]}"]
+        return {
+            "total_chunks": total["count"],
+            "sources": {source: s["count"] for source, s in self.sources.items()},
+            "doc_types": total["doc_types"],
+            "chunk_size_histogram": {b: total["size_hist"][b] for b in ordered_buckets if b in total["size_hist"]},
+            "mean_chunk_size": round(total["size_sum"] / total["count"], 1) if total["count"] else 0,
+            "embedding_norm": norm_summary,
+            "updated_at": self.updated_at,
+        }
@@ -0,0 +1,166 @@
+# context_assembly.py
+import logging
+import re
+import zlib
+from typing import Callable, List, Optional
+
+from lexical_index import tokenize
+
+logger = logging.getLogger("integrated_chatbot")
+
+# Packs ranked chunks into a fixed token budget for one prompt:
+#   1. near-duplicate chunks (MinHash over word shingles) are dropped
+#   2. each chunk is trimmed to the sentences that share a distinctive term
+#      with the query: stopwords never count, nor do query terms found in
+#      most of the chunk's sentences (its topic words, e.g. "personality")
+#   3. chunks are added best-first until the budget is spent
+
+SEPARATOR = "\n\n---\n\n"
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+
+# Function words of the English phase queries and documents
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being
+below between both but by can could did do does doing down during each few for from further had
+has have having he her here hers him his how i if in into is it its itself just may me might more
+most my no nor not of off on once only or other our out over own same she should so some such than
+that the their them then there these they this those through to too under until up very was we
+were what when where which while who whom why will with would you your
+""".split())
+
+# Multiply-shift hashing modulo a Mersenne prime, one (a, b) pair per permutation
+_PRIME = (1 << 61) - 1
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE_RE.split(text) if s.strip()]
+
+
+class MinHasher:
+    """MinHash signatures of word shingles; deterministic across processes."""
+
+    def __init__(self, num_perm: int = 64, shingle_size: int = 3):
+        self.shingle_size = shingle_size
+        # Fixed seeds so signatures are comparable between runs
+        self.params = [
+            ((i * 0x9E3779B1 + 1) % _PRIME | 1, (i * 0x85EBCA77 + 7) % _PRIME)
+            for i in range(1, num_perm + 1)
+        ]
+
+    def signature(self, text: str) -> Optional[tuple]:
+        words = tokenize(text)
+        if not words:
+            return None
+        n = min(self.shingle_size, len(words))
+        shingles = {
+            zlib.crc32(" ".join(words[i:i + n]).encode("utf-8"))
+            for i in range(len(words) - n + 1)
+        }
+        return tuple(min((a * x + b) % _PRIME for x in shingles) for a, b in self.params)
+
+    @staticmethod
+    def similarity(sig_a: tuple, sig_b: tuple) -> float:
+        """Estimated Jaccard similarity of the two shingle sets."""
+        return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / len(sig_a)
+
+
+class ContextAssembler:
+    """
+    Builds the DOCUMENT CONTEXT string of one prompt within a token budget.
+    count_tokens: callable returning the token count of a string (the
+    embedder's tokenizer is a close proxy for the LLM's).
+    """
+
+    def __init__(self, count_tokens: Callable[[str], int], dedup_threshold: float = 0.8, num_perm: int = 64,
+                 common_fraction: float = 0.5):
+        self.count_tokens = count_tokens
+        self.dedup_threshold = dedup_threshold
+        # A query term in more than this fraction of a chunk's sentences does not select any of them
+        self.common_fraction = common_fraction
+        self.minhash = MinHasher(num_perm=num_perm)
+        self.last_stats = {}
+
+    def trim(self, text: str, query: str) -> str:
+        """Keep only the sentences that share a distinctive query term (in order)."""
+        sentences = split_sentences(text)
+        terms = set(tokenize(query)) - STOPWORDS
+        if not terms or len(sentences) <= 1:
+            return text
+        matches = [terms.intersection(tokenize(s)) for s in sentences]
+        limit = len(sentences) * self.common_fraction
+        common = {t for t in terms if sum(t in m for m in matches) > limit}
+        kept = [s for s, m in zip(sentences, matches) if m - common]
+        return " ".join(kept) if kept else text
+
+    def _fit(self, header: str, text: str, remaining: int) -> Optional[str]:
+        """Longest sentence prefix of text that still fits in `remaining` tokens."""
+        kept = []
+        for sentence in split_sentences(text):
+            candidate = f"{header}\n{' '.join(kept + [sentence])}"
+            if self.count_tokens(candidate) > remaining:
+                break
+            kept.append(sentence)
+        return f"{header}\n{' '.join(kept)}" if kept else None
+
+    def assemble(
+        self,
+        query: str,
+        scored: List[tuple],
+        token_budget: int,
+        min_sim: float = 0.03,
+        max_chunks: int = 8,
+    ) -> str:
+        """
+        scored: (rank, similarity, document, metadata) tuples, best first.
+        Returns the joined context ("" if nothing qualified).
+        """
+        separator_tokens = self.count_tokens(SEPARATOR)
+        parts = []
+        signatures = []
+        used = 0
+        stats = {"candidates": len(scored), "duplicates": 0, "trimmed": 0, "truncated": 0}
+
+        for _, sim, doc, meta in scored:
+            if sim < min_sim:
+                continue
+            if len(parts) >= max_chunks:
+                break
+
+            clean_doc = doc.strip().replace("\n\n", "\n")
+            signature = self.minhash.signature(clean_doc)
+            if signature is not None and any(
+                MinHasher.similarity(signature, other) >= self.dedup_threshold for other in signatures
+            ):
+                stats["duplicates"] += 1
+                continue
+
+            text = self.trim(clean_doc, query)
+            if text != clean_doc:
+                stats["trimmed"] += 1
+
+            source = meta.get("source_file") or meta.get("document") or "Unknown"
+            header = f"[SOURCE: {source} | similarity={sim:.3f}]"
+            part = f"{header}\n{text}"
+            cost = self.count_tokens(part) + (separator_tokens if parts else 0)
+            remaining = token_budget - used
+
+            if cost > remaining:
+                # Last slot: keep the leading sentences that still fit
+                part = self._fit(header, text, remaining - (separator_tokens if parts else 0))
+                if part is None:
+                    break
+                stats["truncated"] += 1
+                cost = self.count_tokens(part) + (separator_tokens if parts else 0)
+
+            parts.append(part)
+            if signature is not None:
+                signatures.append(signature)
+            used += cost
+            if used >= token_budget:
+                break
+
+        stats.update({"chunks": len(parts), "tokens": used, "budget": token_budget})
+        self.last_stats = stats
+        logger.info(f"Assembled context: {stats}")
+        return SEPARATOR.join(parts)
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# context_bundles.py
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+
+from collection_state import read_generation
+
+logger = logging.getLogger("integrated_chatbot")
+
+# The retrieval queries are constants, so the context each phase sends to
+# GPT only changes when the corpus does. Run this module after embed.py to
+# precompute it once instead of embedding + searching on every question.
+# `source_keywords` restricts a phase to the documents whose source_file
+# contains one of the keywords (None = search the whole collection).
+# With reranking on, `candidates` chunks are retrieved and the cross-encoder
+# keeps the best `keep`; otherwise n_results / max_chunks apply.
+# `token_budget` caps the context tokens the phase puts in its prompt.
+PHASES = {
+    "mbti": {
+        "query": (
+            "Myers-Briggs personality types preferences extraversion introversion "
+            "sensing intuition thinking feeling judging perceiving"
+        ),
+        "n_results": 12,
+        "min_sim": 0.02,
+        "max_chunks": 5,
+        "candidates": 40,
+        "keep": 4,
+        "token_budget": 500,
+        "source_keywords": ("mbti", "myers", "briggs", "personality_type"),
+    },
+    "dsm": {
+        "query": (
+            "DSM-5 mood anxiety stress sleep concentration personality functioning "
+            "coping social relationships university functioning"
+        ),
+        "n_results": 15,
+        "min_sim": 0.02,
+        "max_chunks": 6,
+        "candidates": 40,
+        "keep": 4,
+        "token_budget": 600,
+        "source_keywords": ("dsm",),
+    },
+    "integration": {
+        "query": (
+            "Myers-Briggs personality types traits coping styles and DSM-5 concepts "
+            "about mood, anxiety, stress, personality functioning and resilience."
+        ),
+        "n_results": 20,
+        "min_sim": 0.02,
+        "max_chunks": 10,
+        "candidates": 40,
+        "keep": 6,
+        "token_budget": 1200,
+        "source_keywords": None,
+    },
+}
+
+BUNDLES_FILE = "context_bundles.json"
+
+
+class ContextBundleStore:
+    """
+    On-disk store of precomputed per-phase context strings.
+    Bundles are tagged with the collection generation they were built from
+    and are ignored once embed.py moves the collection to a new generation.
+    """
+
+    def __init__(self, db_path: str, collection_name: str = "documents"):
+        self.db_path = db_path
+        self.collection_name = collection_name
+        self.path = os.path.join(db_path, BUNDLES_FILE)
+        self._signature = None
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return {}
+        signature = (st.st_mtime_ns, st.st_ino, st.st_size)
+
+        with self._lock:
+            if signature == self._signature:
+                return self._data
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    all_data = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable context bundles {self.path}: {e}")
+                all_data = {}
+            self._data = all_data.get(self.collection_name) or {}
+            self._signature = signature
+            return self._data
+
+    def get(self, phase: str, generation: int):
+        """Return the bundled context for a phase, or None if missing/stale."""
+        data = self._load()
+        if data.get("generation") != generation:
+            return None
+        bundle = data.get("bundles", {}).get(phase)
+        return bundle["context"] if bundle else None
+
+    def save(self, bundles: dict, generation: int):
+        all_data = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    all_data = json.load(f)
+            except (OSError, ValueError):
+                all_data = {}
+
+        all_data[self.collection_name] = {
+            "generation": generation,
+            "built_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "bundles": {
+                phase: {"query": PHASES[phase]["query"], "context": context}
+                for phase, context in bundles.items()
+            },
+        }
+
+        os.makedirs(self.db_path, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(all_data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+def build_bundles(bot) -> dict:
+    """Run live retrieval for every phase and store the formatted contexts."""
+    generation = read_generation(bot.chroma_db_path, bot.collection_name)
+    bundles = {}
+    for phase in PHASES:
+        start = time.time()
+        bundles[phase] = bot.build_phase_context(phase, use_bundle=False)
+        print(f"   Built '{phase}' bundle ({len(bundles[phase])} chars, "
+              f"{bot.count_tokens(bundles[phase])} tokens) in {time.time() - start:.2f}s")
+
+    ContextBundleStore(bot.chroma_db_path, bot.collection_name).save(bundles, generation)
+    return bundles
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompute per-phase RAG context bundles (run after embed.py)')
+    parser.add_argument('-d', '--db-dir', default='./chroma_db_pdf', help='ChromaDB directory (default: ./chroma_db_pdf)')
+    parser.add_argument('--collection', default='documents', help='Collection name (default: documents)')
+
+    args = parser.parse_args()
+
+    # Imported here so the store can be used without loading the chatbot stack
+    from chatbotR import IntegratedRAGChatbot
+
+    print("Context Bundle Builder")
+    print("=" * 50)
+    bot = IntegratedRAGChatbot(chroma_db_path=args.db_dir, collection_name=args.collection)
+    bundles = build_bundles(bot)
+    generation = read_generation(args.db_dir, args.collection)
+    print(f"Saved {len(bundles)} bundles for '{args.collection}' (generation {generation})")
+
+
+if __name__ == "__main__":
+    main()
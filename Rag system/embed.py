@@ -1,22 +1,99 @@
 #!/usr/bin/env python3
 import chromadb
-from sentence_transformers import SentenceTransformer
+import hashlib
 import json
 import argparse
+import copy
 import os
+import queue
 import sys
-from typing import List, Dict, Any
+import threading
+import time
+import numpy as np
+from typing import List, Dict, Any, Iterator, Tuple
+from collection_state import bump_generation
+from collection_stats import CollectionStats, add_metadata, merge, new_summary
+from lexical_index import BM25Index
+
+def content_hash(text: str) -> str:
+    """Stable fingerprint of a chunk's text, stored in its metadata."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+# Metadata computed at ingest time, ignored when deciding if a chunk changed
+DERIVED_METADATA = ('embedding_norm',)
+
+def comparable_metadata(metadata: Dict) -> Dict:
+    return {k: v for k, v in metadata.items() if k not in DERIVED_METADATA}
 
 class JSONLEmbedder:
-    def __init__(self, persist_directory: str = "./chroma_db"):
+    # Length-sorting looks at this many batches at once
+    SORT_WINDOW_BATCHES = 8
+    # Batches allowed to wait between pipeline stages
+    QUEUE_DEPTH = 4
+
+    def __init__(self, persist_directory: str = "./chroma_db", batch_size: int = 32, workers: int = 1):
 
         #Start JSONL embedder
         # persist_directory: Path to ChromaDB database
+        # batch_size: Chunks per encode/write batch (per worker)
+        # workers: Encode processes; >1 starts a multi-process pool (CPU-only hosts)
     
         self.persist_directory = persist_directory
+        self.batch_size = batch_size
+        self.workers = max(1, workers)
         self.client = chromadb.PersistentClient(path=persist_directory)
-        self.embedder = SentenceTransformer("BAAI/bge-m3")
+        self._embedder = None  # BGE-M3 (~2 GB), loaded on first use, so -s / -l never load it
+        self._embedder_lock = threading.Lock()
         self.collection = None
+        self.stats = None  # CollectionStats of the collection being ingested
+        self.lexical_index = None  # BM25Index of the collection being ingested
+        self.pool = None  # started on first encode
+        self._count_tokenizer = None  # writer thread's own copy, see count_tokens
+        
+        # Totals for the throughput report
+        self.encoded_chunks = 0
+        self.encoded_tokens = 0
+        self.encode_seconds = 0.0
+    
+    @property
+    def embedder(self):
+        """The SentenceTransformer, loaded the first time it is needed"""
+        with self._embedder_lock:
+            if self._embedder is None:
+                from sentence_transformers import SentenceTransformer
+                print("Loading BAAI/bge-m3...")
+                self._embedder = SentenceTransformer("BAAI/bge-m3")
+            return self._embedder
+    
+    @property
+    def pipeline_batch_size(self) -> int:
+        # The pool splits every batch across its workers, so hand it one batch per worker
+        return self.batch_size * self.workers
+    
+    def close(self):
+        """Stop the multi-process encode pool, if any"""
+        if self.pool is not None:
+            self.embedder.stop_multi_process_pool(self.pool)
+            self.pool = None
+    
+    def count_tokens(self, documents: List[str]) -> int:
+        """Tokens the model actually sees (after truncation to max_seq_length)"""
+        # Called from the writer thread while encode() tokenizes on the main
+        # thread. A fast tokenizer keeps truncation/padding settings in shared
+        # Rust state, so counting with the model's own instance can leave an
+        # encode batch untruncated; count with a private copy instead.
+        if self._count_tokenizer is None:
+            self._count_tokenizer = copy.deepcopy(self.embedder.tokenizer)
+        max_len = getattr(self.embedder, 'max_seq_length', None) or float('inf')
+        token_ids = self._count_tokenizer(documents, add_special_tokens=True)['input_ids']
+        return sum(min(len(ids), max_len) for ids in token_ids)
+    
+    def throughput_report(self) -> str:
+        seconds = max(self.encode_seconds, 1e-6)
+        return (f"Throughput: {self.encoded_chunks / seconds:.1f} chunks/sec, "
+                f"{self.encoded_tokens / seconds:.0f} tokens/sec "
+                f"({self.encoded_chunks} chunks, {self.encoded_tokens} tokens in {self.encode_seconds:.1f}s, "
+                f"{self.workers} worker(s), batch size {self.batch_size})")
         
     def create_collection(self, collection_name: str = "documents"):
         #Create or get chromadb
@@ -33,185 +110,453 @@ class JSONLEmbedder:
         return self.collection
     
     #Important 1
-    def load_chunks_from_jsonl(self, jsonl_file: str) -> List[Dict]:
+    def iter_chunks_from_jsonl(self, jsonl_file: str) -> Iterator[Dict]:
         """
-        Load chunks from JSONL file
+        Lazily yield chunks from a JSONL file (one line in memory at a time)
         
         Args:
             jsonl_file: Path to JSONL file with chunks
-            
-        Returns:
-            List of chunks with metadata
         """
         if not os.path.exists(jsonl_file):
             raise FileNotFoundError(f"JSONL file not found: {jsonl_file}")
         
-        print(f"Loading chunks from: {os.path.basename(jsonl_file)}")
-        
-        chunks = []
         with open(jsonl_file, 'r', encoding='utf-8') as f:
             for line_num, line in enumerate(f, 1):
                 line = line.strip()
                 if line:
                     try:
-                        chunk = json.loads(line)
-                        chunks.append(chunk)
+                        yield json.loads(line)
                     except json.JSONDecodeError as e:
                         print(f"Error parsing line {line_num}: {e}")
                         continue
-        
-        print(f"Loaded {len(chunks)} chunks from JSONL")
-        return chunks
     
     #Important 2
     
-    def prepare_embeddings(self, chunks: List[Dict], jsonl_file: str) -> tuple:
+    @staticmethod
+    def document_name(jsonl_file: str) -> str:
+        # Normalize document name: remove "_chunks.jsonl"
+        base_name = os.path.basename(jsonl_file)
+        return base_name.replace("_chunks.jsonl", "").replace(".jsonl", "")
+    
+    def chunk_to_record(self, chunk: Dict, chunk_number: int, jsonl_file: str, seen_ids: set):
         """
-        Prepare documents and generate embeddings from JSONL chunks
+        Turn one JSONL chunk into (document, metadata, id)
         
-        Args:
-            chunks: List of chunks from JSONL
-            jsonl_file: Source JSONL file name
-            
         Returns:
-            Tuple of (documents, metadatas, ids, embeddings)
+            The record, or None if the chunk has no text
         """
-        documents = []
-        metadatas = []
-        ids = []
-        
-        print("Preparing embeddings from JSONL chunks...")
-        
-        for i, chunk in enumerate(chunks):
-            # Extract text content from various possible field names
-            text_content = ""
-            if 'text' in chunk:
-                text_content = chunk['text']
-            elif 'content' in chunk:
-                text_content = chunk['content']
-            elif 'page_text' in chunk:
-                text_content = chunk['page_text']
-            else:
-                # Try to find any text field
-                text_candidates = [v for v in chunk.values() if isinstance(v, str)]
-                text_content = max(text_candidates, key=len) if text_candidates else ""
-                
-            if not text_content.strip():
-                print(f"Skipping chunk {i+1}: No text content found")
-                continue
-            
-            documents.append(text_content)
+        # Extract text content from various possible field names
+        text_content = ""
+        if 'text' in chunk:
+            text_content = chunk['text']
+        elif 'content' in chunk:
+            text_content = chunk['content']
+        elif 'page_text' in chunk:
+            text_content = chunk['page_text']
+        else:
+            # Try to find any text field
+            text_candidates = [v for v in chunk.values() if isinstance(v, str)]
+            text_content = max(text_candidates, key=len) if text_candidates else ""
             
-           # Build comprehensive metadata
-            base_name = os.path.basename(jsonl_file)
+        if not text_content.strip():
+            print(f"Skipping chunk {chunk_number}: No text content found")
+            return None
+        
+       # Build comprehensive metadata
+        base_name = os.path.basename(jsonl_file)
+        doc_name = self.document_name(jsonl_file)
 
-            # Normalize document name: remove "_chunks.jsonl"
-            doc_name = base_name.replace("_chunks.jsonl", "").replace(".jsonl", "")
-            chunk_number = i + 1
+        # Ids come from the chunker's chunk_id so they stay stable across re-runs
+        if chunk.get('chunk_id'):
+            chunk_id = f"{doc_name}_{chunk['chunk_id']}"
+        else:
+            chunk_id = f"{doc_name}_page_{chunk_number}"
+        if chunk_id in seen_ids:
+            chunk_id = f"{chunk_id}_{chunk_number}"
+        seen_ids.add(chunk_id)
 
-            metadata = {
-                'chunk_id': f"{doc_name}_page_{chunk_number}",
+        metadata = {
+            'chunk_id': chunk_id,
 
-                # Page information
-                'page_number': chunk.get('page_number', chunk.get('page', 0)),
-                'total_pages': chunk.get('total_pages', chunk.get('num_pages', 0)),
+            # Page information
+            'page_number': chunk.get('page_number', chunk.get('page', 0)),
+            'total_pages': chunk.get('total_pages', chunk.get('num_pages', 0)),
 
-                # FIXED source file metadata
-                'source_file': doc_name,
-                'document': doc_name,    # <--- Add this so RAG clearly knows document source
+            # FIXED source file metadata
+            'source_file': doc_name,
+            'document': doc_name,    # <--- Add this so RAG clearly knows document source
 
-                # Other metadata
-                'doc_type': chunk.get('doc_type', chunk.get('type', 'pdf')),
-                'chunk_size': len(text_content),
+            # Other metadata
+            'doc_type': chunk.get('doc_type', chunk.get('type', 'pdf')),
+            'chunk_size': len(text_content),
+            'content_hash': content_hash(text_content),
 
-                # JSONL file source
-                'jsonl_source': base_name
-            }
+            # JSONL file source
+            'jsonl_source': base_name
+        }
 
-            
-            # Add any additional metadata from the chunk
-            for key, value in chunk.items():
-                if key not in ['text', 'content', 'page_text'] and isinstance(value, (str, int, float, bool)):
-                    if key not in metadata:  # Don't overwrite existing keys
-                        metadata[key] = value
-            
-            metadatas.append(metadata)
-            unique_id = metadata['chunk_id']
-            ids.append(unique_id)
         
-        #------To Sentence Transformenr (BGE-m3)-------
-
+        # Add any additional metadata from the chunk
+        for key, value in chunk.items():
+            if key not in ['text', 'content', 'page_text'] and isinstance(value, (str, int, float, bool)):
+                if key not in metadata:  # Don't overwrite existing keys
+                    metadata[key] = value
         
-        # Generate embeddings
-        print(f"Generating embeddings for {len(documents)} chunks...")
-        embeddings = self.embedder.encode(documents).tolist()
+        return text_content, metadata, chunk_id
+    
+    def iter_records(self, jsonl_file: str) -> Iterator[Tuple[str, Dict, str]]:
+        """Lazily yield (document, metadata, id) for every usable chunk of a JSONL file"""
+        seen_ids = set()
+        for i, chunk in enumerate(self.iter_chunks_from_jsonl(jsonl_file)):
+            record = self.chunk_to_record(chunk, i + 1, jsonl_file, seen_ids)
+            if record is not None:
+                yield record
+    
+    def encode(self, documents: List[str]) -> np.ndarray:
+        """Encode one batch, returning a float32 NumPy buffer (no Python lists)"""
+        if self.workers > 1 and self.pool is None:
+            print(f"Starting encode pool with {self.workers} CPU workers")
+            self.pool = self.embedder.start_multi_process_pool(target_devices=["cpu"] * self.workers)
         
-        return documents, metadatas, ids, embeddings
+        start = time.time()
+        if self.pool is not None:
+            # Split across worker processes; results come back in input order
+            vectors = self.embedder.encode_multi_process(
+                documents, self.pool, batch_size=self.batch_size,
+                chunk_size=max(1, -(-len(documents) // self.workers))
+            )
+        else:
+            vectors = self.embedder.encode(
+                documents, batch_size=self.batch_size, convert_to_numpy=True
+            )
+        self.encode_seconds += time.time() - start
+        self.encoded_chunks += len(documents)
+        return np.asarray(vectors, dtype=np.float32)
     
-    #Important 3
-    def store_in_chromadb(self, documents: List[str], metadatas: List[Dict], 
-                         ids: List[str], embeddings: List[List[float]], 
-                         collection_name: str = "documents"):
-        """Store documents with embeddings in ChromaDB"""
-        self.create_collection(collection_name)
+    def mark_changed(self, collection_name: str):
+        """Let running chatbots know their cached retrievals are stale"""
+        generation = bump_generation(self.persist_directory, collection_name, self.collection.count())
+        print(f"Collection '{collection_name}' is now at generation {generation}")
+    
+    def _batches_by_length(self, window: List[tuple]):
+        # Similar lengths in one batch means little padding work in the model
+        window.sort(key=lambda record: len(record[0]), reverse=True)
+        size = self.pipeline_batch_size
+        for i in range(0, len(window), size):
+            yield window[i:i + size]
+    
+    def _read_file(self, state: Dict, work_queue: queue.Queue, errors: List):
+        """
+        Reader stage for one JSONL file: classify every chunk against the
+        stored content hashes and queue the work it needs.
+        """
+        counts = state['counts']
         
-        print(f"Storing in ChromaDB collection: {collection_name}")
+        # Only ids + metadata of this document are kept in memory, never vectors
+        existing = self.collection.get(where={'source_file': state['source_file']}, include=['metadatas'])
+        existing_meta = dict(zip(existing['ids'], existing['metadatas'] or []))
+        id_by_hash = {meta.get('content_hash'): chunk_id for chunk_id, meta in existing_meta.items()}
+        state['existing_ids'] = set(existing_meta)
         
-        # Store in batches to avoid memory issues
-        batch_size = 100
-        total_stored = 0
+        window = []
+        updates = []
+        reuse = []  # (document, metadata, id, existing id with the same text)
+        changed_ids = set()
         
-        for i in range(0, len(documents), batch_size):
-            end_idx = min(i + batch_size, len(documents))
-            batch_docs = documents[i:end_idx]
-            batch_metas = metadatas[i:end_idx]
-            batch_ids = ids[i:end_idx]
-            batch_embeds = embeddings[i:end_idx]
+        for document, metadata, chunk_id in self.iter_records(state['file']):
+            if errors:
+                return
+            state['seen_ids'].add(chunk_id)
+            old = existing_meta.get(chunk_id)
+            if old is None:
+                counts['new'] += 1
+            elif old.get('content_hash') != metadata['content_hash']:
+                counts['changed'] += 1
+                changed_ids.add(chunk_id)
+            elif comparable_metadata(old) != metadata:
+                counts['metadata_only'] += 1
+                if old.get('embedding_norm') is not None:
+                    metadata['embedding_norm'] = old['embedding_norm']
+                add_metadata(state['read_stats'], metadata)
+                updates.append((document, metadata, chunk_id))
+                if len(updates) >= self.batch_size:
+                    work_queue.put(('update', state, updates))
+                    updates = []
+                continue
+            else:
+                counts['unchanged'] += 1
+                add_metadata(state['read_stats'], old)
+                continue
             
-            self.collection.add(
-                embeddings=batch_embeds,
-                documents=batch_docs,
-                metadatas=batch_metas,
-                ids=batch_ids
-            )
+            # Same text already stored under another id: reuse its vector
+            if metadata['content_hash'] in id_by_hash:
+                reuse.append((document, metadata, chunk_id, id_by_hash[metadata['content_hash']]))
+                continue
             
-            total_stored += len(batch_docs)
-            print(f"   Stored batch {i//batch_size + 1}: {len(batch_docs)} chunks")
+            window.append((document, metadata, chunk_id))
+            if len(window) >= self.pipeline_batch_size * self.SORT_WINDOW_BATCHES:
+                for batch in self._batches_by_length(window):
+                    work_queue.put(('encode', state, batch))
+                window = []
         
-        print(f"Successfully stored {total_stored} chunks in ChromaDB")
+        # Moved chunks whose old id was rewritten in this run have to be re-encoded
+        valid = [r for r in reuse if r[3] not in changed_ids]
+        window.extend(r[:3] for r in reuse if r[3] in changed_ids)
+        counts['reused'] = len(valid)
+        for document, metadata, chunk_id, source_id in valid:
+            if existing_meta[source_id].get('embedding_norm') is not None:
+                metadata['embedding_norm'] = existing_meta[source_id]['embedding_norm']
+            add_metadata(state['read_stats'], metadata)
+        
+        for batch in self._batches_by_length(window):
+            work_queue.put(('encode', state, batch))
+        if updates:
+            work_queue.put(('update', state, updates))
+        for i in range(0, len(valid), self.batch_size):
+            work_queue.put(('reuse', state, valid[i:i + self.batch_size]))
     
-    def embed_jsonl(self, jsonl_file: str, collection_name: str = "documents"):
+    def _write_item(self, item: tuple):
+        """Writer stage: the only place that writes to Chroma"""
+        kind, state = item[0], item[1]
+        counts = state['counts']
+        
+        if kind == 'upsert':
+            _, _, batch, vectors = item
+            for record, norm in zip(batch, np.linalg.norm(vectors, axis=1)):
+                record[1]['embedding_norm'] = round(float(norm), 6)
+                add_metadata(state['write_stats'], record[1])
+            self.collection.upsert(
+                embeddings=vectors,
+                documents=[record[0] for record in batch],
+                metadatas=[record[1] for record in batch],
+                ids=[record[2] for record in batch]
+            )
+            self.lexical_index.add(
+                [record[2] for record in batch],
+                [record[0] for record in batch],
+                [record[1] for record in batch]
+            )
+            counts['embedded'] += len(batch)
+            # Counted here so tokenizing never delays the encoder
+            self.encoded_tokens += self.count_tokens([record[0] for record in batch])
+            print(f"   [{state['position']}] {state['name']}: stored {counts['embedded']} chunks", end='\r')
+        
+        elif kind == 'update':
+            batch = item[2]
+            self.collection.update(
+                ids=[record[2] for record in batch],
+                metadatas=[record[1] for record in batch]
+            )
+        
+        elif kind == 'reuse':
+            batch = item[2]
+            stored = self.collection.get(ids=sorted({r[3] for r in batch}), include=['embeddings'])
+            vectors = dict(zip(stored['ids'], stored['embeddings']))
+            self.collection.upsert(
+                embeddings=np.asarray([vectors[r[3]] for r in batch], dtype=np.float32),
+                documents=[r[0] for r in batch],
+                metadatas=[r[1] for r in batch],
+                ids=[r[2] for r in batch]
+            )
+            self.lexical_index.add([r[2] for r in batch], [r[0] for r in batch], [r[1] for r in batch])
+        
+        elif kind == 'file_done':
+            if state['error'] is None:
+                vanished = sorted(state['existing_ids'] - state['seen_ids'])
+                for i in range(0, len(vanished), 500):
+                    self.collection.delete(ids=vanished[i:i + 500])
+                self.lexical_index.remove(vanished)
+                counts['deleted'] = len(vanished)
+                self.stats.set_source(
+                    state['source_file'],
+                    merge(merge(new_summary(), state['read_stats']), state['write_stats'])
+                )
+            state['seconds'] = time.time() - state['start']
+            print(f"   [{state['position']}] {state['name']}: {counts['embedded']} embedded, "
+                  f"{counts['reused']} reused, {counts['metadata_only']} metadata-only, "
+                  f"{counts['unchanged']} unchanged, {counts['deleted']} deleted "
+                  f"({state['seconds']:.1f}s)")
+    
+    def embed_files(self, jsonl_files: List[str], collection_name: str = "documents") -> Dict[str, Dict]:
         """
-        Complete JSONL embedding pipeline
+        Incremental, streaming ingestion of one or more JSONL files
+        
+        Three overlapping stages connected by bounded queues:
+          reader thread  - parses the files one after another and skips unchanged
+                           chunks, so the next file is parsed while this one encodes
+          encoder (here) - encodes length-sorted batches
+          writer thread  - the single Chroma writer; upserts each batch straight
+                           from its NumPy buffer and deletes vanished chunks
+        Memory stays flat regardless of corpus size.
         
         Args:
-            jsonl_file: Path to JSONL file with chunks
+            jsonl_files: Paths to JSONL files with chunks
             collection_name: ChromaDB collection name
             
         Returns:
-            Number of chunks embedded
+            Per-file summary dicts, keyed by path
         """
-        # Load chunks from JSONL
-        chunks = self.load_chunks_from_jsonl(jsonl_file)
+        self.create_collection(collection_name)
+        self.stats = CollectionStats(self.persist_directory, collection_name)
+        self.lexical_index = BM25Index(self.persist_directory, collection_name)
+        # Collections ingested before stats / the lexical index existed need one full scan
+        needs_rebuild = not self.stats.exists and self.collection.count() > 0
+        needs_index = not self.lexical_index.exists and self.collection.count() > 0
         
-        if not chunks:
-            print("No chunks loaded from JSONL file")
-            return 0
+        summaries = {}
+        errors = []
+        work_queue = queue.Queue(maxsize=self.QUEUE_DEPTH)
+        write_queue = queue.Queue(maxsize=self.QUEUE_DEPTH)
         
-        # Prepare embeddings
-        documents, metadatas, ids, embeddings = self.prepare_embeddings(chunks, jsonl_file)
+        def read():
+            try:
+                for position, jsonl_file in enumerate(jsonl_files, 1):
+                    if errors:
+                        break
+                    state = {
+                        'file': jsonl_file,
+                        'name': os.path.basename(jsonl_file),
+                        'position': f"{position}/{len(jsonl_files)}",
+                        'source_file': self.document_name(jsonl_file),
+                        'existing_ids': set(),
+                        'seen_ids': set(),
+                        'start': time.time(),
+                        'seconds': 0.0,
+                        'error': None,
+                        'read_stats': new_summary(),
+                        'write_stats': new_summary(),
+                        'counts': {'new': 0, 'changed': 0, 'metadata_only': 0, 'unchanged': 0,
+                                   'reused': 0, 'embedded': 0, 'deleted': 0},
+                    }
+                    summaries[jsonl_file] = state
+                    try:
+                        if not os.path.exists(jsonl_file):
+                            raise FileNotFoundError(f"JSONL file not found: {jsonl_file}")
+                        print(f"   [{state['position']}] Reading {state['name']}")
+                        self._read_file(state, work_queue, errors)
+                    except Exception as e:
+                        # Skip this file; never delete based on a partial read
+                        state['error'] = str(e)
+                        print(f"Error embedding {jsonl_file}: {e}")
+                    work_queue.put(('file_done', state))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                work_queue.put(None)
         
-        if not documents:
-            print("No valid documents to embed")
-            return 0
+        def write():
+            while True:
+                item = write_queue.get()
+                if item is None:
+                    return
+                if errors:
+                    continue  # keep draining so the encoder never blocks
+                try:
+                    self._write_item(item)
+                except Exception as e:
+                    errors.append(e)
         
-        # Store in ChromaDB
-        self.store_in_chromadb(documents, metadatas, ids, embeddings, collection_name)
+        reader = threading.Thread(target=read, name="jsonl-reader", daemon=True)
+        writer = threading.Thread(target=write, name="chroma-writer", daemon=True)
+        reader.start()
+        writer.start()
         
-        return len(documents)
+        # Encoder stage runs here; the model releases the GIL while it computes.
+        # Everything else is forwarded in order so each file's 'file_done'
+        # reaches the writer after all of that file's batches.
+        while True:
+            item = work_queue.get()
+            if item is None:
+                break
+            if errors:
+                continue
+            try:
+                if item[0] == 'encode':
+                    batch = item[2]
+                    item = ('upsert', item[1], batch, self.encode([record[0] for record in batch]))
+                write_queue.put(item)
+            except Exception as e:
+                errors.append(e)
+        write_queue.put(None)
+        
+        reader.join()
+        writer.join()
+        
+        changed = any(
+            s['counts']['embedded'] or s['counts']['reused'] or s['counts']['metadata_only'] or s['counts']['deleted']
+            for s in summaries.values()
+        )
+        if changed:
+            self.mark_changed(collection_name)
+        if needs_rebuild:
+            self.rebuild_collection_stats(collection_name)
+        elif changed or not self.stats.exists:
+            self.stats.save()
+        if needs_index:
+            self.rebuild_lexical_index(collection_name)
+        elif changed or not self.lexical_index.exists:
+            self.lexical_index.save()
+        if errors:
+            raise errors[0]
+        
+        return {
+            path: dict(state['counts'], seconds=state['seconds'], error=state['error'])
+            for path, state in summaries.items()
+        }
+    
+    def embed_jsonl(self, jsonl_file: str, collection_name: str = "documents"):
+        """
+        Complete JSONL embedding pipeline for a single file (see embed_files)
+        
+        Returns:
+            Number of chunks embedded
+        """
+        summary = self.embed_files([jsonl_file], collection_name)[jsonl_file]
+        if summary['error']:
+            raise RuntimeError(summary['error'])
+        return summary['embedded']
+    
+    def rebuild_collection_stats(self, collection_name: str, page_size: int = 1000) -> CollectionStats:
+        """Exact stats from a full (paged) scan; only needed for legacy collections"""
+        collection = self.client.get_collection(collection_name)
+        count = collection.count()
+        print(f"Scanning {count} chunks to rebuild statistics...")
+        
+        def scan():
+            for offset in range(0, count, page_size):
+                page = collection.get(include=['metadatas', 'embeddings'], limit=page_size, offset=offset)
+                norms = np.linalg.norm(np.asarray(page['embeddings'], dtype=np.float32), axis=1)
+                for metadata, norm in zip(page['metadatas'], norms):
+                    if metadata.get('embedding_norm') is None:
+                        metadata = dict(metadata, embedding_norm=float(norm))
+                    yield metadata
+        
+        stats = CollectionStats(self.persist_directory, collection_name)
+        stats.rebuild(scan())
+        stats.save()
+        return stats
+    
+    def rebuild_lexical_index(self, collection_name: str, page_size: int = 1000) -> BM25Index:
+        """BM25 index from a full (paged) scan; only needed for legacy collections"""
+        collection = self.client.get_collection(collection_name)
+        count = collection.count()
+        print(f"Indexing {count} chunks for lexical search...")
+        
+        index = BM25Index(self.persist_directory, collection_name)
+        index.clear()
+        for offset in range(0, count, page_size):
+            page = collection.get(include=['documents', 'metadatas'], limit=page_size, offset=offset)
+            index.add(page['ids'], page['documents'], page['metadatas'])
+        index.save()
+        return index
     
     def get_collection_stats(self, collection_name: str = None):
-        """Get statistics about a collection"""
+        """
+        Get statistics about a collection
+        
+        Exact numbers come from the stats file maintained at ingest time.
+        Without one, only the first 100 records are sampled ('exact': False).
+        """
         if collection_name:
             try:
                 collection = self.client.get_collection(collection_name)
@@ -223,28 +568,35 @@ class JSONLEmbedder:
             return "No collection loaded"
         
         count = self.collection.count()
+        stored = CollectionStats(self.persist_directory, self.collection.name)
         
-        # Get sample metadata for analysis
-        sample = self.collection.get(limit=min(100, count))
-        sources = {}
-        doc_types = {}
-        
-        if sample['metadatas']:
-            for metadata in sample['metadatas']:
-                source = metadata.get('source_file', 'unknown')
-                sources[source] = sources.get(source, 0) + 1
-                
-                doc_type = metadata.get('doc_type', 'unknown')
-                doc_types[doc_type] = doc_types.get(doc_type, 0) + 1
-        
-        stats = {
-            'total_chunks': count,
-            'sources': sources,
-            'doc_types': doc_types,
-            'collection_name': self.collection.name,
-            'db_path': self.persist_directory
-        }
+        if stored.exists:
+            stats = stored.totals()
+            stats['exact'] = stats['total_chunks'] == count
+            stats['total_chunks'] = count
+        else:
+            # Get sample metadata for analysis
+            sample = self.collection.get(limit=min(100, count))
+            sources = {}
+            doc_types = {}
+            
+            if sample['metadatas']:
+                for metadata in sample['metadatas']:
+                    source = metadata.get('source_file', 'unknown')
+                    sources[source] = sources.get(source, 0) + 1
+                    
+                    doc_type = metadata.get('doc_type', 'unknown')
+                    doc_types[doc_type] = doc_types.get(doc_type, 0) + 1
+            
+            stats = {
+                'total_chunks': count,
+                'sources': sources,
+                'doc_types': doc_types,
+                'exact': False
+            }
         
+        stats['collection_name'] = self.collection.name
+        stats['db_path'] = self.persist_directory
         return stats
 
 def main():
@@ -285,13 +637,19 @@ Examples:
     parser.add_argument('-s', '--stats', action='store_true', help='Show collection statistics')
     parser.add_argument('-l', '--list', action='store_true', help='List all collections')
     parser.add_argument('-c', '--clear', action='store_true', help='Clear collection before embedding')
+    parser.add_argument('--rebuild-stats', action='store_true', help='Rebuild exact collection statistics with a full scan')
+    parser.add_argument('--rebuild-index', action='store_true', help='Rebuild the BM25 lexical index with a full scan')
+    parser.add_argument('-b', '--batch-size', type=int, default=32, help='Chunks per encode/write batch (default: 32)')
+    parser.add_argument('-w', '--workers', type=int, nargs='?', default=1, const=os.cpu_count() or 1,
+                        help=f'Encode worker processes for CPU-only hosts; -w alone uses every core '
+                             f'({os.cpu_count()} here) (default: 1)')
     
     args = parser.parse_args()
     
     # Initialize embedder
     print("JSONL to ChromaDB Embedder")
     print("=" * 50)
-    embedder = JSONLEmbedder(persist_directory=args.db_dir)
+    embedder = JSONLEmbedder(persist_directory=args.db_dir, batch_size=args.batch_size, workers=args.workers)
     
     # List collections
     if args.list:
@@ -305,14 +663,38 @@ Examples:
             print( "No collections found")
         return
     
+    # Rebuild statistics
+    if args.rebuild_stats:
+        try:
+            embedder.rebuild_collection_stats(args.collection)
+            print(f"Rebuilt statistics for '{args.collection}'")
+        except Exception as e:
+            print(f"Could not rebuild statistics for '{args.collection}': {e}")
+            return
+    
+    # Rebuild lexical index
+    if args.rebuild_index:
+        try:
+            index = embedder.rebuild_lexical_index(args.collection)
+            print(f"Rebuilt lexical index for '{args.collection}' ({len(index)} chunks, {len(index.postings)} terms)")
+        except Exception as e:
+            print(f"Could not rebuild lexical index for '{args.collection}': {e}")
+        return
+    
     # Show statistics
-    if args.stats:
+    if args.stats or args.rebuild_stats:
         stats = embedder.get_collection_stats(args.collection)
         if isinstance(stats, dict):
             print(f"\n Collection Statistics: '{args.collection}'")
             print(f"   Total chunks: {stats['total_chunks']}")
             print(f"   Document types: {stats.get('doc_types', {})}")
             print(f"   Sources: {stats.get('sources', {})}")
+            if 'chunk_size_histogram' in stats:
+                print(f"   Chunk sizes (chars): {stats['chunk_size_histogram']} (mean {stats['mean_chunk_size']})")
+                print(f"   Embedding norms: {stats['embedding_norm']}")
+                print(f"   Stats updated: {stats['updated_at']}")
+            if not stats['exact']:
+                print("   (approximate - run with --rebuild-stats for exact numbers)")
             print(f"   Database: {stats['db_path']}")
         else:
             print(f" {stats}")
@@ -322,6 +704,13 @@ Examples:
     if args.clear:
         try:
             embedder.client.delete_collection(args.collection)
+            bump_generation(args.db_dir, args.collection, 0)
+            stats = CollectionStats(args.db_dir, args.collection)
+            stats.clear()
+            stats.save()
+            index = BM25Index(args.db_dir, args.collection)
+            index.clear()
+            index.save()
             print(f"  Cleared collection: {args.collection}")
         except:
             print(f"Collection '{args.collection}' doesn't exist or couldn't be cleared")
@@ -330,22 +719,33 @@ Examples:
     if args.input:
         total_chunks = 0
         
-        for jsonl_file in args.input:
-            if not os.path.exists(jsonl_file):
-                print(f"JSONL file not found: {jsonl_file}")
-                continue
-            
+        missing = [f for f in args.input if not os.path.exists(f)]
+        for jsonl_file in missing:
+            print(f"JSONL file not found: {jsonl_file}")
+        jsonl_files = [f for f in args.input if f not in missing]
+        
+        summaries = {}
+        if jsonl_files:
+            print(f"\nProcessing {len(jsonl_files)} file(s) into '{args.collection}'")
             try:
-                print(f"\nProcessing: {os.path.basename(jsonl_file)}")
-                chunk_count = embedder.embed_jsonl(jsonl_file, args.collection)
-                total_chunks += chunk_count
-                print(f"Embedded {chunk_count} chunks into '{args.collection}'")
-                
+                summaries = embedder.embed_files(jsonl_files, args.collection)
             except Exception as e:
-                print(f"Error embedding {jsonl_file}: {e}")
+                print(f"Error embedding files: {e}")
+            finally:
+                embedder.close()
+        
+        if summaries:
+            print("\nSummary:")
+            for jsonl_file, summary in summaries.items():
+                status = f"ERROR: {summary['error']}" if summary['error'] else (
+                    f"{summary['embedded']} embedded, {summary['reused']} reused, "
+                    f"{summary['unchanged']} unchanged, {summary['deleted']} deleted")
+                print(f"   • {os.path.basename(jsonl_file)}: {status} ({summary['seconds']:.1f}s)")
+                total_chunks += summary['embedded']
         
         if total_chunks > 0:
             print(f"\nCompleted! Total chunks embedded: {total_chunks}")
+            print(embedder.throughput_report())
             
             # Show final statistics
             stats = embedder.get_collection_stats(args.collection)
@@ -355,7 +755,7 @@ Examples:
             print("\nNo chunks were embedded")
     
     else:
-        if not args.stats and not args.list:
+        if not args.stats and not args.list and not args.rebuild_stats and not args.rebuild_index:
             print("No input files specified")
             print("\nUse -i to specify input JSONL file(s)")
             parser.print_help()
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+# embedding_service.py
+import argparse
+import logging
+import os
+import queue
+import secrets
+import signal
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+from typing import List, Optional
+
+import numpy as np
+
+logger = logging.getLogger("integrated_chatbot")
+
+# BGE-M3 is ~2 GB and encoding is CPU-bound, so the API workers started by
+# serve_api.py do not load it themselves. One service process holds the
+# model and the workers send their texts over a local socket:
+#   python embedding_service.py --address /tmp/anees-embed.sock
+#   ANEES_EMBEDDING_SERVICE=/tmp/anees-embed.sock ANEES_EMBEDDING_KEY=<key> python "api_chatbot (1).py"
+# multiprocessing.connection unpickles what it receives, so clients must
+# prove they hold the authkey: main() generates one unless
+# ANEES_EMBEDDING_KEY is set, and the service never listens on TCP without.
+# Requests that arrive while a batch is encoding are merged into the next
+# one, so concurrent users share a single encode() call.
+DEFAULT_ADDRESS = "/tmp/anees-embed.sock"
+
+# encode() arguments that only matter to the caller's process
+_CLIENT_ONLY = {"batch_size", "show_progress_bar", "convert_to_numpy", "convert_to_tensor", "device"}
+
+
+class EmbeddingServiceError(RuntimeError):
+    pass
+
+
+def parse_address(address: str):
+    """'host:port' -> TCP address, anything else ('unix:/path', '/path') -> Unix socket path."""
+    if address.startswith("unix:"):
+        return address[len("unix:"):]
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and "/" not in address:
+        return (host or "127.0.0.1", int(port))
+    return address
+
+
+def _authkey(authkey) -> Optional[bytes]:
+    if authkey is None:
+        authkey = os.getenv("ANEES_EMBEDDING_KEY", "")
+    if isinstance(authkey, str):
+        authkey = authkey.encode("utf-8")
+    return authkey or None
+
+
+class _Request:
+    __slots__ = ("texts", "options", "vectors", "error", "done")
+
+    def __init__(self, texts: List[str], options: tuple):
+        self.texts = texts
+        self.options = options
+        self.vectors = None
+        self.error = None
+        self.done = threading.Event()
+
+
+# ---------------- Service ----------------
+
+class EmbeddingService:
+    """
+    Serves encode() of one SentenceTransformer model to many processes.
+    - One thread per client connection; the clients keep their connection
+    - A single batcher thread owns the model: it takes every request queued
+      while the previous batch was encoding (up to max_batch texts) and
+      encodes them together; max_wait optionally holds a batch open longer
+    - Requests with different encode() options are encoded separately
+    """
+
+    def __init__(self, model_name: str = "BAAI/bge-m3", address: str = DEFAULT_ADDRESS,
+                 authkey=None, max_batch: int = 64, max_wait: float = 0.0, encode_batch_size: int = 32):
+        self.model_name = model_name
+        self.address = parse_address(address)
+        self.authkey = _authkey(authkey)
+        if isinstance(self.address, tuple):
+            if self.authkey is None:
+                raise ValueError(f"Refusing to serve embeddings on TCP {address} without an authkey")
+            if self.address[0] not in ("127.0.0.1", "localhost", "::1"):
+                logger.warning(f"Embedding service on non-loopback {address}: traffic is authenticated, not encrypted")
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.encode_batch_size = encode_batch_size
+        self.model = None
+        self.requests = 0
+        self.texts = 0
+        self.batches = 0
+        self.largest_batch = 0
+        self.encode_seconds = 0.0
+        self.clients = 0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._listener = None
+
+    def serve_forever(self):
+        import resources
+        # Always the in-process model, even if this environment points at a service
+        self.model = resources.embedder(self.model_name, service="")
+
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)  # left behind by a previous run
+        # Listening only once the model is loaded, so a connection means ready
+        # Socket file created 0600: only this user's processes may connect
+        umask = os.umask(0o177)
+        try:
+            self._listener = Listener(self.address, authkey=self.authkey)
+        finally:
+            os.umask(umask)
+        threading.Thread(target=self._batch_loop, name="embed-batcher", daemon=True).start()
+        logger.info(f"Embedding service for {self.model_name} listening on {self.address}")
+
+        try:
+            while True:
+                try:
+                    conn = self._listener.accept()
+                except OSError:
+                    break  # closed
+                except Exception as e:
+                    # e.g. a client with the wrong authkey
+                    logger.warning(f"Rejected embedding client: {e}")
+                    continue
+                threading.Thread(target=self._serve_client, args=(conn,), name="embed-client", daemon=True).start()
+        finally:
+            self.close()
+
+    def close(self):
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+
+    def _serve_client(self, conn):
+        with self._lock:
+            self.clients += 1
+        try:
+            while True:
+                try:
+                    op, *args = conn.recv()
+                except (EOFError, OSError):
+                    return
+                if op == "encode":
+                    texts, options = args
+                    request = _Request(list(texts), options)
+                    self._queue.put(request)
+                    request.done.wait()
+                    reply = ("error", request.error) if request.error else ("ok", request.vectors)
+                elif op == "stats":
+                    reply = ("ok", self.stats())
+                else:
+                    reply = ("error", f"Unknown operation '{op}'")
+                try:
+                    conn.send(reply)
+                except (EOFError, OSError):
+                    return
+        finally:
+            conn.close()
+            with self._lock:
+                self.clients -= 1
+
+    def _batch_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0].texts)
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch:
+                try:
+                    request = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                batch.append(request)
+                size += len(request.texts)
+            self._encode(batch)
+
+    def _encode(self, batch: List[_Request]):
+        groups = {}
+        for request in batch:
+            groups.setdefault(request.options, []).append(request)
+
+        for options, requests in groups.items():
+            texts = [text for request in requests for text in request.texts]
+            start = time.time()
+            try:
+                vectors = self.model.encode(
+                    texts,
+                    batch_size=self.encode_batch_size,
+                    show_progress_bar=False,
+                    convert_to_numpy=True,
+                    **dict(options),
+                )
+                vectors = np.asarray(vectors, dtype=np.float32)
+            except Exception as e:
+                logger.error(f"Embedding batch of {len(texts)} texts failed: {e}")
+                for request in requests:
+                    request.error = str(e)
+            else:
+                offset = 0
+                for request in requests:
+                    request.vectors = vectors[offset:offset + len(request.texts)]
+                    offset += len(request.texts)
+
+            with self._lock:
+                self.requests += len(requests)
+                self.texts += len(texts)
+                self.batches += 1
+                self.largest_batch = max(self.largest_batch, len(texts))
+                self.encode_seconds += time.time() - start
+            for request in requests:
+                request.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "model": self.model_name,
+                "pid": os.getpid(),
+                "clients": self.clients,
+                "requests": self.requests,
+                "texts": self.texts,
+                "batches": self.batches,
+                "avg_batch": round(self.texts / self.batches, 2) if self.batches else 0.0,
+                "largest_batch": self.largest_batch,
+                "encode_seconds": round(self.encode_seconds, 2),
+                "queued": self._queue.qsize(),
+            }
+
+
+def run_service(model_name: str, address: str, authkey=None, max_batch: int = 64, max_wait: float = 0.0):
+    """Process entry point (serve_api.py starts the service with this)."""
+    logging.basicConfig(level=logging.INFO)
+    # Stopped with SIGTERM by the launcher; exit through close() so the socket file goes
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    service = EmbeddingService(model_name, address, authkey=authkey, max_batch=max_batch, max_wait=max_wait)
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+# ---------------- Client ----------------
+
+class RemoteEmbedder:
+    """
+    Stands in for the SentenceTransformer in the API workers: encode()
+    goes to the embedding service, the tokenizer (a few MB, used for token
+    counting) is loaded locally on first use.
+    Each thread keeps its own connection; a dropped connection is
+    re-opened once per call.
+    """
+
+    def __init__(self, address: str, model_name: str = "BAAI/bge-m3", authkey=None, timeout: float = 60.0):
+        self.address = parse_address(address)
+        self.model_name = model_name
+        self.timeout = timeout
+        self._authkey = _authkey(authkey)
+        self._local = threading.local()
+        self._tokenizer = None
+        self._tokenizer_lock = threading.Lock()
+
+    @property
+    def tokenizer(self):
+        with self._tokenizer_lock:
+            if self._tokenizer is None:
+                from transformers import AutoTokenizer
+                self._tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            return self._tokenizer
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = Client(self.address, authkey=self._authkey)
+            self._local.conn = conn
+        return conn
+
+    def _drop_connection(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def _call(self, *request):
+        for attempt in range(2):
+            try:
+                conn = self._connection()
+                conn.send(request)
+                if not conn.poll(self.timeout):
+                    # A late reply would be read by the next call, so start over
+                    self._drop_connection()
+                    raise EmbeddingServiceError(f"No reply from the embedding service in {self.timeout}s")
+                status, value = conn.recv()
+                break
+            except (EOFError, OSError, AuthenticationError) as e:
+                self._drop_connection()
+                if attempt:
+                    raise EmbeddingServiceError(f"Embedding service at {self.address} unavailable: {e}") from e
+        if status != "ok":
+            raise EmbeddingServiceError(value)
+        return value
+
+    def encode(self, sentences, **kwargs):
+        """SentenceTransformer.encode() for str or list input, returning numpy arrays."""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        options = tuple(sorted((k, v) for k, v in kwargs.items() if k not in _CLIENT_ONLY))
+        vectors = self._call("encode", texts, options)
+        return vectors[0] if single else vectors
+
+    def stats(self) -> dict:
+        return self._call("stats")
+
+    def wait_ready(self, timeout: float = 300.0, interval: float = 0.5) -> dict:
+        """Block until the service answers (it listens once the model is loaded)."""
+        deadline = time.time() + timeout
+        while True:
+            try:
+                return self.stats()
+            except EmbeddingServiceError:
+                if time.time() >= deadline:
+                    raise
+                time.sleep(interval)
+
+    def close(self):
+        self._drop_connection()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Shared embedding service for the chatbot API workers')
+    parser.add_argument('--address', default=os.getenv("ANEES_EMBEDDING_SERVICE", DEFAULT_ADDRESS),
+                        help=f'Unix socket path or host:port (default: {DEFAULT_ADDRESS})')
+    parser.add_argument('--model', default='BAAI/bge-m3', help='Embedding model (default: BAAI/bge-m3)')
+    parser.add_argument('--max-batch', type=int, default=64, help='Most texts encoded in one batch (default: 64)')
+    parser.add_argument('--max-wait-ms', type=float, default=0.0,
+                        help='Extra time a batch waits for more requests (default: 0, only merge what is queued)')
+
+    args = parser.parse_args()
+
+    print("Embedding Service")
+    print("=" * 50)
+    authkey = os.getenv("ANEES_EMBEDDING_KEY")
+    if not authkey:
+        authkey = secrets.token_hex(16)
+        print(f"Generated authkey; start the API with ANEES_EMBEDDING_KEY={authkey}")
+    print(f"Loading {args.model}...")
+    run_service(args.model, args.address, authkey=authkey, max_batch=args.max_batch, max_wait=args.max_wait_ms / 1000)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+# lexical_index.py
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+logger = logging.getLogger("integrated_chatbot")
+
+# BM25 inverted index kept next to the Chroma database. embed.py updates it
+# with every upsert/delete, the chatbot fuses its ranking with the dense one
+# so exact terms ("anhedonia", "INTJ") are not lost in embedding space.
+INDEX_FILE = "lexical_index_{collection}.json"
+
+# Standard BM25 parameters
+K1 = 1.5
+B = 0.75
+
+_TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens; works for Arabic as well as English text."""
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+class BM25Index:
+    """
+    Inverted index over the documents of one collection.
+    - docs:     id -> (source_file, length, term frequencies), what is persisted
+    - postings: term -> {id: tf}, rebuilt on load
+    The chatbot re-reads the file whenever embed.py rewrites it.
+    """
+
+    def __init__(self, db_path: str, collection_name: str = "documents"):
+        self.db_path = db_path
+        self.collection_name = collection_name
+        self.path = os.path.join(db_path, INDEX_FILE.format(collection=collection_name))
+        self.docs = {}
+        self.postings = {}
+        self.total_length = 0
+        self._signature = None
+        self._lock = threading.Lock()
+        self.refresh()
+
+    @property
+    def exists(self) -> bool:
+        return self._signature is not None
+
+    def __len__(self):
+        return len(self.docs)
+
+    # ---------------- Updates (embed.py) ----------------
+
+    def add(self, ids: List[str], documents: List[str], metadatas: List[Dict]):
+        with self._lock:
+            for doc_id, document, metadata in zip(ids, documents, metadatas):
+                self._remove(doc_id)
+                tf = Counter(tokenize(document))
+                length = sum(tf.values())
+                self.docs[doc_id] = (metadata.get("source_file", "unknown"), length, dict(tf))
+                self.total_length += length
+                for term, count in tf.items():
+                    self.postings.setdefault(term, {})[doc_id] = count
+
+    def remove(self, ids: Iterable[str]):
+        with self._lock:
+            for doc_id in ids:
+                self._remove(doc_id)
+
+    def _remove(self, doc_id: str):
+        # Caller holds the lock
+        entry = self.docs.pop(doc_id, None)
+        if entry is None:
+            return
+        self.total_length -= entry[1]
+        for term in entry[2]:
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self.postings[term]
+
+    def clear(self):
+        with self._lock:
+            self.docs = {}
+            self.postings = {}
+            self.total_length = 0
+
+    def save(self):
+        with self._lock:
+            data = {"docs": {doc_id: list(entry) for doc_id, entry in self.docs.items()}}
+        os.makedirs(self.db_path, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        st = os.stat(self.path)
+        self._signature = (st.st_mtime_ns, st.st_ino, st.st_size)
+
+    # ---------------- Loading ----------------
+
+    def refresh(self):
+        """(Re)load the index if the file changed since it was last read."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        signature = (st.st_mtime_ns, st.st_ino, st.st_size)
+        if signature == self._signature:
+            return
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable lexical index {self.path}: {e}")
+            return
+
+        docs = {doc_id: tuple(entry) for doc_id, entry in data.get("docs", {}).items()}
+        postings = {}
+        total_length = 0
+        for doc_id, (_, length, tf) in docs.items():
+            total_length += length
+            for term, count in tf.items():
+                postings.setdefault(term, {})[doc_id] = count
+
+        with self._lock:
+            self.docs = docs
+            self.postings = postings
+            self.total_length = total_length
+            self._signature = signature
+        logger.info(f"Loaded lexical index with {len(docs)} documents from {self.path}")
+
+    # ---------------- Search ----------------
+
+    def search(self, query: str, n_results: int = 10, sources=None) -> List[Tuple[str, float]]:
+        """
+        Top (id, BM25 score) pairs for the query, best first.
+        sources: optional collection of source_file names to search in.
+        """
+        self.refresh()
+        with self._lock:
+            n_docs = len(self.docs)
+            if not n_docs:
+                return []
+            avg_length = self.total_length / n_docs
+
+            scores = {}
+            for term in set(tokenize(query)):
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+                for doc_id, tf in posting.items():
+                    source, length, _ = self.docs[doc_id]
+                    if sources is not None and source not in sources:
+                        continue
+                    norm = tf + K1 * (1 - B + B * length / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (K1 + 1) / norm
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:n_results]
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse several best-first id lists; returns (id, fused score) best first."""
+    fused = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+# llm_backend.py
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import AsyncIterator, Dict, Iterator, List
+
+logger = logging.getLogger("integrated_chatbot")
+
+# Every GPT call of the chatbot goes through an LLMBackend:
+#   openai - the real API (needs OPENAI_API_KEY; OPENAI_BASE_URL is honoured,
+#            so it can also talk to the stand-in server below)
+#   local  - deterministic canned answers with a configurable latency
+#            distribution, for benchmarking the stack fully offline
+# Pick one with ANEES_LLM_BACKEND (default: openai).
+BACKENDS = ("openai", "local")
+
+# What a call is for; the local backend answers according to it
+PURPOSES = ("mbti_question", "mental_question", "final_report", "empathy")
+
+# Sent with every OpenAI request so the stand-in server knows the purpose
+PURPOSE_HEADER = "X-Anees-Purpose"
+
+
+class LLMBackend(ABC):
+    """Chat-completion interface used by IntegratedRAGChatbot."""
+
+    name = "base"
+
+    @abstractmethod
+    def complete(
+        self,
+        messages: List[Dict],
+        temperature: float = 0.7,
+        max_tokens: int = 400,
+        purpose: str = "chat",
+    ) -> str:
+        """Return the assistant message text for the chat messages."""
+
+    async def acomplete(
+        self,
+        messages: List[Dict],
+        temperature: float = 0.7,
+        max_tokens: int = 400,
+        purpose: str = "chat",
+    ) -> str:
+        """complete() for asyncio callers; backends without a native client use a thread."""
+        return await asyncio.to_thread(self.complete, messages, temperature, max_tokens, purpose)
+
+    def stream(
+        self,
+        messages: List[Dict],
+        temperature: float = 0.7,
+        max_tokens: int = 400,
+        purpose: str = "chat",
+    ) -> Iterator[str]:
+        """Yield the assistant message as text deltas; by default in one piece."""
+        yield self.complete(messages, temperature, max_tokens, purpose)
+
+    async def astream(
+        self,
+        messages: List[Dict],
+        temperature: float = 0.7,
+        max_tokens: int = 400,
+        purpose: str = "chat",
+    ) -> AsyncIterator[str]:
+        """stream() for asyncio callers."""
+        yield await self.acomplete(messages, temperature, max_tokens, purpose)
+
+    def stats(self) -> dict:
+        return {"backend": self.name}
+
+
+class OpenAIBackend(LLMBackend):
+    name = "openai"
+
+    def __init__(self, model: str = "gpt-4o-mini", api_key: str = None, base_url: str = None):
+        api_key = api_key or os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY not found in environment variables.")
+
+        from openai import AsyncOpenAI, OpenAI
+        self.model = model
+        base_url = base_url or os.getenv("OPENAI_BASE_URL") or None
+        self.client = OpenAI(api_key=api_key, base_url=base_url)
+        # Used by acomplete(), so a slow completion never blocks the event loop
+        self.async_client = AsyncOpenAI(api_key=api_key, base_url=base_url)
+        logger.info("OpenAI client initialized.")
+
+    def complete(self, messages, temperature=0.7, max_tokens=400, purpose="chat"):
+        resp = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            extra_headers={PURPOSE_HEADER: purpose},
+        )
+        return resp.choices[0].message.content
+
+    async def acomplete(self, messages, temperature=0.7, max_tokens=400, purpose="chat"):
+        resp = await self.async_client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            extra_headers={PURPOSE_HEADER: purpose},
+        )
+        return resp.choices[0].message.content
+
+    def stream(self, messages, temperature=0.7, max_tokens=400, purpose="chat"):
+        chunks = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            extra_headers={PURPOSE_HEADER: purpose},
+            stream=True,
+        )
+        for chunk in chunks:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    async def astream(self, messages, temperature=0.7, max_tokens=400, purpose="chat"):
+        chunks = await self.async_client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            extra_headers={PURPOSE_HEADER: purpose},
+            stream=True,
+        )
+        async for chunk in chunks:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    def stats(self):
+        return {"backend": self.name, "model": self.model}
+
+
+# ---------------- Local stand-in ----------------
+
+CANNED_MBTI_QUESTIONS = [
+    {
+        "question": "After a long week at university, how do you prefer to recharge?",
+        "options": [
+            "A) Going out with a group of friends",
+            "B) Staying in alone with a book, game or show",
+            "C) A quiet evening with one close friend",
+            "D) Trying a new place or activity",
+        ],
+    },
+    {
+        "question": "When you start a group project, what do you usually do first?",
+        "options": [
+            "A) Make a clear plan and deadlines",
+            "B) Brainstorm lots of ideas before deciding",
+            "C) Check how everyone in the group feels about it",
+            "D) Jump in and figure it out as we go",
+        ],
+    },
+    {
+        "question": "When a friend asks for advice, what do you focus on?",
+        "options": [
+            "A) The facts and the most logical solution",
+            "B) How they feel and what would help them most",
+            "C) Past experiences that worked for others",
+            "D) New possibilities they have not considered",
+        ],
+    },
+    {
+        "question": "How do you usually handle your study schedule?",
+        "options": [
+            "A) I plan it carefully and stick to it",
+            "B) I keep it flexible and adapt day by day",
+            "C) I study when I feel inspired",
+            "D) I follow a routine that has always worked",
+        ],
+    },
+]
+
+CANNED_MENTAL_QUESTIONS = [
+    "How have you been sleeping over the last couple of weeks?",
+    "When things get stressful at university, what usually helps you cope?",
+    "How has your energy been during the day lately?",
+    "Have you been able to enjoy the things you usually like doing?",
+    "How easy or hard has it been to concentrate on your studies recently?",
+    "Who do you usually talk to when something is bothering you?",
+]
+
+CANNED_EMPATHY = (
+    "Thank you for sharing how you feel. It makes sense to feel that way, "
+    "and I'm glad you're taking a moment for yourself."
+)
+
+CANNED_REPORT = """Important Notice
+This overview is educational and is not a diagnosis.
+
+Symptom Indicator Overview
+- Your answers mention some everyday stress and changes in energy.
+
+DSM-Informed Themes
+- Stress and sleep can affect mood and concentration.
+
+Personality Profile (MBTI)
+- Your answers lean towards reflection and planning.
+
+Personality & Coping Link
+- Quiet time and clear plans may help you recharge.
+
+What This Means
+- Many students feel this way at busy times.
+
+What Helps
+- Keep a regular sleep routine, move your body, and talk with people you trust.
+
+When to Seek Support
+- If you feel overwhelmed for a long time, reach out to a licensed mental health professional.
+
+Final Reassurance
+- Noticing how you feel is already a strong first step."""
+
+
+def parse_latency(spec: str):
+    """
+    Latency distribution spec (milliseconds):
+      "0"                  - no delay
+      "fixed:800"          - always 800 ms
+      "uniform:300:1200"   - uniform between 300 and 1200 ms
+      "lognormal:800:0.5"  - median 800 ms, sigma 0.5 (long tail, like the real API)
+    """
+    parts = (spec or "0").split(":")
+    kind = parts[0]
+    try:
+        if kind.replace(".", "", 1).isdigit():
+            return ("fixed", float(kind))
+        if kind == "fixed" and len(parts) == 2:
+            return ("fixed", float(parts[1]))
+        if kind in ("uniform", "lognormal") and len(parts) == 3:
+            return (kind, float(parts[1]), float(parts[2]))
+    except ValueError:
+        pass
+    raise ValueError(f"Invalid latency spec '{spec}' (see parse_latency)")
+
+
+# When streaming, the first delta arrives after this share of the drawn
+# latency and the rest of the text is spread over the remainder
+FIRST_TOKEN_SHARE = 0.1
+
+
+def split_deltas(text: str) -> List[str]:
+    """Word-sized pieces of text (whitespace kept), like streamed tokens."""
+    return re.findall(r"\S+\s*|\s+", text)
+
+
+class LocalLLMBackend(LLMBackend):
+    """
+    Deterministic offline stand-in for the OpenAI API.
+    Answers depend only on the purpose and a hash of the messages, so two
+    runs of a load test see the same conversation. Latency is drawn from
+    `latency` (see parse_latency) with a seeded RNG.
+    """
+
+    name = "local"
+
+    def __init__(self, latency: str = None, seed: int = 0):
+        self.latency_spec = latency or os.getenv("ANEES_LLM_LATENCY", "0")
+        self.latency = parse_latency(self.latency_spec)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.total_delay = 0.0
+
+    def delay(self) -> float:
+        """Seconds to wait for the next call."""
+        kind = self.latency[0]
+        with self._lock:
+            if kind == "fixed":
+                ms = self.latency[1]
+            elif kind == "uniform":
+                ms = self._rng.uniform(self.latency[1], self.latency[2])
+            else:
+                ms = self._rng.lognormvariate(0, self.latency[2]) * self.latency[1]
+            self.calls += 1
+            self.total_delay += ms / 1000
+        return ms / 1000
+
+    @staticmethod
+    def answer(messages: List[Dict], purpose: str) -> str:
+        digest = hashlib.sha256(json.dumps(messages, sort_keys=True).encode("utf-8")).digest()
+        pick = int.from_bytes(digest[:4], "big")
+
+        if purpose == "mbti_question":
+            return json.dumps(CANNED_MBTI_QUESTIONS[pick % len(CANNED_MBTI_QUESTIONS)])
+        if purpose == "mental_question":
+            return CANNED_MENTAL_QUESTIONS[pick % len(CANNED_MENTAL_QUESTIONS)]
+        if purpose == "final_report":
+            return CANNED_REPORT
+        return CANNED_EMPATHY
+
+    def complete(self, messages, temperature=0.7, max_tokens=400, purpose="chat"):
+        time.sleep(self.delay())
+        return self.answer(messages, purpose)
+
+    async def acomplete(self, messages, temperature=0.7, max_tokens=400, purpose="chat"):
+        await asyncio.sleep(self.delay())
+        return self.answer(messages, purpose)
+
+    def stream(self, messages, temperature=0.7, max_tokens=400, purpose="chat"):
+        delay = self.delay()
+        deltas = split_deltas(self.answer(messages, purpose))
+        time.sleep(delay * FIRST_TOKEN_SHARE)
+        for delta in deltas:
+            yield delta
+            time.sleep(delay * (1 - FIRST_TOKEN_SHARE) / len(deltas))
+
+    async def astream(self, messages, temperature=0.7, max_tokens=400, purpose="chat"):
+        delay = self.delay()
+        deltas = split_deltas(self.answer(messages, purpose))
+        await asyncio.sleep(delay * FIRST_TOKEN_SHARE)
+        for delta in deltas:
+            yield delta
+            await asyncio.sleep(delay * (1 - FIRST_TOKEN_SHARE) / len(deltas))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": self.name,
+                "latency": self.latency_spec,
+                "calls": self.calls,
+                "mean_delay_s": round(self.total_delay / self.calls, 3) if self.calls else 0.0,
+            }
+
+
+def get_backend(name: str = None, model: str = "gpt-4o-mini") -> LLMBackend:
+    """Backend named by `name` or ANEES_LLM_BACKEND (default: openai)."""
+    name = (name or os.getenv("ANEES_LLM_BACKEND") or "openai").lower()
+    if name == "openai":
+        return OpenAIBackend(model=model)
+    if name == "local":
+        return LocalLLMBackend()
+    raise ValueError(f"Unknown LLM backend '{name}' (choose from {', '.join(BACKENDS)})")
+
+
+# ---------------- Stand-in server ----------------
+# OpenAI-compatible /v1/chat/completions endpoint backed by LocalLLMBackend,
+# for load tests that should also include the HTTP client path:
+#   python llm_backend.py --port 8001 --latency lognormal:800:0.5
+#   OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=dummy python "api_chatbot (1).py"
+
+def make_handler(backend: LocalLLMBackend):
+    class StandInHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self.send_error(404)
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            purpose = self.headers.get(PURPOSE_HEADER, "chat")
+            if body.get("stream"):
+                self._stream(body, purpose)
+                return
+            content = backend.complete(body.get("messages", []), purpose=purpose)
+
+            payload = json.dumps({
+                "id": f"standin-{backend.calls}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "standin"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            }).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _stream(self, body, purpose):
+            # OpenAI streaming format: one chat.completion.chunk per SSE event
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            chunk = {
+                "id": f"standin-{backend.calls}",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "standin"),
+            }
+            deltas = [{"role": "assistant"}]
+            for text in backend.stream(body.get("messages", []), purpose=purpose):
+                deltas.append({"content": text})
+                for delta in deltas:
+                    event = dict(chunk, choices=[{"index": 0, "delta": delta, "finish_reason": None}])
+                    self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                deltas = []
+            event = dict(chunk, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}])
+            self.wfile.write(f"data: {json.dumps(event)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    return StandInHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline OpenAI-compatible stand-in server for load testing')
+    parser.add_argument('--host', default='127.0.0.1', help='Bind address (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8001, help='Port (default: 8001)')
+    parser.add_argument('--latency', default='0', help='Latency distribution in ms, e.g. fixed:800, uniform:300:1200, lognormal:800:0.5')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the latency RNG (default: 0)')
+
+    args = parser.parse_args()
+
+    backend = LocalLLMBackend(latency=args.latency, seed=args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(backend))
+    print(f"LLM stand-in listening on http://{args.host}:{args.port}/v1 (latency {args.latency})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Served {backend.calls} completions")
+
+
+if __name__ == "__main__":
+    main()
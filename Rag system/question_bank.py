@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+# question_bank.py
+import argparse
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from typing import List, Optional
+
+logger = logging.getLogger("integrated_chatbot")
+
+# The MBTI questions barely depend on the user, so they are generated
+# offline into a pool next to the Chroma database:
+#   python question_bank.py --per-slot 2
+# At runtime the chatbot serves unseen questions from the pool (balancing
+# the four dimensions, switching category on decline) and only calls GPT
+# once the pool has nothing left for the session.
+BANK_FILE = "question_bank.json"
+
+DIMENSIONS = {
+    "EI": "Extraversion vs Introversion (where energy comes from)",
+    "SN": "Sensing vs Intuition (how information is taken in)",
+    "TF": "Thinking vs Feeling (how decisions are made)",
+    "JP": "Judging vs Perceiving (how life is organised)",
+}
+
+CATEGORIES = (
+    "university",
+    "friends",
+    "free_time",
+    "family",
+    "decisions",
+    "planning",
+    "conflict",
+    "new_experiences",
+)
+
+_OPTION_RE = re.compile(r"^([A-D])\)\s*\S")
+
+
+def normalize_question(text: str) -> str:
+    return " ".join(re.sub(r"[^\w\s]", " ", (text or "").lower()).split())
+
+
+def question_id(text: str) -> str:
+    return hashlib.sha1(normalize_question(text).encode("utf-8")).hexdigest()[:12]
+
+
+def validate_question(question: str, options: List[str]) -> Optional[str]:
+    """Return why a generated question is unusable, or None if it is fine."""
+    if not question or len(question) < 15 or not question.rstrip().endswith("?"):
+        return "question text"
+    if not 3 <= len(options) <= 4:
+        return f"{len(options)} options"
+    for letter, option in zip("ABCD", options):
+        match = _OPTION_RE.match(option.strip())
+        if not match or match.group(1) != letter:
+            return f"option '{option}'"
+    if len({normalize_question(o[2:]) for o in options}) != len(options):
+        return "duplicate options"
+    return None
+
+
+class QuestionBank:
+    """
+    On-disk pool of validated MBTI questions.
+    - questions: id -> {question, options, dimension, category, created_at}
+    - index:     by_dimension / by_category -> [ids], persisted with the pool
+    The file is re-read whenever the fill job rewrites it.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.path = os.path.join(db_path, BANK_FILE)
+        self.questions = {}
+        self.index = {"by_dimension": {}, "by_category": {}}
+        self.served = 0
+        self.exhausted = 0
+        self._by_text = {}
+        self._signature = None
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def __len__(self):
+        return len(self.questions)
+
+    # ---------------- Loading / Saving ----------------
+
+    def refresh(self):
+        """(Re)load the pool if the file changed since it was last read."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        signature = (st.st_mtime_ns, st.st_ino, st.st_size)
+        if signature == self._signature:
+            return
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable question bank {self.path}: {e}")
+            return
+
+        with self._lock:
+            self.questions = data.get("questions", {})
+            self.index = data.get("index") or self._build_index(self.questions)
+            self._by_text = {normalize_question(q["question"]): qid for qid, q in self.questions.items()}
+            self._signature = signature
+        logger.info(f"Loaded question bank with {len(self.questions)} questions from {self.path}")
+
+    @staticmethod
+    def _build_index(questions: dict) -> dict:
+        index = {"by_dimension": {}, "by_category": {}}
+        for qid, entry in sorted(questions.items()):
+            index["by_dimension"].setdefault(entry["dimension"], []).append(qid)
+            index["by_category"].setdefault(entry["category"], []).append(qid)
+        return index
+
+    def add(self, question: str, options: List[str], dimension: str, category: str) -> bool:
+        """Add a validated question; False if it is already in the pool."""
+        key = normalize_question(question)
+        with self._lock:
+            if key in self._by_text:
+                return False
+            qid = question_id(question)
+            self.questions[qid] = {
+                "question": question,
+                "options": options,
+                "dimension": dimension,
+                "category": category,
+                "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            }
+            self._by_text[key] = qid
+        return True
+
+    def clear(self):
+        with self._lock:
+            self.questions = {}
+            self._by_text = {}
+
+    def save(self):
+        with self._lock:
+            self.index = self._build_index(self.questions)
+            data = {
+                "built_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "questions": self.questions,
+                "index": self.index,
+            }
+        os.makedirs(self.db_path, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        st = os.stat(self.path)
+        self._signature = (st.st_mtime_ns, st.st_ino, st.st_size)
+
+    # ---------------- Selection ----------------
+
+    def select(self, seen: List[str], decline: bool = False, rng: random.Random = None):
+        """
+        Pick a question the session has not seen yet.
+        seen:    texts of the questions already answered or skipped
+        decline: the user declined the last one, so use a category none of
+                 the seen questions came from (if the pool has one)
+        The least covered dimension is preferred, so five questions touch
+        all four. Returns (question, options), or None when exhausted.
+        """
+        self.refresh()
+        with self._lock:
+            seen_ids = {self._by_text.get(normalize_question(q)) for q in seen} - {None}
+            unseen = [qid for qid in self.questions if qid not in seen_ids]
+
+            if decline:
+                seen_categories = {self.questions[qid]["category"] for qid in seen_ids}
+                fresh = [qid for qid in unseen if self.questions[qid]["category"] not in seen_categories]
+                unseen = fresh or unseen
+
+            if not unseen:
+                self.exhausted += 1
+                return None
+
+            coverage = {}
+            for qid in seen_ids:
+                dimension = self.questions[qid]["dimension"]
+                coverage[dimension] = coverage.get(dimension, 0) + 1
+            covered = {qid: coverage.get(self.questions[qid]["dimension"], 0) for qid in unseen}
+            least = min(covered.values())
+            best = [qid for qid in unseen if covered[qid] == least]
+
+            entry = self.questions[(rng or random).choice(best)]
+            self.served += 1
+            return entry["question"], list(entry["options"])
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "questions": len(self.questions),
+                "dimensions": {dim: len(ids) for dim, ids in self.index.get("by_dimension", {}).items()},
+                "served": self.served,
+                "exhausted": self.exhausted,
+            }
+
+
+# ---------------- Offline fill job ----------------
+
+def _fill_request(context: str, dimension: str, category: str, avoid: List[str]) -> dict:
+    """LLM request for one pool question of the given dimension and category."""
+    system_prompt = (
+        "You are creating a multiple-choice question to explore a teen's MBTI-style "
+        "personality preferences. You MUST:\n"
+        "- Use ONLY information consistent with MBTI theory.\n"
+        f"- Explore this MBTI dimension: {DIMENSIONS[dimension]}.\n"
+        f"- Set the question in this everyday situation: {category.replace('_', ' ')}.\n"
+        "- Avoid clinical or mental health language.\n"
+        "- Make the question simple and culture-appropriate, and end it with '?'.\n"
+        "- Provide exactly 4 options, each with the letter AND the text, e.g. \"A) I like to plan ahead\".\n"
+        "- Return ONLY valid JSON: { \"question\": \"...\", \"options\": [\"A) ...\", \"B) ...\", \"C) ...\", \"D) ...\"] }\n"
+    )
+    if avoid:
+        system_prompt += "\n- Do NOT repeat or create similar questions to these:\n"
+        for q in avoid:
+            system_prompt += f"  - '{q}'\n"
+
+    return {
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": json.dumps({"context": context, "dimension": dimension, "category": category})},
+        ],
+        "temperature": 0.9,
+        "max_tokens": 400,
+        "purpose": "mbti_question",
+    }
+
+
+def fill_bank(bot, bank: QuestionBank, per_slot: int = 2, attempts: int = 3) -> dict:
+    """
+    Generate up to `per_slot` questions for every (dimension, category)
+    pair that has fewer, validating each one. Returns fill statistics.
+    """
+    context = bot.build_phase_context("mbti")
+    counts = {}
+    for entry in bank.questions.values():
+        slot = (entry["dimension"], entry["category"])
+        counts[slot] = counts.get(slot, 0) + 1
+
+    stats = {"added": 0, "rejected": 0, "duplicates": 0, "failed": 0}
+    for dimension in DIMENSIONS:
+        for category in CATEGORIES:
+            missing = per_slot - counts.get((dimension, category), 0)
+            tries = 0
+            while missing > 0 and tries < per_slot * attempts:
+                tries += 1
+                avoid = [
+                    q["question"] for q in bank.questions.values()
+                    if q["dimension"] == dimension and q["category"] == category
+                ]
+                try:
+                    raw = bot.llm.complete(**_fill_request(context, dimension, category, avoid))
+                    question, options = bot._parse_mbti_question(raw)
+                except Exception as e:
+                    logger.warning(f"Question generation failed for {dimension}/{category}: {e}")
+                    stats["failed"] += 1
+                    continue
+
+                problem = validate_question(question, options)
+                if problem:
+                    logger.info(f"Rejected question ({problem}): {question}")
+                    stats["rejected"] += 1
+                elif bank.add(question, options, dimension, category):
+                    stats["added"] += 1
+                    missing -= 1
+                else:
+                    stats["duplicates"] += 1
+            print(f"   {dimension} / {category}: {per_slot - max(missing, 0)}/{per_slot}")
+    bank.save()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fill the pre-generated MBTI question pool (run after context_bundles.py)')
+    parser.add_argument('-d', '--db-dir', default='./chroma_db_pdf', help='ChromaDB directory (default: ./chroma_db_pdf)')
+    parser.add_argument('--collection', default='documents', help='Collection name (default: documents)')
+    parser.add_argument('--per-slot', type=int, default=2, help='Questions per dimension/category pair (default: 2)')
+    parser.add_argument('--clear', action='store_true', help='Drop the existing pool before filling')
+
+    args = parser.parse_args()
+
+    # Imported here so the bank can be used without loading the chatbot stack
+    from chatbotR import IntegratedRAGChatbot
+
+    print("MBTI Question Bank")
+    print("=" * 50)
+    bank = QuestionBank(args.db_dir)
+    if args.clear:
+        bank.clear()
+    print(f"Pool has {len(bank)} questions")
+
+    bot = IntegratedRAGChatbot(chroma_db_path=args.db_dir, collection_name=args.collection, question_bank=False)
+    start = time.time()
+    stats = fill_bank(bot, bank, per_slot=args.per_slot)
+    print(f"Added {stats['added']} questions in {time.time() - start:.1f}s "
+          f"({stats['rejected']} rejected, {stats['duplicates']} duplicates, {stats['failed']} failed)")
+    print(f"Pool now has {len(bank)} questions: {bank.stats()['dimensions']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+# rag_cache.py
+import atexit
+import json
+import logging
+import os
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import List, Optional
+
+logger = logging.getLogger("integrated_chatbot")
+
+
+def normalize_query(text: str) -> str:
+    """Canonical form of a query used as cache key (NFC + collapsed whitespace)."""
+    return " ".join(unicodedata.normalize("NFC", text or "").split())
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded LRU cache of query embeddings.
+    - Keyed by (embedding model name, normalized query text)
+    - Persisted to a JSON file so warm restarts skip the model entirely;
+      written in the background at most every save_interval seconds (and
+      at exit), never in the request that missed
+    - Keeps hit/miss counters for monitoring
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 256, save_interval: float = 5.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.save_interval = save_interval
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # one writer of this process's .tmp file at a time
+        self._dirty = False
+        self._timer = None  # pending background save
+        self._load()
+        if self.path:
+            atexit.register(self.flush)
+
+    @staticmethod
+    def _key(model_name: str, text: str) -> str:
+        return f"{model_name}\x1f{normalize_query(text)}"
+
+    def get(self, model_name: str, text: str) -> Optional[List[float]]:
+        key = self._key(model_name, text)
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return embedding
+
+    def put(self, model_name: str, text: str, embedding: List[float]):
+        key = self._key(model_name, text)
+        with self._lock:
+            self._entries[key] = embedding
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+            if self.path and self._timer is None:
+                self._timer = threading.Timer(self.save_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            }
+
+    # ---------------- Persistence ----------------
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for key, embedding in data.get("entries", []):
+                self._entries[key] = embedding
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            logger.info(f"Loaded {len(self._entries)} cached query embeddings from {self.path}")
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable query embedding cache {self.path}: {e}")
+
+    def flush(self):
+        """Write the cache now if it changed since the last save."""
+        with self._lock:
+            self._timer = None
+            if not self._dirty:
+                return
+            self._dirty = False
+        self._save()
+
+    def _save(self):
+        if not self.path:
+            return
+        with self._lock:
+            data = {"entries": list(self._entries.items())}
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            # Per process: API workers (serve_api.py) share the file
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with self._save_lock:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"Could not persist query embedding cache: {e}")
+
+
+class RetrievalResultCache:
+    """
+    Bounded LRU cache of full collection.query() payloads
+    (documents / metadatas / distances).
+    Entries belong to one collection generation; when embed.py bumps the
+    generation the whole cache is dropped.
+    """
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self.generation = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model_name: str, query: str, n_results: int, mode: str = "dense", where=None) -> tuple:
+        where_key = json.dumps(where, sort_keys=True) if where else None
+        return (model_name, normalize_query(query), n_results, mode, where_key)
+
+    def _sync_generation(self, generation: int):
+        # Caller holds the lock
+        if generation != self.generation:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.generation = generation
+
+    def get(self, generation: int, key: tuple):
+        with self._lock:
+            self._sync_generation(generation)
+            results = self._entries.get(key)
+            if results is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return results
+
+    def put(self, generation: int, key: tuple, results: dict):
+        with self._lock:
+            self._sync_generation(generation)
+            self._entries[key] = results
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.generation = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "generation": self.generation,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            }
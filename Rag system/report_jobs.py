@@ -0,0 +1,298 @@
+# report_jobs.py
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Callable, Iterator
+
+logger = logging.getLogger("integrated_chatbot")
+
+# The final report takes 10-20 s of GPT time. ConversationManager starts it
+# as a ReportJob the moment the last answer is accepted, so it is written
+# while the user reads the "take a moment" message. The job buffers every
+# delta: whoever asks for the report later (the next /chat turn, the SSE
+# stream or the polling endpoint) gets the text produced so far and then
+# follows the rest live.
+# With several API workers (serve_api.py) the job also publishes its text to
+# the shared session store, so a request that lands on another worker
+# follows it there (SharedReportJob) instead of writing a second report.
+REPORT_STALE_AFTER = 60  # s without an update before a shared job counts as abandoned
+
+
+def is_stale(entry: dict, now: float = None) -> bool:
+    """A published job that stopped updating before it finished (its worker died)."""
+    return entry["status"] in ("pending", "running") and (now or time.time()) - entry["updated_at"] > REPORT_STALE_AFTER
+
+
+def report_info(entry: dict) -> dict:
+    """ReportJob.info() of a published job."""
+    end = entry["finished_at"] or time.time()
+    return {
+        "status": entry["status"],
+        "partial_report": entry["text"],
+        "elapsed_s": round(end - entry["created_at"], 2),
+        "error": entry["error"],
+    }
+
+
+class ReportJob:
+    """
+    One background report generation.
+    stream: callable returning an iterator of text deltas
+            (IntegratedRAGChatbot.stream_final_report with the answers bound)
+    store:  optional shared store the job publishes its progress to
+            (every publish_interval seconds and when it ends)
+    It runs on a worker thread so it outlives the request that started it
+    and serves both the sync and the async driver.
+    """
+
+    abandoned = False  # only followed jobs can be abandoned
+
+    def __init__(self, user_id: str, stream: Callable[[], Iterator[str]], store=None, publish_interval: float = 0.25):
+        self.user_id = user_id
+        self.status = "pending"  # pending -> running -> done | failed
+        self.error = None
+        self.parts = []
+        self.created_at = time.time()
+        self.finished_at = None
+        self.future = None
+        self.store = store
+        self.publish_interval = publish_interval
+        self._published_at = 0.0
+        self._stream = stream
+        self._cond = threading.Condition()
+        self._waiters = set()  # (loop, asyncio.Event) of async subscribers
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "failed")
+
+    @property
+    def text(self) -> str:
+        with self._cond:
+            return "".join(self.parts)
+
+    def start(self, executor):
+        self.future = executor.submit(self._run)
+        return self
+
+    # ---------------- Shared store ----------------
+
+    def _entry(self, status: str = None, finished_at: float = None) -> dict:
+        with self._cond:
+            return {
+                "status": status or self.status,
+                "text": "".join(self.parts),
+                "error": self.error,
+                "created_at": self.created_at,
+                "finished_at": finished_at or self.finished_at,
+                "updated_at": time.time(),
+                "owner": os.getpid(),
+            }
+
+    def claim(self) -> bool:
+        """
+        Register the job in the store before starting it. False if a live
+        job of another worker already holds the user (follow that one).
+        """
+        if self.store is None:
+            return True
+        entry = self._entry()
+        try:
+            if self.store.add(self.user_id, entry):
+                return True
+            current = self.store.get(self.user_id)
+            if current is None or is_stale(current):
+                self.store[self.user_id] = entry  # take over from a dead worker
+                return True
+            return False
+        except Exception as e:
+            logger.warning(f"Could not register report job for {self.user_id}: {e}")
+            return True  # write it here rather than not at all
+
+    def _publish(self, force: bool = False, **final):
+        store = self.store
+        now = time.time()
+        if store is None or (not force and now - self._published_at < self.publish_interval):
+            return
+        self._published_at = now
+        try:
+            store[self.user_id] = self._entry(**final)
+        except Exception as e:
+            logger.warning(f"Could not publish report job for {self.user_id}: {e}")
+
+    def detach(self):
+        """Stop publishing (the user's session ended or was deleted)."""
+        self.store = None
+
+    def _run(self):
+        with self._cond:
+            self.status = "running"
+        self._publish(force=True)
+        status = "done"
+        try:
+            for delta in self._stream():
+                with self._cond:
+                    self.parts.append(delta)
+                    self._cond.notify_all()
+                self._wake()
+                self._publish()
+        except Exception as e:
+            logger.error(f"Report job for {self.user_id} failed: {e}")
+            self.error = str(e)
+            status = "failed"
+
+        finished_at = time.time()
+        # Published before local readers are woken: once they have the result
+        # the session may end and drop the entry, which must not come back
+        self._publish(force=True, status=status, finished_at=finished_at)
+        with self._cond:
+            self.status = status
+            self.finished_at = finished_at
+            self._cond.notify_all()
+        self._wake()
+        logger.info(f"Report job for {self.user_id} {status} in {self.finished_at - self.created_at:.2f}s")
+
+    def _wake(self):
+        for loop, event in list(self._waiters):
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # The subscriber's loop is closed
+                self._waiters.discard((loop, event))
+
+    # ---------------- Subscribers ----------------
+
+    def subscribe(self, start: int = 0) -> Iterator[str]:
+        """Deltas from index `start` on, blocking until the job ends."""
+        i = start
+        while True:
+            with self._cond:
+                while i >= len(self.parts) and not self.done:
+                    self._cond.wait()
+                new = self.parts[i:]
+                finished = self.done
+            yield from new
+            i += len(new)
+            if finished and i >= len(self.parts):
+                return
+
+    async def asubscribe(self, start: int = 0):
+        """subscribe() for asyncio callers; never blocks the event loop."""
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        self._waiters.add(waiter)
+        try:
+            i = start
+            while True:
+                # Clear before reading, so a delta added after the read sets it again
+                waiter[1].clear()
+                with self._cond:
+                    new = self.parts[i:]
+                    finished = self.done
+                for delta in new:
+                    yield delta
+                i += len(new)
+                if finished:
+                    return
+                await waiter[1].wait()
+        finally:
+            self._waiters.discard(waiter)
+
+    def result(self) -> str:
+        """Full report text, waiting for the job if needed."""
+        return "".join(self.subscribe())
+
+    async def aresult(self) -> str:
+        return "".join([delta async for delta in self.asubscribe()])
+
+    def info(self) -> dict:
+        with self._cond:
+            end = self.finished_at or time.time()
+            return {
+                "status": self.status,
+                "partial_report": "".join(self.parts),
+                "elapsed_s": round(end - self.created_at, 2),
+                "error": self.error,
+            }
+
+
+class SharedReportJob:
+    """
+    A report job running in another worker, followed through the entry it
+    publishes to the shared store. Offers the reading side of ReportJob.
+    If the entry stops updating (the worker died) the job ends as failed
+    and `abandoned` is set, so the caller can write the report itself.
+    """
+
+    def __init__(self, user_id: str, store, poll_interval: float = 0.25):
+        self.user_id = user_id
+        self.store = store
+        self.poll_interval = poll_interval
+        self.abandoned = False
+        now = time.time()
+        self.entry = store.get(user_id) or {
+            "status": "pending", "text": "", "error": None,
+            "created_at": now, "finished_at": None, "updated_at": now,
+        }
+
+    def _poll(self) -> dict:
+        if self.done:
+            return self.entry
+        entry = self.store.get(self.user_id)
+        if entry is None:
+            # The session ended and took the job with it
+            entry = dict(self.entry, status="failed", error="report job removed")
+        elif is_stale(entry):
+            entry = dict(entry, status="failed", error="report job abandoned")
+            self.abandoned = True
+        self.entry = entry
+        return entry
+
+    @property
+    def status(self) -> str:
+        return self.entry["status"]
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "failed")
+
+    @property
+    def text(self) -> str:
+        return self.entry["text"]
+
+    def subscribe(self) -> Iterator[str]:
+        """The text so far, then what is added, polling until the job ends."""
+        sent = 0
+        while True:
+            entry = self._poll()
+            if len(entry["text"]) > sent:
+                yield entry["text"][sent:]
+                sent = len(entry["text"])
+            if self.done:
+                return
+            time.sleep(self.poll_interval)
+
+    async def asubscribe(self):
+        sent = 0
+        while True:
+            # A store read (sqlite/redis I/O): never on the event loop
+            entry = await asyncio.to_thread(self._poll)
+            if len(entry["text"]) > sent:
+                yield entry["text"][sent:]
+                sent = len(entry["text"])
+            if self.done:
+                return
+            await asyncio.sleep(self.poll_interval)
+
+    def result(self) -> str:
+        return "".join(self.subscribe())
+
+    async def aresult(self) -> str:
+        return "".join([delta async for delta in self.asubscribe()])
+
+    def detach(self):
+        pass
+
+    def info(self) -> dict:
+        return report_info(self._poll())
@@ -0,0 +1,123 @@
+# reranker.py
+import logging
+import threading
+from collections import OrderedDict
+from typing import List
+
+from rag_cache import normalize_query
+
+logger = logging.getLogger("integrated_chatbot")
+
+# Small CPU cross-encoder (~22M params) that reads query and chunk together.
+# Much sharper than the bi-encoder distance, so many cheap candidates can be
+# retrieved and only the few best are sent to GPT.
+DEFAULT_RERANKER = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+
+class CrossEncoderReranker:
+    """
+    Re-scores retrieve() output with a cross-encoder.
+    - Candidates are scored in one batch
+    - (query, chunk_id) scores live in a bounded LRU cache, so the fixed
+      phase queries only ever score a chunk once; the chunk's content_hash
+      is part of the key, so re-embedded text is scored again
+    - The model is loaded on first use; if it cannot be loaded the results
+      are passed through unchanged
+    """
+
+    def __init__(self, model_name: str = DEFAULT_RERANKER, cache_size: int = 4096, batch_size: int = 32):
+        self.model_name = model_name
+        self.cache_size = cache_size
+        self.batch_size = batch_size
+        self.hits = 0
+        self.misses = 0
+        self._model = None
+        self._failed = False
+        self._scores = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    @property
+    def model(self):
+        with self._load_lock:
+            if self._model is None and not self._failed:
+                try:
+                    import resources
+                    logger.info(f"Loading reranker model: {self.model_name}")
+                    self._model = resources.cross_encoder(self.model_name)
+                except Exception as e:
+                    self._failed = True
+                    logger.warning(f"Reranker unavailable ({e}), keeping retrieval order.")
+            return self._model
+
+    def score(self, query: str, ids: List[str], documents: List[str], versions: List[str] = None) -> List[float]:
+        """Cross-encoder scores for (query, document) pairs, cached by chunk id."""
+        query = normalize_query(query)
+        versions = versions or [None] * len(ids)
+        keys = [(query, chunk_id, version) for chunk_id, version in zip(ids, versions)]
+        scores = [None] * len(ids)
+        todo = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                cached = self._scores.get(key)
+                if cached is None:
+                    todo.append(i)
+                    continue
+                self._scores.move_to_end(key)
+                scores[i] = cached
+            self.hits += len(ids) - len(todo)
+            self.misses += len(todo)
+
+        if todo:
+            predicted = self.model.predict(
+                [(query, documents[i]) for i in todo],
+                batch_size=self.batch_size,
+                show_progress_bar=False,
+            )
+            with self._lock:
+                for i, value in zip(todo, predicted):
+                    scores[i] = float(value)
+                    self._scores[keys[i]] = scores[i]
+                while len(self._scores) > self.cache_size:
+                    self._scores.popitem(last=False)
+        return scores
+
+    def rerank(self, query: str, results: dict, keep: int) -> dict:
+        """
+        Reorder retrieve() output by cross-encoder score and keep the best
+        `keep` chunks. Scores are returned under "scores" (build_context
+        ranks by them).
+        """
+        if not results or not results.get("ids") or not results["ids"][0] or self.model is None:
+            return results
+
+        ids = results["ids"][0]
+        documents = [str(doc) for doc in results["documents"][0]]
+        versions = [(meta or {}).get("content_hash") for meta in results["metadatas"][0]]
+        scores = self.score(query, ids, documents, versions)
+        order = sorted(range(len(ids)), key=lambda i: scores[i], reverse=True)[:keep]
+
+        return {
+            "ids": [[ids[i] for i in order]],
+            "documents": [[results["documents"][0][i] for i in order]],
+            "metadatas": [[results["metadatas"][0][i] for i in order]],
+            "distances": [[results["distances"][0][i] for i in order]],
+            "scores": [[scores[i] for i in order]],
+        }
+
+    def clear(self):
+        with self._lock:
+            self._scores.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "model": self.model_name,
+                "loaded": self._model is not None,
+                "entries": len(self._scores),
+                "max_entries": self.cache_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            }
@@ -0,0 +1,94 @@
+# resources.py
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger("integrated_chatbot")
+
+# Process-wide registry of the heavy objects: embedding model, Chroma
+# clients, LLM backend, cross-encoder and the default chatbot. Each one is
+# created on first use, exactly once, and then shared by
+# ConversationManager, run_assessment and the API.
+# The objects may be used from several threads, with one exception: the
+# embedder's tokenizer is reconfigured by every encode() call, so code that
+# tokenizes on its own (token counting) must work on a copy of it.
+
+_registry = {}
+_key_locks = {}
+_registry_lock = threading.Lock()
+
+
+def get_or_create(key: tuple, factory):
+    """
+    Return the object registered under key, creating it with factory() the
+    first time. Creation runs under a per-key lock, so two threads never
+    load the same model twice and loading one resource never blocks
+    lookups of another.
+    """
+    resource = _registry.get(key)
+    if resource is not None:
+        return resource
+
+    with _registry_lock:
+        key_lock = _key_locks.setdefault(key, threading.Lock())
+    with key_lock:
+        resource = _registry.get(key)
+        if resource is None:
+            start = time.time()
+            resource = factory()
+            _registry[key] = resource
+            logger.info(f"Created shared {key[0]} {key[1:]} in {time.time() - start:.2f}s")
+    return resource
+
+
+def embedder(model_name: str = "BAAI/bge-m3", service: str = None):
+    """
+    The embedding model, or with ANEES_EMBEDDING_SERVICE (set by serve_api.py
+    for its workers) a client of the shared embedding service process.
+    service="" forces the in-process model.
+    """
+    address = os.getenv("ANEES_EMBEDDING_SERVICE") if service is None else service
+    if address:
+        from embedding_service import RemoteEmbedder
+        return get_or_create(
+            ("embedding_service", model_name, address), lambda: RemoteEmbedder(address, model_name)
+        )
+
+    def load():
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name)
+    return get_or_create(("embedder", model_name), load)
+
+
+def chroma_client(path: str = "./chroma_db_pdf"):
+    def connect():
+        import chromadb
+        return chromadb.PersistentClient(path=path)
+    return get_or_create(("chroma_client", os.path.abspath(path)), connect)
+
+
+def llm_backend(name: str = None, model: str = "gpt-4o-mini"):
+    from llm_backend import get_backend
+    name = (name or os.getenv("ANEES_LLM_BACKEND") or "openai").lower()
+    return get_or_create(("llm_backend", name, model), lambda: get_backend(name, model=model))
+
+
+def cross_encoder(model_name: str):
+    def load():
+        from sentence_transformers import CrossEncoder
+        return CrossEncoder(model_name, device="cpu")
+    return get_or_create(("cross_encoder", model_name), load)
+
+
+def chatbot():
+    """The default-configured IntegratedRAGChatbot of this process."""
+    def build():
+        from chatbotR import IntegratedRAGChatbot
+        return IntegratedRAGChatbot()
+    return get_or_create(("chatbot",), build)
+
+
+def loaded() -> list:
+    """Names of the resources created so far (for /health)."""
+    return sorted(" ".join(str(part) for part in key) for key in list(_registry))
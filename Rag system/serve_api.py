@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# serve_api.py
+import argparse
+import gc
+import importlib.util
+import logging
+import multiprocessing
+import os
+import secrets
+import signal
+import socket
+import sys
+import time
+
+logger = logging.getLogger("integrated_chatbot")
+
+# Multi-worker launcher for the chatbot API (POSIX only, it forks):
+#   python serve_api.py --workers 4                     # shared embedding service
+#   python serve_api.py --workers 4 --embedding preload # model shared copy-on-write
+# The port is bound once here and every worker runs its own uvicorn.Server
+# on that socket, so the kernel spreads connections over the workers.
+#   service: one embedding_service.py process holds BGE-M3 and batches the
+#            workers' encode calls; the workers never load it
+#   preload: the model is loaded here before forking and the workers read
+#            the parent's copy; each worker encodes on its own cores
+# Either way the cross-encoder is loaded before forking and shared too.
+# Sessions and report jobs must be visible to every worker, so the memory
+# session store is replaced by sqlite unless redis is configured. Prefetched
+# questions stay per worker: a turn on another worker calls GPT directly.
+API_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "api_chatbot (1).py")
+
+
+def load_api(path: str = API_FILE):
+    """Import the API module from its file (its name is not importable)."""
+    spec = importlib.util.spec_from_file_location("api_chatbot", path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["api_chatbot"] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def start_embedding_service(model_name: str, address: str, max_batch: int, max_wait: float):
+    """Start the embedding service process and point this process (and its forks) at it."""
+    from embedding_service import RemoteEmbedder, run_service
+
+    authkey = secrets.token_hex(16)
+    # Spawned, not forked: the service starts from a clean interpreter
+    process = multiprocessing.get_context("spawn").Process(
+        target=run_service,
+        args=(model_name, address, authkey, max_batch, max_wait),
+        name="embedding-service",
+        daemon=True,
+    )
+    process.start()
+    os.environ["ANEES_EMBEDDING_SERVICE"] = address
+    os.environ["ANEES_EMBEDDING_KEY"] = authkey
+
+    print(f"Waiting for the embedding service (pid {process.pid}) to load {model_name}...")
+    client = RemoteEmbedder(address, model_name)
+    try:
+        client.wait_ready()
+    finally:
+        client.close()
+    return process
+
+
+def preload(model_name: str, embedding: str, rerank: bool):
+    """Load the shared models in the parent, before any worker is forked."""
+    import resources
+    from reranker import DEFAULT_RERANKER
+
+    if embedding == "preload":
+        resources.embedder(model_name, service="")
+    if rerank:
+        resources.cross_encoder(DEFAULT_RERANKER)
+    # Keep the collector from writing to the inherited objects, which would
+    # copy their pages into every worker
+    gc.collect()
+    gc.freeze()
+
+
+def run_worker(sock: socket.socket, args, torch_threads: int):
+    """Body of a forked worker: import the API and serve on the shared socket."""
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+
+    import uvicorn
+    api = load_api()
+    config = uvicorn.Config(api.app, log_level=args.log_level)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def fork_worker(sock: socket.socket, args, torch_threads: int) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            run_worker(sock, args, torch_threads)
+        except BaseException as e:
+            logger.error(f"Worker {os.getpid()} failed: {e}")
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def supervise(sock: socket.socket, args, torch_threads: int, service=None):
+    """Keep args.workers workers alive until SIGINT/SIGTERM, then stop them."""
+    stopping = []
+
+    def stop(signum, frame):
+        stopping.append(signum)
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    workers = {}  # pid -> started_at
+    for _ in range(args.workers):
+        workers[fork_worker(sock, args, torch_threads)] = time.time()
+    print(f"Serving on http://{args.host}:{args.port} with workers {sorted(workers)}")
+
+    while not stopping:
+        # Only the worker pids: reaping the service here would hide its exit from is_alive()
+        for pid in list(workers):
+            try:
+                done, status = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                done, status = pid, -1
+            if done == 0:
+                continue
+            started_at = workers.pop(pid)
+            print(f"Worker {pid} exited with status {status}, restarting")
+            if time.time() - started_at < 5:
+                time.sleep(1)  # crashing on startup, do not spin
+            workers[fork_worker(sock, args, torch_threads)] = time.time()
+        if service is not None and not service.is_alive():
+            print(f"Embedding service died (exit code {service.exitcode}), shutting down")
+            break
+        time.sleep(0.5)
+
+    for pid in workers:
+        try:
+            os.kill(pid, signal.SIGTERM)  # uvicorn finishes the open requests
+        except ProcessLookupError:
+            pass
+    for pid in workers:
+        try:
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
+    if service is not None:
+        service.terminate()
+        service.join(10)
+    sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the chatbot API with several worker processes')
+    parser.add_argument('--host', default='0.0.0.0', help='Bind address (default: 0.0.0.0)')
+    parser.add_argument('--port', type=int, default=8000, help='Port (default: 8000)')
+    parser.add_argument('-w', '--workers', type=int, default=min(4, os.cpu_count() or 1),
+                        help='API worker processes (default: CPU count, at most 4)')
+    parser.add_argument('--embedding', choices=['service', 'preload'], default='service',
+                        help='Share the embedding model through one service process or copy-on-write (default: service)')
+    parser.add_argument('--model', default='BAAI/bge-m3', help='Embedding model (default: BAAI/bge-m3)')
+    parser.add_argument('--service-address', default=f'/tmp/anees-embed-{os.getpid()}.sock',
+                        help='Embedding service socket, a path or host:port (default: /tmp/anees-embed-<pid>.sock)')
+    parser.add_argument('--max-batch', type=int, default=64, help='Most texts per embedding batch (default: 64)')
+    parser.add_argument('--max-wait-ms', type=float, default=0.0, help='Extra time a batch waits for requests (default: 0)')
+    parser.add_argument('--no-rerank', action='store_true', help='Do not preload the cross-encoder')
+    parser.add_argument('--log-level', default='info', help='uvicorn log level (default: info)')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if not hasattr(os, "fork"):
+        parser.error('workers are forked, which this platform cannot do; run "api_chatbot (1).py" directly')
+
+    print("Anees Chatbot API")
+    print("=" * 50)
+    if (os.getenv("ANEES_SESSION_STORE") or "memory").lower() == "memory":
+        os.environ["ANEES_SESSION_STORE"] = "sqlite"
+        print("Session store: sqlite (in-memory sessions are not shared between workers)")
+
+    sock = bind_socket(args.host, args.port)
+    service = None
+    if args.embedding == "service":
+        service = start_embedding_service(args.model, args.service_address, args.max_batch, args.max_wait_ms / 1000)
+    else:
+        os.environ.pop("ANEES_EMBEDDING_SERVICE", None)
+    preload(args.model, args.embedding, not args.no_rerank)
+
+    # The workers split the cores; with the service they only run the cross-encoder
+    torch_threads = max(1, (os.cpu_count() or 1) // args.workers)
+    supervise(sock, args, torch_threads, service)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+# session_model.py
+import json
+import sys
+from collections import deque
+from typing import List, Optional
+
+try:
+    import msgpack
+except ImportError:  # JSON still works, the stored sessions are just larger
+    msgpack = None
+
+# One user's conversation state, loaded and saved by ConversationManager on
+# every turn. Slotted attributes instead of a free-form dict, the chat
+# history in a bounded ring buffer, and question texts interned so the
+# sessions of many users share one copy of each (question bank) question.
+
+HISTORY_LIMIT = 32
+FORMAT_VERSION = 1
+
+
+class Session:
+    __slots__ = (
+        "step",                      # state machine position, e.g. "personality_3"
+        "phase",                     # None, "personality" or "mental_health"
+        "show_header",
+        "risk_session_id",
+        "personality_answers",       # [{"question", "answer"}], the shape the prompts use
+        "mental_answers",
+        "personality_skip_history",  # question texts skipped or declined
+        "mental_skip_history",
+        "current_question",          # MBTI question on screen
+        "current_options",
+        "last_mental_question",      # mental health question on screen ("" if none)
+        "history",                   # deque of {"role", "content"}, newest last
+    )
+
+    def __init__(self, risk_session_id: str = ""):
+        self.step = "intro"
+        self.phase = None
+        self.show_header = True
+        self.risk_session_id = risk_session_id
+        self.personality_answers = []
+        self.mental_answers = []
+        self.personality_skip_history = []
+        self.mental_skip_history = []
+        self.current_question = None
+        self.current_options = []
+        self.last_mental_question = ""
+        self.history = deque(maxlen=HISTORY_LIMIT)
+
+    # ---------------- Updates ----------------
+
+    def show_question(self, question: str, options: List[str]):
+        self.current_question = sys.intern(question)
+        self.current_options = list(options)
+
+    def add_history(self, role: str, content: str):
+        self.history.append({"role": role, "content": content})
+
+    def answer_personality(self, answer: str):
+        self.personality_answers.append({"question": self.current_question, "answer": answer})
+
+    def answer_mental(self, answer: str):
+        self.mental_answers.append({"question": self.last_mental_question, "answer": answer})
+
+    def skip_personality(self):
+        self.personality_skip_history.append(self.current_question)
+
+    def skip_mental(self):
+        self.mental_skip_history.append(self.last_mental_question)
+
+    @property
+    def questions_answered(self) -> int:
+        return len(self.personality_answers) + len(self.mental_answers)
+
+    # ---------------- Serialization ----------------
+    # Positional fields, and every question text stored once in a string
+    # table that the answers and skip histories refer to by index.
+
+    def pack(self) -> bytes:
+        strings = []
+        index = {}
+
+        def ref(text: Optional[str]):
+            if text is None:
+                return None
+            if text not in index:
+                index[text] = len(strings)
+                strings.append(text)
+            return index[text]
+
+        fields = [
+            FORMAT_VERSION,
+            self.step,
+            self.phase,
+            self.show_header,
+            self.risk_session_id,
+            [[ref(a["question"]), a["answer"]] for a in self.personality_answers],
+            [[ref(a["question"]), a["answer"]] for a in self.mental_answers],
+            [ref(q) for q in self.personality_skip_history],
+            [ref(q) for q in self.mental_skip_history],
+            ref(self.current_question),
+            self.current_options,
+            ref(self.last_mental_question),
+            [[h["role"], h["content"]] for h in self.history],
+            strings,
+        ]
+        if msgpack is not None:
+            return msgpack.packb(fields, use_bin_type=True)
+        return json.dumps(fields, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    @classmethod
+    def unpack(cls, data: bytes) -> "Session":
+        # JSON output always starts with "[", msgpack arrays never do
+        if data[:1] == b"[":
+            fields = json.loads(data)
+        elif msgpack is not None:
+            fields = msgpack.unpackb(data, raw=False)
+        else:
+            raise ValueError("Session was stored with msgpack, which is not installed")
+        if fields[0] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported session format {fields[0]}")
+
+        (_, step, phase, show_header, risk_session_id, personality, mental,
+         personality_skips, mental_skips, current, options, last_mental, history, strings) = fields
+        strings = [sys.intern(s) for s in strings]
+
+        def text(i):
+            return None if i is None else strings[i]
+
+        session = cls(risk_session_id)
+        session.step = step
+        session.phase = phase
+        session.show_header = show_header
+        session.personality_answers = [{"question": text(q), "answer": a} for q, a in personality]
+        session.mental_answers = [{"question": text(q), "answer": a} for q, a in mental]
+        session.personality_skip_history = [text(q) for q in personality_skips]
+        session.mental_skip_history = [text(q) for q in mental_skips]
+        session.current_question = text(current)
+        session.current_options = options
+        session.last_mental_question = text(last_mental)
+        session.history.extend({"role": role, "content": content} for role, content in history)
+        return session
+
+    def __repr__(self):
+        return f"Session(step={self.step!r}, answered={self.questions_answered})"
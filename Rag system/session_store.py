@@ -0,0 +1,584 @@
+#!/usr/bin/env python3
+# session_store.py
+import argparse
+import fnmatch
+import json
+import logging
+import os
+import socket
+import socketserver
+import sqlite3
+import threading
+import time
+from abc import abstractmethod
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from urllib.parse import urlparse
+
+logger = logging.getLogger("integrated_chatbot")
+
+# Where conversation state lives. ConversationManager keeps its sessions
+# here and the API its per-user bookkeeping (in another namespace), so any
+# number of worker processes can serve the same users:
+#   memory - per-process dict with TTL + LRU eviction (default)
+#   sqlite - one file shared by the workers of one machine
+#   redis  - any Redis-protocol server (`python session_store.py` runs a
+#            local stand-in for tests)
+# Pick one with ANEES_SESSION_STORE; every backend expires a session
+# ANEES_SESSION_TTL seconds after it was last read or written. A membership
+# test (`user_id in store`) and peek() are not reads: they never extend the
+# session, so monitoring never keeps an abandoned one alive.
+BACKENDS = ("memory", "sqlite", "redis")
+
+DEFAULT_TTL = 3600
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_SQLITE_PATH = "./sessions.db"
+DEFAULT_REDIS_URL = "redis://127.0.0.1:6379/0"
+KEY_PREFIX = "anees"
+
+
+class SessionStore(MutableMapping):
+    """
+    Dict-like session storage: store[user_id] -> session.
+    Stores other than memory hand out copies, so a changed session must be
+    assigned back (store[user_id] = session) to be kept.
+    Abstract (MutableMapping is an ABC): a backend missing a method fails
+    when it is created, not in the middle of a request.
+    """
+
+    name = "base"
+
+    def __init__(self, namespace: str = "sessions", ttl: float = DEFAULT_TTL, dumps=None, loads=None):
+        self.namespace = namespace
+        self.ttl = ttl
+        # Custom serialization (e.g. Session.pack / Session.unpack)
+        if dumps is not None:
+            self.dumps = dumps
+        if loads is not None:
+            self.loads = loads
+
+    # Default serialization: plain JSON-compatible dicts
+    @staticmethod
+    def dumps(value: dict) -> bytes:
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    @staticmethod
+    def loads(data: bytes) -> dict:
+        return json.loads(data)
+
+    @abstractmethod
+    def add(self, key, value) -> bool:
+        """Store value only if key holds no live session (atomically); True if stored."""
+
+    @abstractmethod
+    def peek(self, key, default=None):
+        """The value of key without refreshing its TTL (or LRU position)."""
+
+    def items(self, touch: bool = True):
+        """
+        (key, value) pairs; keys that expire while listing are skipped.
+        touch=False lists through peek(), leaving every TTL as it was.
+        """
+        read = self.get if touch else self.peek
+        for key in list(self):
+            value = read(key)
+            if value is not None:
+                yield key, value
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "namespace": self.namespace, "ttl_s": self.ttl, "sessions": len(self)}
+
+
+class MemorySessionStore(SessionStore):
+    """
+    In-process store. Reads and writes move a session to the end of an
+    OrderedDict and push its expiry back, so the front always holds the
+    least recently used (and soonest expiring) sessions.
+    """
+
+    name = "memory"
+
+    def __init__(self, namespace: str = "sessions", ttl: float = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES, **codec):
+        super().__init__(namespace, ttl, **codec)
+        self.max_entries = max_entries
+        self.expired = 0
+        self.evicted = 0
+        self._entries = OrderedDict()  # key -> [expires_at, session]
+        self._lock = threading.Lock()
+
+    def _purge(self, now: float):
+        # Caller holds the lock
+        while self._entries:
+            key, (expires_at, _) = next(iter(self._entries.items()))
+            if expires_at > now:
+                break
+            del self._entries[key]
+            self.expired += 1
+
+    def __getitem__(self, key):
+        now = time.time()
+        with self._lock:
+            self._purge(now)
+            entry = self._entries[key]
+            entry[0] = now + self.ttl
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def _set(self, key, value, now: float):
+        # Caller holds the lock
+        self._purge(now)
+        self._entries[key] = [now + self.ttl, value]
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evicted += 1
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._set(key, value, time.time())
+
+    def add(self, key, value) -> bool:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                return False
+            self._set(key, value, now)
+            return True
+
+    def peek(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[1] if entry is not None and entry[0] > time.time() else default
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[0] > time.time()
+
+    def __delitem__(self, key):
+        with self._lock:
+            del self._entries[key]
+
+    def __iter__(self):
+        with self._lock:
+            self._purge(time.time())
+            return iter(list(self._entries))
+
+    def __len__(self):
+        with self._lock:
+            self._purge(time.time())
+            return len(self._entries)
+
+    def stats(self):
+        stats = super().stats()
+        stats.update({"max_entries": self.max_entries, "expired": self.expired, "evicted": self.evicted})
+        return stats
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Sessions in one SQLite file (WAL mode), shared by every process that
+    opens it. One connection per thread; expired rows are ignored on read
+    and deleted every `purge_every` writes.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, namespace: str = "sessions", ttl: float = DEFAULT_TTL, path: str = DEFAULT_SQLITE_PATH, purge_every: int = 100, **codec):
+        super().__init__(namespace, ttl, **codec)
+        self.path = path
+        self.purge_every = purge_every
+        self._writes = 0
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL,"
+                " expires_at REAL NOT NULL, PRIMARY KEY (namespace, key))"
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def __getitem__(self, key):
+        now = time.time()
+        with self._conn() as conn:
+            row = conn.execute(
+                "SELECT value FROM sessions WHERE namespace = ? AND key = ? AND expires_at > ?",
+                (self.namespace, key, now),
+            ).fetchone()
+            if row is None:
+                raise KeyError(key)
+            conn.execute(
+                "UPDATE sessions SET expires_at = ? WHERE namespace = ? AND key = ?",
+                (now + self.ttl, self.namespace, key),
+            )
+        return self.loads(row[0])
+
+    def __setitem__(self, key, value):
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (self.namespace, key, self.dumps(value), now + self.ttl),
+            )
+            self._writes += 1
+            if self._writes % self.purge_every == 0:
+                conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+
+    def add(self, key, value) -> bool:
+        now = time.time()
+        with self._conn() as conn:
+            # Replaces an expired row, leaves a live one alone
+            cursor = conn.execute(
+                "INSERT INTO sessions (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at"
+                " WHERE sessions.expires_at <= ?",
+                (self.namespace, key, self.dumps(value), now + self.ttl, now),
+            )
+        return cursor.rowcount > 0
+
+    def peek(self, key, default=None):
+        row = self._conn().execute(
+            "SELECT value FROM sessions WHERE namespace = ? AND key = ? AND expires_at > ?",
+            (self.namespace, key, time.time()),
+        ).fetchone()
+        return default if row is None else self.loads(row[0])
+
+    def __contains__(self, key):
+        row = self._conn().execute(
+            "SELECT 1 FROM sessions WHERE namespace = ? AND key = ? AND expires_at > ?",
+            (self.namespace, key, time.time()),
+        ).fetchone()
+        return row is not None
+
+    def __delitem__(self, key):
+        with self._conn() as conn:
+            cursor = conn.execute(
+                "DELETE FROM sessions WHERE namespace = ? AND key = ? AND expires_at > ?",
+                (self.namespace, key, time.time()),
+            )
+        if cursor.rowcount == 0:
+            raise KeyError(key)
+
+    def __iter__(self):
+        rows = self._conn().execute(
+            "SELECT key FROM sessions WHERE namespace = ? AND expires_at > ?",
+            (self.namespace, time.time()),
+        ).fetchall()
+        return iter([row[0] for row in rows])
+
+    def __len__(self):
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM sessions WHERE namespace = ? AND expires_at > ?",
+            (self.namespace, time.time()),
+        ).fetchone()[0]
+
+    def stats(self):
+        stats = super().stats()
+        stats["path"] = self.path
+        return stats
+
+
+# ---------------- Redis protocol ----------------
+
+class RespError(Exception):
+    """Error reply from a Redis-protocol server."""
+
+
+class RespClient:
+    """
+    Minimal blocking Redis (RESP2) client: one connection, one command at
+    a time, reconnecting once if the connection dropped. Enough for the
+    session store without another dependency.
+    """
+
+    def __init__(self, url: str = DEFAULT_REDIS_URL, timeout: float = 5.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.strip("/") or 0)
+        self.password = parsed.password
+        self.timeout = timeout
+        self._sock = None
+        self._file = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._file = self._sock.makefile("rb")
+        if self.password:
+            self._call("AUTH", self.password)
+        if self.db:
+            self._call("SELECT", self.db)
+
+    def close(self):
+        if self._sock is not None:
+            self._file.close()
+            self._sock.close()
+            self._sock = self._file = None
+
+    @staticmethod
+    def encode(*args) -> bytes:
+        out = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode("utf-8")
+            out.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(out)
+
+    def _read(self):
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("Connection closed by server")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode("utf-8")
+        if kind == b"-":
+            raise RespError(rest.decode("utf-8"))
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self._file.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(rest)
+            return None if length < 0 else [self._read() for _ in range(length)]
+        raise RespError(f"Unexpected reply: {line!r}")
+
+    def _call(self, *args):
+        self._sock.sendall(self.encode(*args))
+        return self._read()
+
+    def execute(self, *args):
+        with self._lock:
+            for attempt in (1, 2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    return self._call(*args)
+                except (OSError, ConnectionError):
+                    self.close()
+                    if attempt == 2:
+                        raise
+
+
+class RedisSessionStore(SessionStore):
+    """Sessions as Redis strings under anees:<namespace>:<key>, expired by Redis itself."""
+
+    name = "redis"
+
+    def __init__(self, namespace: str = "sessions", ttl: float = DEFAULT_TTL, url: str = DEFAULT_REDIS_URL, **codec):
+        super().__init__(namespace, ttl, **codec)
+        self.url = url
+        self.client = RespClient(url)
+        self.prefix = f"{KEY_PREFIX}:{namespace}:"
+
+    def __getitem__(self, key):
+        data = self.client.execute("GETEX", self.prefix + key, "EX", max(1, int(self.ttl)))
+        if data is None:
+            raise KeyError(key)
+        return self.loads(data)
+
+    def __setitem__(self, key, value):
+        self.client.execute("SET", self.prefix + key, self.dumps(value), "EX", max(1, int(self.ttl)))
+
+    def add(self, key, value) -> bool:
+        return self.client.execute("SET", self.prefix + key, self.dumps(value), "EX", max(1, int(self.ttl)), "NX") is not None
+
+    def peek(self, key, default=None):
+        data = self.client.execute("GET", self.prefix + key)
+        return default if data is None else self.loads(data)
+
+    def __contains__(self, key):
+        return bool(self.client.execute("EXISTS", self.prefix + key))
+
+    def __delitem__(self, key):
+        if not self.client.execute("DEL", self.prefix + key):
+            raise KeyError(key)
+
+    def __iter__(self):
+        keys = []
+        cursor = "0"
+        while True:
+            cursor, batch = self.client.execute("SCAN", cursor, "MATCH", self.prefix + "*", "COUNT", 500)
+            keys.extend(k.decode("utf-8")[len(self.prefix):] for k in batch)
+            cursor = cursor.decode("utf-8")
+            if cursor == "0":
+                return iter(keys)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def stats(self):
+        stats = super().stats()
+        stats["url"] = f"redis://{self.client.host}:{self.client.port}/{self.client.db}"
+        return stats
+
+
+def get_store(backend: str = None, namespace: str = "sessions", ttl: float = None, **codec) -> SessionStore:
+    """
+    Store named by `backend` or ANEES_SESSION_STORE (default: memory).
+    codec: optional dumps/loads for the values (memory keeps the objects).
+    """
+    backend = (backend or os.getenv("ANEES_SESSION_STORE") or "memory").lower()
+    ttl = ttl or float(os.getenv("ANEES_SESSION_TTL", DEFAULT_TTL))
+    if backend == "memory":
+        max_entries = int(os.getenv("ANEES_SESSION_MAX", DEFAULT_MAX_ENTRIES))
+        return MemorySessionStore(namespace, ttl, max_entries=max_entries, **codec)
+    if backend == "sqlite":
+        return SQLiteSessionStore(namespace, ttl, path=os.getenv("ANEES_SESSION_DB", DEFAULT_SQLITE_PATH), **codec)
+    if backend == "redis":
+        return RedisSessionStore(namespace, ttl, url=os.getenv("ANEES_REDIS_URL", DEFAULT_REDIS_URL), **codec)
+    raise ValueError(f"Unknown session store '{backend}' (choose from {', '.join(BACKENDS)})")
+
+
+# ---------------- Stand-in server ----------------
+# Redis-protocol server holding everything in memory, for trying the redis
+# backend without a Redis install:
+#   python session_store.py --port 6380
+#   ANEES_SESSION_STORE=redis ANEES_REDIS_URL=redis://127.0.0.1:6380/0 python "api_chatbot (1).py"
+# Supports the commands RedisSessionStore uses plus a few for inspection.
+
+class StandInRedis:
+    def __init__(self):
+        self.data = {}  # key -> (value, expires_at or None)
+        self.lock = threading.Lock()
+
+    def _live(self, key, now):
+        # Caller holds the lock
+        entry = self.data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= now:
+            del self.data[key]
+            return None
+        return entry
+
+    def command(self, args):
+        name = args[0].decode("utf-8").upper()
+        now = time.time()
+        with self.lock:
+            if name == "PING":
+                return "PONG"
+            if name in ("SELECT", "AUTH"):
+                return "OK"
+            if name == "GET":
+                entry = self._live(args[1], now)
+                return entry[0] if entry else None
+            if name == "GETEX":
+                entry = self._live(args[1], now)
+                if entry is None:
+                    return None
+                if len(args) == 4 and args[2].upper() == b"EX":
+                    self.data[args[1]] = (entry[0], now + int(args[3]))
+                return entry[0]
+            if name == "SET":
+                expires_at = None
+                options = [a.upper() for a in args[3:]]
+                if b"EX" in options:
+                    expires_at = now + int(args[3 + options.index(b"EX") + 1])
+                if b"PX" in options:
+                    expires_at = now + int(args[3 + options.index(b"PX") + 1]) / 1000
+                if b"NX" in options and self._live(args[1], now):
+                    return None
+                self.data[args[1]] = (args[2], expires_at)
+                return "OK"
+            if name == "DEL":
+                return sum(1 for key in args[1:] if self._live(key, now) and self.data.pop(key, None))
+            if name == "EXISTS":
+                return sum(1 for key in args[1:] if self._live(key, now))
+            if name == "TTL":
+                entry = self._live(args[1], now)
+                if entry is None:
+                    return -2
+                return -1 if entry[1] is None else int(entry[1] - now)
+            if name == "SCAN":
+                pattern = "*"
+                if b"MATCH" in [a.upper() for a in args]:
+                    pattern = args[[a.upper() for a in args].index(b"MATCH") + 1].decode("utf-8")
+                keys = [k for k in list(self.data) if self._live(k, now) and fnmatch.fnmatchcase(k.decode("utf-8"), pattern)]
+                return [b"0", keys]
+            if name == "DBSIZE":
+                return sum(1 for k in list(self.data) if self._live(k, now))
+            if name == "FLUSHDB":
+                self.data.clear()
+                return "OK"
+        raise RespError(f"ERR unknown command '{name}'")
+
+
+def encode_reply(value) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, RespError):
+        return f"-{value}\r\n".encode("utf-8")
+    if isinstance(value, str):
+        return f"+{value}\r\n".encode("utf-8")
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, bytes):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    return b"*%d\r\n" % len(value) + b"".join(encode_reply(v) for v in value)
+
+
+def make_handler(server_state: StandInRedis):
+    class RespHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            while True:
+                line = self.rfile.readline()
+                if not line:
+                    return
+                if not line.startswith(b"*"):
+                    self.wfile.write(b"-ERR only RESP arrays are supported\r\n")
+                    continue
+                args = []
+                for _ in range(int(line[1:-2])):
+                    length = int(self.rfile.readline()[1:-2])
+                    args.append(self.rfile.read(length + 2)[:-2])
+                if args and args[0].upper() == b"QUIT":
+                    self.wfile.write(b"+OK\r\n")
+                    return
+                try:
+                    reply = server_state.command(args)
+                except RespError as e:
+                    reply = e
+                except (IndexError, ValueError):
+                    reply = RespError("ERR syntax error")
+                self.wfile.write(encode_reply(reply))
+
+    return RespHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='In-memory Redis-protocol stand-in server for the redis session store')
+    parser.add_argument('--host', default='127.0.0.1', help='Bind address (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=6380, help='Port (default: 6380)')
+
+    args = parser.parse_args()
+
+    state = StandInRedis()
+    socketserver.ThreadingTCPServer.allow_reuse_address = True
+    socketserver.ThreadingTCPServer.daemon_threads = True
+    server = socketserver.ThreadingTCPServer((args.host, args.port), make_handler(state))
+    print(f"Redis stand-in listening on redis://{args.host}:{args.port}/0")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Held {len(state.data)} keys")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# test_session_model.py
+import json
+
+import pytest
+
+import session_model
+from session_model import HISTORY_LIMIT, Session
+
+
+def make_session() -> Session:
+    session = Session(risk_session_id="risk-1")
+    session.step = "mental_2"
+    session.phase = "mental_health"
+    session.show_header = False
+    for i in range(3):
+        session.show_question(f"MBTI question {i}?", ["A) yes", "B) no"])
+        session.answer_personality("A")
+        session.add_history("user", f"Answer {i}")
+    session.skip_personality()  # the same text as the last answered question
+    session.last_mental_question = "How have you been sleeping?"
+    session.answer_mental("Badly, for weeks")
+    session.skip_mental()
+    session.last_mental_question = "Anything else on your mind?"
+    session.add_history("assistant", "Thank you — شكرا")
+    return session
+
+
+def assert_same(a: Session, b: Session):
+    for name in Session.__slots__:
+        assert getattr(a, name) == getattr(b, name), name
+    assert b.history.maxlen == HISTORY_LIMIT
+
+
+@pytest.fixture(params=["msgpack", "json"])
+def codec(request, monkeypatch):
+    if request.param == "msgpack":
+        if session_model.msgpack is None:
+            pytest.skip("msgpack is not installed")
+    else:
+        monkeypatch.setattr(session_model, "msgpack", None)
+    return request.param
+
+
+def test_round_trip(codec):
+    session = make_session()
+    data = session.pack()
+    assert (data[:1] == b"[") == (codec == "json")
+    assert_same(session, Session.unpack(data))
+
+
+def test_round_trip_of_a_new_session(codec):
+    session = Session()
+    assert_same(session, Session.unpack(session.pack()))
+
+
+def test_question_texts_are_stored_once(codec):
+    session = make_session()
+    data = session.pack()
+    # Asked, answered and skipped: one copy in the string table
+    assert data.count("MBTI question 2?".encode("utf-8")) == 1
+    restored = Session.unpack(data)
+    assert restored.personality_answers[2]["question"] is restored.personality_skip_history[0]
+
+
+def test_history_stays_bounded(codec):
+    session = Session()
+    for i in range(HISTORY_LIMIT + 5):
+        session.add_history("user", str(i))
+    restored = Session.unpack(session.pack())
+    assert len(restored.history) == HISTORY_LIMIT
+    assert restored.history[0]["content"] == "5"
+
+
+def test_json_sessions_load_with_msgpack_installed(monkeypatch):
+    if session_model.msgpack is None:
+        pytest.skip("msgpack is not installed")
+    session = make_session()
+    monkeypatch.setattr(session_model, "msgpack", None)
+    data = session.pack()
+    monkeypatch.undo()
+    assert_same(session, Session.unpack(data))
+
+
+def test_msgpack_session_without_msgpack(monkeypatch):
+    if session_model.msgpack is None:
+        pytest.skip("msgpack is not installed")
+    data = make_session().pack()
+    monkeypatch.setattr(session_model, "msgpack", None)
+    with pytest.raises(ValueError, match="msgpack"):
+        Session.unpack(data)
+
+
+def test_unknown_format_version(monkeypatch):
+    monkeypatch.setattr(session_model, "msgpack", None)
+    fields = json.loads(make_session().pack())
+    fields[0] = session_model.FORMAT_VERSION + 1
+    with pytest.raises(ValueError, match="Unsupported session format"):
+        Session.unpack(json.dumps(fields).encode("utf-8"))
@@ -0,0 +1,161 @@
+# test_session_store.py
+import socketserver
+import threading
+
+import pytest
+
+import session_store
+from session_model import Session
+from session_store import MemorySessionStore, RedisSessionStore, SQLiteSessionStore, StandInRedis, make_handler
+
+TTL = 10
+
+
+class Clock:
+    """Stands in for the time module of session_store (stores and stand-in server)."""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(session_store, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def redis_url():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), make_handler(StandInRedis()))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"redis://127.0.0.1:{server.server_address[1]}/0"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def make_store(request, clock, tmp_path):
+    stores = []
+
+    def make(namespace="sessions", **codec):
+        if request.param == "memory":
+            store = MemorySessionStore(namespace, TTL, **codec)
+        elif request.param == "sqlite":
+            store = SQLiteSessionStore(namespace, TTL, path=str(tmp_path / "sessions.db"), **codec)
+        else:
+            store = RedisSessionStore(namespace, TTL, url=request.getfixturevalue("redis_url"), **codec)
+        stores.append(store)
+        return store
+
+    yield make
+    for store in stores:
+        if isinstance(store, RedisSessionStore):
+            store.client.close()
+
+
+@pytest.fixture
+def store(make_store):
+    return make_store()
+
+
+def test_mapping(store):
+    store["a"] = {"step": 1}
+    store["b"] = {"step": 2}
+    assert store["a"] == {"step": 1}
+    assert store.get("missing") is None
+    assert sorted(store) == ["a", "b"]
+    assert len(store) == 2
+    del store["a"]
+    assert "a" not in store
+    with pytest.raises(KeyError):
+        del store["a"]
+    assert dict(store.items()) == {"b": {"step": 2}}
+
+
+def test_namespaces_are_separate(make_store):
+    sessions, reports = make_store("sessions"), make_store("reports")
+    sessions["u"] = {"kind": "session"}
+    reports["u"] = {"kind": "report"}
+    assert sessions["u"] == {"kind": "session"}
+    assert list(reports) == ["u"]
+
+
+def test_entry_expires_after_ttl(store, clock):
+    store["a"] = {"step": 1}
+    clock.advance(TTL - 1)
+    assert "a" in store
+    clock.advance(2)
+    assert "a" not in store
+    assert store.get("a") is None
+    assert len(store) == 0
+
+
+def test_read_refreshes_ttl(store, clock):
+    store["a"] = {"step": 1}
+    for _ in range(3):
+        clock.advance(TTL - 1)
+        assert store["a"] == {"step": 1}
+    clock.advance(TTL - 1)
+    assert "a" in store
+
+
+def test_contains_and_peek_do_not_refresh_ttl(store, clock):
+    store["a"] = {"step": 1}
+    clock.advance(TTL - 1)
+    assert "a" in store
+    assert store.peek("a") == {"step": 1}
+    assert dict(store.items(touch=False)) == {"a": {"step": 1}}
+    clock.advance(2)
+    assert "a" not in store
+    assert store.peek("a", "gone") == "gone"
+
+
+def test_add_only_when_absent(store):
+    assert store.add("a", {"owner": 1})
+    assert not store.add("a", {"owner": 2})
+    assert store["a"] == {"owner": 1}
+
+
+def test_add_replaces_expired_entry(store, clock):
+    store["a"] = {"owner": 1}
+    clock.advance(TTL + 1)
+    assert store.add("a", {"owner": 2})
+    assert store["a"] == {"owner": 2}
+
+
+def test_add_from_two_stores_claims_once(make_store):
+    # Two workers sharing the backend (memory: one store shared by threads)
+    first = make_store("reports")
+    second = first if isinstance(first, MemorySessionStore) else make_store("reports")
+    results = []
+    barrier = threading.Barrier(8)
+
+    def claim(store, owner):
+        barrier.wait()
+        results.append(store.add("u", {"owner": owner}))
+
+    threads = [threading.Thread(target=claim, args=(first if i % 2 else second, i)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results.count(True) == 1
+
+
+def test_session_codec(make_store):
+    store = make_store("conversation", dumps=Session.pack, loads=Session.unpack)
+    session = Session(risk_session_id="r")
+    session.show_question("Do you enjoy parties?", ["A) yes", "B) no"])
+    session.answer_personality("A")
+    store["u"] = session
+    restored = store["u"]
+    assert restored.personality_answers == session.personality_answers
+    assert restored.risk_session_id == "r"